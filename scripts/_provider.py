@@ -0,0 +1,15 @@
+"""
+脚本共用的行情数据源
+设置 VOLRISK_PROVIDER=local:<目录> 时离线回放录制数据（见 volrisk.providers.get_provider）
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from volrisk.providers import get_provider  # noqa: E402
+
+provider = get_provider()
@@ -3,10 +3,11 @@
 建立14家公司的细分行业σ_down映射 (含多业务公司加权)
 """
 
-import yfinance as yf
 import numpy as np
 import pandas as pd
 
+from _provider import provider
+
 # 细分行业σ_down实测数据
 SUBINDUSTRY_SIGMA_DOWN = {
     # 半导体细分
@@ -209,8 +210,7 @@ def calculate_vtr(expected_return, sigma_down):
 def fetch_chip_design_sigma():
     """实时获取芯片设计ETF的σ_down"""
     try:
-        stock = yf.Ticker('512760.SS')  # 芯片ETF
-        hist = stock.history(period='1y')
+        hist = provider.history('512760.SS', period='1y')  # 芯片ETF
         returns = hist['Close'].pct_change().dropna()
         downside = returns[returns < 0]
         sigma_down = downside.std() * np.sqrt(252)
@@ -4,11 +4,12 @@
 基于用户反馈: 大行业ETF太粗糙,需要精确到细分行业
 """
 
-import yfinance as yf
 import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from _provider import provider
+
 # 细分行业ETF映射 (基于PRECISE_INDUSTRY_SEGMENTATION_V7.md)
 SUBINDUSTRY_ETFS = {
     # 半导体细分
@@ -120,8 +121,7 @@ def calculate_sigma_down(ticker, period='1y'):
     - sample_days: 样本天数
     """
     try:
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period=period)
+        hist = provider.history(ticker, period=period)
 
         if len(hist) < 50:
             return None, None, len(hist), "数据不足"
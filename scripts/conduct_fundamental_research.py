@@ -14,6 +14,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 import json
 
+from _provider import provider
+
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 # 15家公司配置
@@ -46,8 +48,8 @@ def fetch_financial_data(ticker, company_name):
     try:
         stock = yf.Ticker(ticker)
 
-        # 获取基本信息
-        info = stock.info
+        # 获取基本信息（可离线回放）
+        info = provider.info(ticker)
 
         # 获取季度财务数据
         quarterly_financials = stock.quarterly_financials
@@ -59,7 +61,7 @@ def fetch_financial_data(ticker, company_name):
         annual_financials = stock.financials
 
         # 获取历史价格数据用于估值分析
-        hist = stock.history(period="2y")
+        hist = provider.history(ticker, period="2y")
 
         result = {
             'company': company_name,
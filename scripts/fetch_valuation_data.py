@@ -4,16 +4,14 @@
 使用yfinance API获取实时PE/PB等估值指标
 """
 
-import yfinance as yf
 import pandas as pd
 from datetime import datetime
 import yaml
-import sys
 from pathlib import Path
 
-# 添加项目路径
+from _provider import provider
+
 project_root = Path(__file__).parent.parent
-sys.path.insert(0, str(project_root))
 
 
 def get_stock_valuation(ticker: str, market: str = "A股") -> dict:
@@ -28,8 +26,7 @@ def get_stock_valuation(ticker: str, market: str = "A股") -> dict:
         包含估值指标的字典
     """
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
+        info = provider.info(ticker)
 
         result = {
             'ticker': ticker,
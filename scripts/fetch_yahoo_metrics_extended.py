@@ -10,7 +10,8 @@ from typing import Dict, List
 
 import numpy as np
 import pandas as pd
-import yfinance as yf
+
+from _provider import provider
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 OUTPUT_DIR = PROJECT_ROOT / "data"
@@ -55,11 +56,9 @@ def annualized_downside_volatility(returns: pd.Series) -> float:
 
 def fetch_price_series(ticker: str, period: str = "1y") -> pd.Series | None:
     try:
-        data = yf.download(ticker, period=period, interval="1d", auto_adjust=True, progress=False)
+        data = provider.history(ticker, period=period, interval="1d", auto_adjust=True)
         if data.empty:
             return None
-        if isinstance(data.columns, pd.MultiIndex):
-            data = data.xs(ticker, axis=1, level=1)
         price_col = "Adj Close" if "Adj Close" in data.columns else "Close"
         return data[price_col].dropna()
     except Exception as exc:
@@ -68,10 +67,9 @@ def fetch_price_series(ticker: str, period: str = "1y") -> pd.Series | None:
 
 
 def fetch_company_snapshot(ticker: str) -> Dict[str, float | str | None]:
-    stock = yf.Ticker(ticker)
     info: Dict[str, float | str | None] = {}
     try:
-        info = stock.info
+        info = provider.info(ticker)
     except Exception as exc:
         print(f"⚠️ 无法获取 {ticker} info: {exc}")
 
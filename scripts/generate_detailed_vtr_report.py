@@ -7,16 +7,16 @@ import pandas as pd
 import yaml
 import numpy as np
 from datetime import datetime
-import yfinance as yf
+
+from _provider import provider
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
 def fetch_company_data(ticker):
     """从Yahoo Finance获取公司数据"""
     try:
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        hist = stock.history(period="1y")
+        info = provider.info(ticker)
+        hist = provider.history(ticker, period="1y")
         
         if hist.empty:
             return None
@@ -56,8 +56,7 @@ def fetch_company_data(ticker):
 def fetch_etf_sigma_down(etf_ticker, name):
     """获取ETF的下行波动率"""
     try:
-        etf = yf.Ticker(etf_ticker)
-        hist = etf.history(period="1y")
+        hist = provider.history(etf_ticker, period="1y")
         
         if hist.empty:
             return None
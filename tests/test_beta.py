@@ -0,0 +1,109 @@
+"""
+测试β回归计算模块
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from volrisk.beta import (
+    BetaCalculator, EWMABeta, beta_batch, beta_ols, beta_ols_batch, calculate_beta,
+    ewma_beta, rolling_beta
+)
+
+
+def _universe(seed=7):
+    """两个行业、五只股票，部分股票有停牌或上市较晚"""
+    rng = np.random.default_rng(seed)
+    index = pd.bdate_range("2024-01-01", periods=250)
+    sectors = pd.DataFrame(rng.normal(0, 0.015, (250, 2)), index=index, columns=["S1", "S2"])
+
+    stocks = {}
+    for i, (sector, beta) in enumerate([("S1", 0.8), ("S1", 1.3), ("S2", 1.0), ("S2", 0.5), ("S1", 1.1)]):
+        stocks[f"T{i}"] = beta * sectors[sector] + rng.normal(0, 0.01, 250)
+    stocks = pd.DataFrame(stocks)
+    stocks.iloc[20:40, 1] = np.nan
+    stocks.iloc[:210, 4] = np.nan
+
+    sector_map = {"T0": "S1", "T1": "S1", "T2": "S2", "T3": "S2", "T4": "S1", "T9": "S1"}
+    return stocks, sectors, sector_map
+
+
+def test_beta_ols_batch_matches_single():
+    """测试批量OLS与逐只回归一致，样本不足的股票为NaN"""
+    stocks, sectors, sector_map = _universe()
+    result = beta_ols_batch(stocks, sectors, sector_map)
+
+    assert list(result.index) == ["T0", "T1", "T2", "T3", "T4"]
+    for ticker in ["T0", "T1", "T2", "T3"]:
+        _, expected = beta_ols(stocks[ticker], sectors[sector_map[ticker]])
+        row = result.loc[ticker]
+        for key in ['alpha', 'beta', 'r_squared', 'std_err']:
+            assert row[key] == pytest.approx(expected[key], rel=1e-9)
+        assert row['n_obs'] == expected['n_obs']
+
+    assert result.loc["T4", 'n_obs'] == 40
+    assert np.isnan(result.loc["T4", 'beta'])
+
+
+def test_beta_calculator_content_cache():
+    """测试缓存按内容命中，不依赖对象id"""
+    stocks, sectors, sector_map = _universe()
+    calculator = BetaCalculator()
+
+    first = calculator.calculate(stocks["T0"], sectors["S1"])
+    again = calculator.calculate(stocks["T0"].copy(), sectors["S1"].copy())
+    assert again is first
+
+    changed = calculator.calculate(stocks["T0"] * 2, sectors["S1"])
+    assert changed[0] == pytest.approx(2 * first[0])
+
+    batch = calculator.calculate_batch(stocks, sectors, sector_map)
+    assert calculator.calculate_batch(stocks.copy(), sectors.copy(), dict(sector_map)) is batch
+    assert batch.loc["T0", 'beta'] == pytest.approx(first[0])
+
+
+def test_rolling_and_ewma_beta():
+    """测试滚动β与逐窗口回归一致，指数加权β向量化与在线更新一致"""
+    stocks, sectors, _ = _universe()
+    stock, sector = stocks["T1"], sectors["S1"]
+
+    rolling = rolling_beta(stock, sector, window=60)
+    aligned = pd.DataFrame({'stock': stock, 'sector': sector}).dropna()
+    assert rolling.iloc[:59].isna().all()
+    for end in [59, 100, len(aligned) - 1]:
+        window = aligned.iloc[end - 59:end + 1]
+        expected, _ = beta_ols(window['stock'], window['sector'], min_overlap=60)
+        assert rolling.iloc[end] == pytest.approx(expected, rel=1e-9)
+
+    vectorized = ewma_beta(stock, sector, halflife=30)
+    online = EWMABeta(halflife=30)
+    streamed = [online.update(y, x) for y, x in zip(stock, sector)]
+    streamed = pd.Series(streamed, index=stock.index).reindex(vectorized.index)
+    assert np.allclose(vectorized.iloc[19:], streamed.iloc[19:])
+
+    calculator = BetaCalculator()
+    assert calculator.latest(stock, sector, kind='rolling', window=60) == pytest.approx(rolling.iloc[-1])
+    assert calculator.latest(stock, sector, kind='ewma', halflife=30) == pytest.approx(online.beta)
+
+
+def test_downside_and_cosemi_beta():
+    """测试下行β与协半方差β：批量与逐只一致，并与直接定义一致"""
+    stocks, sectors, sector_map = _universe()
+    result = beta_batch(stocks, sectors, sector_map, mar=0.001)
+
+    stock, sector = stocks["T2"], sectors["S2"]
+    downside, info = calculate_beta(stock, sector, method='Downside', mar=0.001)
+    cosemi, _ = calculate_beta(stock, sector, method='CoSemi', mar=0.001)
+    assert result.loc["T2", 'beta_downside'] == pytest.approx(downside)
+    assert result.loc["T2", 'beta_cosemi'] == pytest.approx(cosemi)
+    assert result.loc["T2", 'beta'] == pytest.approx(beta_ols(stock, sector)[0])
+
+    # 直接按定义计算
+    down_days = sector < 0.001
+    expected, _ = beta_ols(stock[down_days], sector[down_days], min_overlap=3)
+    assert downside == pytest.approx(expected)
+    assert info['n_obs'] == down_days.sum()
+
+    semi_x = np.minimum(sector - 0.001, 0)
+    semi_y = np.minimum(stock - 0.001, 0)
+    assert cosemi == pytest.approx((semi_x * semi_y).sum() / (semi_x ** 2).sum())
@@ -0,0 +1,419 @@
+"""
+测试数据获取模块
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import volrisk.data as data_module
+from volrisk.data import DataFetcher, period_start
+from volrisk.planner import build_run_plan
+from volrisk.providers import (
+    LocalProvider, MarketDataProvider, RecordingProvider, get_provider, split_by_ticker
+)
+from volrisk.ranker import CompaniesConfig
+from volrisk.results import SectorResultCache
+from volrisk.sector import SectorAnalyzer, SectorsConfig
+from volrisk.store import MemoryCache
+
+
+class FakeProvider(MarketDataProvider):
+    """本地模拟数据源：每个ticker有固定的随机游走历史，记录每次下载请求"""
+
+    name = "fake"
+
+    def __init__(self, known=None, today="2025-06-30"):
+        self.known = known
+        self.today = pd.Timestamp(today)
+        self.scale = {}  # 模拟复权：ticker -> 历史价格缩放系数
+        self.calls = []
+
+    def history(self, ticker):
+        index = pd.bdate_range(start="2022-01-03", end=self.today)
+        rng = np.random.default_rng(sum(map(ord, ticker)))
+        close = 100 * np.cumprod(1 + rng.normal(0, 0.01, 2000))[:len(index)]
+        return pd.Series(close * self.scale.get(ticker, 1.0), index=index)
+
+    def info(self, ticker):
+        return {'symbol': ticker, 'trailingPE': 12.5, 'sector': 'Technology'}
+
+    def download(self, tickers, start=None, end=None, period=None, interval="1d",
+                 auto_adjust=True):
+        self.calls.append({
+            'tickers': list(tickers), 'start': start, 'end': end,
+            'period': period, 'interval': interval, 'auto_adjust': auto_adjust
+        })
+        columns = {}
+        for ticker in tickers:
+            if self.known is not None and ticker not in self.known:
+                continue
+            close = self.history(ticker)
+            if start is not None:
+                close = close[close.index >= pd.Timestamp(start)]
+            if end is not None:
+                close = close[close.index < pd.Timestamp(end)]
+            columns[('Close', ticker)] = close
+            columns[('Volume', ticker)] = pd.Series(1000.0, index=close.index)
+
+        if not columns:
+            return pd.DataFrame()
+
+        data = pd.DataFrame(columns)
+        data.columns = pd.MultiIndex.from_tuples(data.columns, names=['Price', 'Ticker'])
+        return data
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """模拟数据源，并把“当天”固定为数据源的最后一天"""
+    provider = FakeProvider()
+    monkeypatch.setattr(data_module, "_today", lambda: provider.today)
+    return provider
+
+
+def test_split_by_ticker(provider):
+    """测试多ticker下载结果拆分"""
+    data = provider.download(["A.SS", "B.SZ"])
+    frames = split_by_ticker(data, ["A.SS", "B.SZ", "C.SS"])
+
+    assert set(frames) == {"A.SS", "B.SZ"}
+    assert list(frames["A.SS"].columns) == ['Close', 'Volume']
+
+    # (ticker, 字段) 顺序同样支持
+    swapped = data.swaplevel(axis=1)
+    assert set(split_by_ticker(swapped, ["A.SS", "B.SZ"])) == {"A.SS", "B.SZ"}
+
+
+def test_period_start():
+    """测试period换算为开始日期"""
+    today = pd.Timestamp("2025-06-30")
+    assert period_start("1y", today) == pd.Timestamp("2024-06-30")
+    assert period_start("6mo", today) == pd.Timestamp("2024-12-30")
+    assert period_start("ytd", today) == pd.Timestamp("2025-01-01")
+    assert period_start("max", today) is None
+
+    with pytest.raises(ValueError):
+        period_start("1century", today)
+
+
+def test_fetch_multiple_single_round_trip(tmp_path, provider):
+    """测试批量模式只发起一次下载并写入存储"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+
+    tickers = ["A.SS", "B.SZ", "C.SS", "A.SS"]
+    results = fetcher.fetch_multiple(tickers)
+
+    assert len(provider.calls) == 1
+    assert provider.calls[0]['tickers'] == ["A.SS", "B.SZ", "C.SS"]
+    assert list(results) == ["A.SS", "B.SZ", "C.SS"]
+    assert results["B.SZ"].index[0] >= pd.Timestamp("2024-06-30")
+
+    # 第二次全部命中存储
+    cached = fetcher.fetch_multiple(tickers)
+    assert len(provider.calls) == 1
+    pd.testing.assert_series_equal(cached["C.SS"], results["C.SS"], check_freq=False)
+
+
+def test_fetch_multiple_retries_missing(tmp_path, provider):
+    """测试批量结果缺失的ticker逐个重试，失败的被跳过"""
+    provider.known = {"A.SS"}
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+
+    results = fetcher.fetch_multiple(["A.SS", "X.SS"], max_retries=1)
+
+    assert list(results) == ["A.SS"]
+    assert [call['tickers'] for call in provider.calls] == [["A.SS", "X.SS"], ["X.SS"]]
+
+
+def test_fetch_incremental_tail(tmp_path, provider):
+    """测试次日只下载缺失的尾部，任意窗口从本地切片"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+
+    first = fetcher.fetch("A.SS", period="1y")
+    assert provider.calls[-1]['start'] == "2024-06-30"
+
+    # 过了一个交易日
+    provider.today = provider.today + pd.offsets.BDay(1)
+    second = fetcher.fetch("A.SS", period="1y")
+
+    tail_call = provider.calls[-1]
+    assert len(provider.calls) == 2
+    assert tail_call['start'] == str(first.index[-2].date())
+    assert second.index[-1] == provider.today
+    pd.testing.assert_series_equal(
+        second[second.index <= first.index[-1]],
+        first[first.index >= second.index[0]],
+        check_freq=False
+    )
+
+    # 较短的窗口不需要下载
+    fetcher.fetch("A.SS", period="6mo")
+    fetcher.fetch("A.SS", start="2025-01-02", end="2025-03-01")
+    assert len(provider.calls) == 2
+
+    # 更早的窗口需要补齐头部
+    longer = fetcher.fetch("A.SS", period="2y")
+    assert len(provider.calls) == 3
+    assert len(longer) > len(second)
+
+
+def test_fetch_readjusted_history(tmp_path, provider):
+    """测试复权价变化时重新下载全部历史"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    fetcher.fetch("A.SS", period="1y")
+
+    # 分红后整段历史被重新复权
+    provider.scale["A.SS"] = 0.98
+    provider.today = provider.today + pd.offsets.BDay(1)
+    refreshed = fetcher.fetch("A.SS", period="1y")
+
+    assert len(provider.calls) == 3
+    assert provider.calls[-1]['start'] == "2024-06-30"
+    expected = provider.history("A.SS")
+    assert refreshed.iloc[0] == pytest.approx(expected[refreshed.index[0]])
+
+
+def test_cache_key_interval_and_manifest(tmp_path, provider):
+    """测试缓存键区分数据间隔与复权方式，清单记录覆盖范围并支持按ticker清理"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+
+    fetcher.fetch("A.SS", period="1y")
+    fetcher.fetch("A.SS", period="1y", interval="1wk")
+    fetcher.fetch("A.SS", period="1y", auto_adjust=False)
+    fetcher.fetch("B.SZ", period="1y")
+    assert len(provider.calls) == 4
+    assert provider.calls[1]['interval'] == "1wk"
+    assert provider.calls[2]['auto_adjust'] is False
+
+    entries = fetcher.store.manifest.entries("A.SS")
+    assert [(e['interval'], e['adjust']) for e in entries] == [
+        ("1d", "auto"), ("1d", "raw"), ("1wk", "auto")
+    ]
+    daily = fetcher.store.coverage("A.SS")
+    assert daily['covered_start'] == "2024-06-30"
+    assert daily['last_date'] == "2025-06-30"
+    assert daily['rows'] > 250
+    assert daily['bytes'] > 0
+
+    fetcher.clear_cache("A.SS")
+    assert fetcher.store.manifest.entries("A.SS") == []
+    assert fetcher.store.coverage("B.SZ") is not None
+    assert not (tmp_path / "store" / "1d" / "auto" / "A.SS").exists()
+
+
+def test_cache_stats_and_lru_prune(tmp_path, provider):
+    """测试命中率统计与按LRU淘汰"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+
+    for ticker in ["A.SS", "B.SZ", "C.SS"]:
+        fetcher.fetch(ticker, period="1y")
+    fetcher.fetch("A.SS", period="6mo")
+
+    stats = fetcher.cache_stats()
+    assert stats['entries'] == 3
+    assert (stats['hits'], stats['misses']) == (1, 3)
+    assert stats['hit_rate'] == pytest.approx(0.25)
+    assert stats['bytes'] == sum(item['bytes'] for item in stats['tickers'])
+
+    # B.SZ 最久未访问，先被淘汰
+    manifest = fetcher.store.manifest
+    with manifest._connect() as conn:
+        conn.execute("UPDATE entries SET accessed_at = '2000-01-01T00:00:00' WHERE ticker = 'B.SZ'")
+    one_entry = stats['tickers'][0]['bytes']
+    evicted = fetcher.prune_cache(max_bytes=stats['bytes'] - 1)
+    assert [entry['ticker'] for entry in evicted] == ["B.SZ"]
+    assert fetcher.cache_stats()['entries'] == 2
+
+    # 按年龄淘汰：所有对象都在最近访问过
+    assert fetcher.prune_cache(max_age_days=1) == []
+    assert len(fetcher.prune_cache(max_bytes=one_entry)) == 1
+
+
+def test_cache_limits_enforced_on_write(tmp_path, provider):
+    """测试配置缓存上限后写入时自动按LRU淘汰，本次获取的数据不受影响"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    fetcher.fetch("A.SS", period="1y")
+
+    size = fetcher.cache_stats()['bytes']
+    fetcher.max_cache_bytes = size + size // 2
+    result = fetcher.fetch("B.SZ", period="1y")
+
+    assert result is not None
+    assert [entry['ticker'] for entry in fetcher.store.manifest.entries()] == ["B.SZ"]
+
+
+def test_memory_tier_avoids_disk(tmp_path, provider):
+    """测试进程内缓存命中时不读取parquet、不查询清单"""
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    full = fetcher.fetch("A.SS", period="1y")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("不应访问磁盘存储")
+
+    fetcher.store.load = fail
+    fetcher.store.coverage = fail
+    fetcher.store.manifest.touch = fail
+
+    window = fetcher.fetch("A.SS", start="2025-01-02", end="2025-03-01")
+    assert window.index[0] == pd.Timestamp("2025-01-02")
+    assert window.index[-1] < pd.Timestamp("2025-03-01")
+    pd.testing.assert_series_equal(window, full.loc["2025-01-02":"2025-02-28"])
+    assert len(provider.calls) == 1
+
+
+def test_memory_cache_lru_bytes():
+    """测试进程内缓存按字节数上限淘汰最久未使用的对象"""
+    series = pd.Series(np.ones(100), index=pd.bdate_range("2024-01-01", periods=100))
+    size = int(series.memory_usage(index=True, deep=False))
+    cache = MemoryCache(max_bytes=2 * size)
+
+    cache.put("a", {}, series)
+    cache.put("b", {}, series)
+    cache.get("a")
+    cache.put("c", {}, series)
+
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.nbytes == 2 * size
+
+    # 超过上限的单个对象不缓存
+    small = MemoryCache(max_bytes=size - 1)
+    small.put("d", {}, series)
+    assert "d" not in small
+
+
+def test_record_and_replay(tmp_path, provider):
+    """测试录制在线数据后离线回放，结果与在线获取一致"""
+    replay_dir = tmp_path / "replay"
+    recorder = RecordingProvider(provider, str(replay_dir))
+    online = DataFetcher(cache_dir=str(tmp_path / "online"), provider=recorder)
+    expected = online.fetch_multiple(["A.SS", "B.SZ"], period="1y")
+    assert recorder.info("A.SS")['trailingPE'] == 12.5
+
+    # 回放按录制日期换算period，与运行当天无关
+    replay = LocalProvider(str(replay_dir), as_of="2025-06-30")
+    offline = DataFetcher(provider=replay)
+    assert offline.cache_dir == replay_dir / "cache"
+
+    results = offline.fetch_multiple(["A.SS", "B.SZ", "X.SS"], period="1y")
+    assert list(results) == ["A.SS", "B.SZ"]
+    for ticker in expected:
+        pd.testing.assert_series_equal(results[ticker], expected[ticker], check_freq=False)
+
+    assert replay.info("A.SS")['sector'] == "Technology"
+    assert replay.info("X.SS") == {}
+    assert replay.history("B.SZ", start="2025-06-02", end="2025-06-07").shape[0] == 5
+
+
+def test_local_provider_csv_and_spec(tmp_path):
+    """测试本地数据源读取CSV行情，以及数据源配置解析"""
+    bars_dir = tmp_path / "bars" / "1d"
+    bars_dir.mkdir(parents=True)
+    index = pd.bdate_range("2024-01-01", "2024-12-31", name="Date")
+    close = pd.Series(np.linspace(10, 20, len(index)), index=index)
+    pd.DataFrame({'Close': close, 'Volume': 100}).to_csv(bars_dir / "A.SS.csv")
+    (tmp_path / "replay.json").write_text('{"as_of": "2024-12-31"}')
+
+    replay = get_provider(f"local:{tmp_path}")
+    assert isinstance(replay, LocalProvider)
+    assert replay.as_of == pd.Timestamp("2024-12-31")
+
+    fetcher = DataFetcher(cache_dir=str(tmp_path / "cache"), provider=replay)
+    series = fetcher.fetch("A.SS", period="6mo")
+    assert series.index[0] >= pd.Timestamp("2024-06-30")
+    assert series.iloc[-1] == pytest.approx(20.0)
+
+    with pytest.raises(ValueError):
+        get_provider("bloomberg")
+    with pytest.raises(FileNotFoundError):
+        get_provider(f"local:{tmp_path / 'missing'}")
+
+
+def test_run_plan_dedup_and_cost(tmp_path, provider):
+    """测试运行计划：共用ticker只获取一次，计划不访问网络，与实际下载一致"""
+    sectors = SectorsConfig(sectors={
+        "S1": {"tickers": ["A.SS"], "weights": [1.0]},
+        "S2": {"tickers": ["A.SS", "B.SZ"], "weights": [0.5, 0.5]},
+        "S3": {"tickers": ["B.SZ", "A.SS"], "weights": [0.5, 0.5]},
+    })
+    companies = CompaniesConfig(companies=[
+        {"name": "甲", "sector_mix": {"S1": 0.5, "S2": 0.5}, "expected_return": 0.2},
+        {"name": "乙", "sector_mix": {"S2": 0.5, "S1": 0.5}, "expected_return": 0.2},
+        {"name": "丙", "ticker": "C.SS", "sector": "S1", "expected_return": 0.2,
+         "risk": {"mode": "SchemeC"}},
+        {"name": "丁", "ticker": "D.SS", "sector": "S1", "expected_return": 0.2,
+         "risk": {"mode": "SchemeC", "beta": 1.0}},
+    ])
+
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    fetcher.fetch_multiple(["A.SS"])
+    provider.calls.clear()
+
+    plan = build_run_plan(sectors, fetcher, companies, period="1y")
+    assert provider.calls == []
+    assert plan.tickers == ["A.SS", "B.SZ", "C.SS"]
+    assert plan.sector_tickers["A.SS"] == ["S1", "S2", "S3"]
+    assert len(plan.mixes) == 1
+
+    cost = plan.cost()
+    assert cost['references'] == 6
+    assert cost['downloads'] == {'full': 2, 'memory': 1}
+    assert cost['requests'] == 1
+    assert "A.SS: 共用于 3 个行业" in plan.report()
+
+    fetcher.fetch_multiple(plan.tickers, period="1y")
+    assert [call['tickers'] for call in provider.calls] == [["B.SZ", "C.SS"]]
+
+
+def test_sector_result_cache(tmp_path, provider):
+    """测试行业指标结果缓存：未变化时不读取价格，参数或行情变化时重新计算"""
+    sectors = SectorsConfig(sectors={
+        "S1": {"tickers": ["A.SS", "B.SZ"], "weights": [0.5, 0.5]},
+        "S2": {"tickers": ["C.SS"], "weights": [1.0]},
+    })
+    fetcher = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    cache = SectorResultCache(tmp_path / "results")
+
+    first = SectorAnalyzer(fetcher, cache).calculate_all_sectors(sectors, method="blend")
+    assert len(list(cache.root.glob("*.json"))) == 2
+
+    # 新的获取器（空的进程内缓存），结果直接来自缓存，不读取价格
+    fresh = DataFetcher(cache_dir=str(tmp_path), provider=provider)
+    fresh.fetch_multiple = None
+    again = SectorAnalyzer(fresh, cache).calculate_all_sectors(sectors, method="blend")
+    for name in ["S1", "S2"]:
+        assert again[name].sigma_down == first[name].sigma_down
+        assert again[name].sample_days == first[name].sample_days
+        pd.testing.assert_series_equal(again[name].returns, first[name].returns, check_names=False)
+
+    # 参数变化时重新计算
+    weighted = SectorAnalyzer(fetcher, cache).calculate_all_sectors(sectors)
+    assert weighted["S1"].method == "weighted"
+    assert len(list(cache.root.glob("*.json"))) == 4
+
+    # 行情写入后指纹变化
+    before = fetcher.fingerprint(["A.SS"])["A.SS"]
+    fetcher.fetch("A.SS", period="1y", force_refresh=True)
+    assert fetcher.fingerprint(["A.SS"])["A.SS"] != before
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_sectors_shared_failing_ticker_fetched_once(tmp_path, provider, monkeypatch, max_workers):
+    """
+    测试多个行业共用、获取失败的ETF只在统一获取时请求（含重试），行业计算不再逐个重复获取；
+    并发计算时各行业线程也不会同时获取、写入同一ticker
+    """
+    monkeypatch.setattr(data_module, "backoff_delay", lambda *args, **kwargs: 0.0)
+    provider.known = {"A.SS", "B.SS"}
+    sectors = {f"S{i}": {"tickers": ["A.SS", "X.SS"], "weights": [0.5, 0.5]} for i in range(4)}
+    sectors["OK"] = {"tickers": ["A.SS", "B.SS"], "weights": [0.5, 0.5]}
+    config = SectorsConfig(sectors=sectors)
+
+    analyzer = SectorAnalyzer(data_fetcher=DataFetcher(cache_dir=str(tmp_path), provider=provider))
+    results = analyzer.calculate_all_sectors(config, max_workers=max_workers, min_days=100)
+
+    assert list(results) == ["OK"]
+    x_calls = [call for call in provider.calls if "X.SS" in call['tickers']]
+    # 一次批量请求 + 单独重试（默认2次）
+    assert len(x_calls) == 3
+    assert x_calls[0]['tickers'] == ["A.SS", "X.SS", "B.SS"]
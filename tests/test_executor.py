@@ -0,0 +1,54 @@
+"""
+测试并发获取模块
+"""
+
+import time
+import pytest
+from volrisk.executor import FetchExecutor, TokenBucket, backoff_delay
+
+
+def test_backoff_delay():
+    """测试指数退避与抖动范围"""
+    assert backoff_delay(0, base=1.0, jitter=False) == 1.0
+    assert backoff_delay(3, base=1.0, jitter=False) == 8.0
+    assert backoff_delay(10, base=1.0, cap=30.0, jitter=False) == 30.0
+
+    for attempt in range(5):
+        delay = backoff_delay(attempt, base=0.5)
+        assert 0 <= delay <= 0.5 * 2 ** attempt
+
+
+def test_token_bucket_rate():
+    """测试令牌桶限速：突发之后按速率放行"""
+    bucket = TokenBucket(rate=50, burst=2)
+
+    begin = time.monotonic()
+    for _ in range(6):
+        bucket.acquire()
+    elapsed = time.monotonic() - begin
+
+    # 2个突发令牌 + 4个令牌以50/s补充，约0.08s
+    assert elapsed >= 0.06
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_executor_map_concurrent():
+    """测试并发执行：结果保序、去重，慢任务不阻塞其他任务，异常任务返回None"""
+    def work(key):
+        if key == "bad":
+            raise RuntimeError("boom")
+        time.sleep(0.2 if key == "slow" else 0.01)
+        return key.upper()
+
+    executor = FetchExecutor(max_workers=4, rate_limit=None)
+
+    begin = time.monotonic()
+    results = executor.map(work, ["slow", "a", "b", "a", "bad", "c"])
+    elapsed = time.monotonic() - begin
+
+    assert list(results) == ["slow", "a", "b", "bad", "c"]
+    assert results["slow"] == "SLOW"
+    assert results["bad"] is None
+    assert elapsed < 0.35
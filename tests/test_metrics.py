@@ -10,7 +10,10 @@ from volrisk.metrics import (
     total_volatility_annual,
     max_drawdown,
     calculate_all_metrics,
-    validate_data_quality
+    validate_data_quality,
+    panel_metrics,
+    price_panel,
+    rolling_metrics
 )
 
 
@@ -102,3 +105,53 @@ def test_semidev_only_downside():
 
     # 应该明显大于只上涨的情况
     assert sigma_down_mixed > sigma_down_up
+
+
+def test_panel_metrics_matches_series():
+    """测试价格矩阵批量指标与逐个序列计算一致（日历不同、有停牌）"""
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range("2024-01-01", periods=300)
+    prices = {}
+    for i in range(4):
+        series = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, 300)), index=index)
+        prices[f"T{i}"] = series.iloc[i * 30:]
+    prices["T2"] = prices["T2"].drop(prices["T2"].index[50:60])
+
+    result = panel_metrics(price_panel(prices), mar=0.001)
+
+    for ticker, series in prices.items():
+        expected = calculate_all_metrics(series, mar=0.001)
+        row = result.loc[ticker]
+        for key in ['sigma_total', 'sigma_down', 'mdd']:
+            assert row[key] == pytest.approx(expected[key], rel=1e-12)
+        assert row['sample_days'] == expected['sample_days']
+        assert row['trading_days'] == expected['trading_days']
+        assert row['start_date'] == str(series.index[0].date())
+        assert row['end_date'] == str(series.index[-1].date())
+
+    # ndarray 输入与全空列
+    values = price_panel(prices).to_numpy()
+    values = np.column_stack([values, np.full(len(values), np.nan)])
+    array_result = panel_metrics(values)
+    assert array_result.loc[0, 'mdd'] == pytest.approx(result.loc["T0", 'mdd'])
+    assert array_result.loc[4, 'sample_days'] == 0
+    assert np.isnan(array_result.loc[4, 'sigma_down'])
+
+
+def test_rolling_metrics_matches_windows():
+    """测试滚动指标与逐窗口计算一致"""
+    rng = np.random.default_rng(1)
+    index = pd.bdate_range("2024-01-01", periods=200)
+    prices = pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, 200)), index=index)
+
+    for window in [3, 20, 60]:
+        result = rolling_metrics(prices, window, mar=0.001)
+        assert result.iloc[:window - 1][['sigma_down', 'mdd']].isna().all().all()
+
+        for i in range(window - 1, len(prices), 7):
+            expected = calculate_all_metrics(prices.iloc[i - window + 1:i + 1], mar=0.001)
+            row = result.iloc[i]
+            assert row['sigma_total'] == pytest.approx(expected['sigma_total'], rel=1e-9)
+            assert row['sigma_down'] == pytest.approx(expected['sigma_down'], rel=1e-9)
+            assert row['mdd'] == pytest.approx(expected['mdd'], rel=1e-12)
+            assert row['running_mdd'] == pytest.approx(max_drawdown(prices.iloc[:i + 1]))
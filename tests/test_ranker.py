@@ -0,0 +1,198 @@
+"""
+测试排名输出模块
+"""
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+from volrisk.expected import calculate_expected_return
+from volrisk.incremental import analyze_incremental
+from volrisk.ranker import CompaniesConfig, Ranker
+from volrisk.risk import calculate_risk
+from volrisk.sector import SectorAnalyzer, SectorMetrics
+
+
+class NoFetcher:
+    """不允许下载的数据获取器"""
+
+    def fetch_multiple(self, tickers, **kwargs):
+        raise AssertionError(f"不应下载: {tickers}")
+
+
+def _sector_metrics():
+    return {
+        "S1": SectorMetrics("S1", ["ETF1"], [1.0], 0.20, 0.25, -0.30, 250, 249),
+        "S2": SectorMetrics("S2", ["ETF2", "ETF3"], [0.5, 0.5], 0.15, 0.22, -0.18, 250, 249),
+    }
+
+
+def _companies():
+    return CompaniesConfig(companies=[
+        {"name": "甲", "sector": "S1", "expected_return": 0.20,
+         "risk": {"mode": "SchemeC", "beta": 1.2, "frag": 1.0}},
+        {"name": "乙", "sector": "S2",
+         "model": {"type": "PE", "current_multiple": 10, "target_multiple": 14,
+                   "growth_12m": 0.1, "dividend_yield": 0.03, "execution_prob": 0.7},
+         "risk": {"mode": "SemiMDD", "idio": 1.1, "w": 0.5, "fragility_add": 0.02}},
+        {"name": "丙", "sector_mix": {"S1": 0.4, "S2": 0.6}, "expected_return": 0.35,
+         "risk": {"mode": "SchemeC",
+                  "scheme_c_weights": {"w_down": 0.5, "w_beta": 0.4, "w_frag": 0.1}}},
+        {"name": "丁", "sector": "S9", "expected_return": 0.5},
+        {"name": "戊", "sector": "S1"},
+    ])
+
+
+def test_analyze_companies_columnar():
+    """测试结果表为数值列，与逐个计算一致，无效公司被跳过"""
+    sectors = _sector_metrics()
+    companies = _companies()
+    ranker = Ranker(sector_analyzer=SectorAnalyzer(data_fetcher=NoFetcher()))
+    table = ranker.analyze_companies(companies, sectors)
+
+    assert list(table['name']) == ["甲", "乙", "丙"]
+    assert isinstance(table['sector_info'].dtype, pd.CategoricalDtype)
+    assert table['loss_risk'].dtype == np.float64
+
+    mixed = ranker.sector_analyzer.calculate_mixed_sector_metrics({"S1": 0.4, "S2": 0.6}, sectors)
+    inputs = [sectors["S1"].__dict__, sectors["S2"].__dict__, mixed]
+    for row, company, metrics in zip(table.itertuples(), companies.companies, inputs):
+        risk = calculate_risk(metrics['sigma_down'], metrics['sigma_total'], metrics['mdd'], company.risk)
+        er, _ = calculate_expected_return(company.expected_return, company.model)
+        assert row.loss_risk == pytest.approx(risk['total_risk'])
+        assert row.er == pytest.approx(er)
+        assert row.value_to_risk == pytest.approx(er / risk['total_risk'])
+
+
+def test_rank_and_export(tmp_path):
+    """测试按值博率降序排名，导出时才格式化"""
+    ranker = Ranker(sector_analyzer=SectorAnalyzer(data_fetcher=NoFetcher()))
+    table = ranker.analyze_companies(_companies(), _sector_metrics())
+
+    ranked = Ranker.rank(table)
+    assert list(ranked['rank']) == [1, 2, 3]
+    assert ranked['value_to_risk'].is_monotonic_decreasing
+
+    output = tmp_path / "rank.csv"
+    df = ranker.rank_and_export(table, str(output), format="csv")
+    assert list(df['公司名称']) == list(ranked['name'])
+    assert df['值博率'].dtype == np.float64
+    assert pd.read_csv(output)['值博率'].tolist() == pytest.approx(ranked['value_to_risk'].tolist())
+
+    ranker.rank_and_export(table, str(tmp_path / "rank.xlsx"), format="xlsx", sector_metrics=_sector_metrics())
+    sheets = pd.read_excel(tmp_path / "rank.xlsx", sheet_name=None)
+    assert list(sheets) == ['排名汇总', '详细计算', '行业风险数据', 'Scheme C分解']
+    assert len(sheets['Scheme C分解']) == 2
+    assert sheets['排名汇总']['损失风险'].dtype == np.float64
+
+    # 行业按σ下行数值排序，单元格带数字格式
+    sector_sheet = sheets['行业风险数据']
+    assert sector_sheet['σ下行(年化)'].is_monotonic_increasing
+    workbook = openpyxl.load_workbook(tmp_path / "rank.xlsx")
+    assert workbook['排名汇总']['J2'].number_format == '0.00'
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_export_columnar(tmp_path, format):
+    """测试parquet/arrow输出：完整结果表与行业指标表分别写出，类型保留"""
+    pa = pytest.importorskip("pyarrow")
+    ranker = Ranker(sector_analyzer=SectorAnalyzer(data_fetcher=NoFetcher()))
+    table = ranker.analyze_companies(_companies(), _sector_metrics())
+
+    output = tmp_path / f"rank.{format}"
+    ranker.rank_and_export(table, str(output), format=format, sector_metrics=_sector_metrics())
+
+    if format == "parquet":
+        ranked = pd.read_parquet(output)
+        sectors = pd.read_parquet(tmp_path / "rank.sectors.parquet")
+    else:
+        with pa.memory_map(str(output)) as source:
+            ranked = pa.ipc.open_file(source).read_all().to_pandas()
+        sectors = pd.read_feather(tmp_path / "rank.sectors.arrow")
+
+    assert list(ranked['rank']) == [1, 2, 3]
+    assert isinstance(ranked['sector_info'].dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(ranked['loss_risk'], Ranker.rank(table)['loss_risk'])
+    assert 'beta_component' in ranked.columns
+    assert list(sectors['sector']) == ["S1", "S2"]
+    assert sectors['sigma_down'].dtype == np.float64
+
+
+def test_analyze_incremental(tmp_path):
+    """测试增量排名：只重新计算变化的公司，结果与全部重新计算一致"""
+    ranker = Ranker(sector_analyzer=SectorAnalyzer(data_fetcher=NoFetcher()))
+    state_path = tmp_path / "state.json"
+    params = {'period': '3y'}
+
+    table, stats = analyze_incremental(ranker, _companies(), _sector_metrics(), state_path, params)
+    assert stats['full'] and stats['recomputed'] == 5
+    pd.testing.assert_frame_equal(table, ranker.analyze_companies(_companies(), _sector_metrics()))
+
+    # 只改一家公司的预期收益
+    companies = _companies()
+    companies.companies[0].expected_return = 0.30
+    table, stats = analyze_incremental(ranker, companies, _sector_metrics(), state_path, params)
+    assert not stats['full']
+    assert stats['recomputed'] == 3  # 甲 + 上次失败的丁、戊
+    assert stats['reused'] == 2
+    pd.testing.assert_frame_equal(table, ranker.analyze_companies(companies, _sector_metrics()))
+
+    # 行业指标变化：使用该行业的公司（乙、丙）重新计算
+    sectors = _sector_metrics()
+    sectors["S2"].sigma_down = 0.18
+    table, stats = analyze_incremental(ranker, companies, sectors, state_path, params)
+    assert stats['reused'] == 1
+    pd.testing.assert_frame_equal(table, ranker.analyze_companies(companies, sectors))
+
+    # 运行参数变化时全部重新计算
+    _, stats = analyze_incremental(ranker, companies, sectors, state_path, {'period': '5y'})
+    assert stats['full']
+
+
+def test_analyze_incremental_blend(tmp_path):
+    """测试blend合成时增量结果与全部重新计算一致（多行业组合的行业日历不同）"""
+    rng = np.random.default_rng(11)
+    index = pd.bdate_range("2024-01-01", periods=260)
+    prices = {
+        name: pd.Series(100 * np.cumprod(1 + rng.normal(0.0005, 0.015, 260)), index=index)
+        for name in ["E1", "E2", "E3"]
+    }
+    prices["E3"] = prices["E3"].iloc[60:]  # 较短的历史
+    analyzer = SectorAnalyzer(data_fetcher=NoFetcher())
+    sectors = {
+        name: analyzer.calculate_sector_metrics(name, [ticker], [1.0], prices=prices, min_days=100)
+        for name, ticker in [("S1", "E1"), ("S2", "E2"), ("S3", "E3")]
+    }
+    companies = CompaniesConfig(companies=[
+        {"name": "甲", "sector_mix": {"S1": 0.6, "S2": 0.4}, "expected_return": 0.2},
+        {"name": "乙", "sector_mix": {"S1": 0.5, "S3": 0.5}, "expected_return": 0.3},
+        {"name": "丙", "sector_mix": {"S2": 0.3, "S3": 0.7}, "expected_return": 0.25},
+    ])
+
+    ranker = Ranker(sector_analyzer=analyzer)
+    state_path = tmp_path / "state.json"
+    analyze_incremental(ranker, companies, sectors, state_path, {}, method="blend")
+
+    # 只改使用较长日历行业的甲，单独重新计算的结果须与全部重新计算一致
+    companies.companies[0].expected_return = 0.22
+    table, stats = analyze_incremental(ranker, companies, sectors, state_path, {}, method="blend")
+    assert stats['recomputed'] == 1 and stats['reused'] == 2
+    pd.testing.assert_frame_equal(
+        table, ranker.analyze_companies(companies, sectors, method="blend")
+    )
+
+
+def test_export_excel_chunked(tmp_path):
+    """测试Excel按块构建写出与整表写出结果相同（可选列由完整结果表决定）"""
+    ranker = Ranker(sector_analyzer=SectorAnalyzer(data_fetcher=NoFetcher()))
+    ranked = Ranker.rank(ranker.analyze_companies(_companies(), _sector_metrics()))
+
+    ranker._export_detailed_excel(ranked, tmp_path / "whole.xlsx", _sector_metrics())
+    ranker._export_detailed_excel(ranked, tmp_path / "chunked.xlsx", _sector_metrics(), chunk_size=1)
+
+    whole = pd.read_excel(tmp_path / "whole.xlsx", sheet_name=None)
+    chunked = pd.read_excel(tmp_path / "chunked.xlsx", sheet_name=None)
+    assert list(chunked) == list(whole)
+    for name in whole:
+        pd.testing.assert_frame_equal(chunked[name], whole[name])
+    assert 'Idio' in chunked['排名汇总'].columns and 'Beta' in chunked['排名汇总'].columns
@@ -2,13 +2,17 @@
 测试风险计算模块
 """
 
+import numpy as np
 import pytest
 from volrisk.risk import (
     risk_semimdd,
     risk_scheme_c,
     calculate_risk,
+    calculate_risk_batch,
+    scheme_c_loss_risk_batch,
     RiskConfig,
-    RiskCalculator
+    RiskCalculator,
+    SchemeC_Weights
 )
 
 
@@ -133,3 +137,39 @@ def test_risk_config_validation():
     assert config3.w == 0.5
     assert config3.idio == 1.0
     assert config3.fragility_add == 0.0
+
+
+def test_calculate_risk_batch_matches_scalar():
+    """测试批量风险计算与逐个计算结果一致（SemiMDD与SchemeC混合）"""
+    rng = np.random.default_rng(0)
+    n = 40
+    sigma_down = rng.uniform(0.1, 0.4, n)
+    sigma_total = rng.uniform(0.15, 0.5, n)
+    mdd = -rng.uniform(0.1, 0.6, n)
+
+    configs = []
+    for i in range(n):
+        if i % 3 == 0:
+            configs.append(RiskConfig(mode="SemiMDD", idio=0.9, w=0.4, fragility_add=0.02))
+        elif i % 3 == 1:
+            configs.append(RiskConfig(mode="SchemeC", beta=0.5 + i / n, frag=1.5))
+        else:
+            configs.append(RiskConfig(
+                mode="SchemeC",
+                scheme_c_weights=SchemeC_Weights(w_down=0.5, w_beta=0.4, w_frag=0.1)
+            ))
+
+    batch = calculate_risk_batch(sigma_down, sigma_total, mdd, configs)
+    for i, config in enumerate(configs):
+        expected = calculate_risk(sigma_down[i], sigma_total[i], mdd[i], config)
+        assert batch['total_risk'][i] == expected['total_risk']
+        assert batch['downside_component'][i] == expected['downside_component']
+        if config.mode == "SchemeC":
+            assert batch['beta_component'][i] == expected['beta_component']
+            assert batch['beta'][i] == expected['params']['beta']
+        else:
+            assert batch['mdd_component'][i] == expected['mdd_component']
+
+    # 逐行权重之和不为1时报错
+    with pytest.raises(ValueError):
+        scheme_c_loss_risk_batch(sigma_down[:2], sigma_total[:2], weights=np.array([[0.6, 0.3, 0.1], [0.5, 0.5, 0.1]]))
@@ -0,0 +1,192 @@
+"""
+测试行业ETF处理模块
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from volrisk.covariance import SectorCovariance
+from volrisk.metrics import calculate_all_metrics
+from volrisk.sector import SectorAnalyzer, SectorsConfig
+from volrisk.watch import update_sector_metrics
+
+
+class NoFetcher:
+    """不允许下载的数据获取器（价格全部由测试传入）"""
+
+    def fetch_multiple(self, tickers, **kwargs):
+        raise AssertionError(f"不应下载: {tickers}")
+
+
+class PricesFetcher:
+    """返回给定价格并记录请求的数据获取器"""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.requests = []
+
+    def fetch_multiple(self, tickers, **kwargs):
+        self.requests.append(list(tickers))
+        return {t: self.prices[t] for t in tickers if t in self.prices}
+
+
+def _prices():
+    """三个ETF：B与A负相关，C与A完全相同但少了几个交易日"""
+    rng = np.random.default_rng(5)
+    index = pd.bdate_range("2024-01-01", periods=260)
+    noise = rng.normal(0, 0.015, 260)
+    a = pd.Series(100 * np.cumprod(1 + noise + 0.001), index=index)
+    b = pd.Series(100 * np.cumprod(1 - noise + 0.001), index=index)
+    c = a.drop(index[[10, 11, 100]])
+    return {"A": a, "B": b, "C": c}
+
+
+def test_sector_blend_method():
+    """测试blend模式按组合收益率计算，负相关时低于线性加权"""
+    prices = _prices()
+    analyzer = SectorAnalyzer(data_fetcher=NoFetcher())
+
+    weighted = analyzer.calculate_sector_metrics(
+        "AB", ["A", "B"], [0.5, 0.5], prices=prices, min_days=100
+    )
+    blended = analyzer.calculate_sector_metrics(
+        "AB", ["A", "B"], [0.5, 0.5], prices=prices, min_days=100, method="blend"
+    )
+    assert blended.sigma_down < 0.5 * weighted.sigma_down
+    assert abs(blended.mdd) < abs(weighted.mdd)
+    assert weighted.returns.equals(blended.returns)
+
+    # 单ETF时两种方式一致
+    single = analyzer.calculate_sector_metrics(
+        "A", ["A"], [1.0], prices=prices, min_days=100, method="blend"
+    )
+    expected = calculate_all_metrics(prices["A"])
+    assert single.sigma_down == pytest.approx(expected['sigma_down'])
+    assert single.mdd == pytest.approx(expected['mdd'])
+
+    # 共同日历：C缺失的交易日被剔除
+    ac = analyzer.calculate_sector_metrics(
+        "AC", ["A", "C"], [0.5, 0.5], prices=prices, min_days=100, method="blend"
+    )
+    assert ac.sample_days == len(prices["C"])
+
+
+def test_mixed_sector_blend_cache():
+    """测试多行业组合收益率结果按sector_mix缓存复用"""
+    prices = _prices()
+    analyzer = SectorAnalyzer(data_fetcher=NoFetcher())
+    sectors = {
+        name: analyzer.calculate_sector_metrics(name, [name], [1.0], prices=prices, min_days=100)
+        for name in ["A", "B"]
+    }
+
+    first = analyzer.calculate_mixed_sector_metrics({"A": 0.6, "B": 0.4}, sectors, method="blend")
+    again = analyzer.calculate_mixed_sector_metrics({"B": 0.4, "A": 0.6}, sectors, method="blend")
+    assert again is first
+
+    linear = analyzer.calculate_mixed_sector_metrics({"A": 0.6, "B": 0.4}, sectors)
+    assert first['sigma_down'] < linear['sigma_down']
+    assert len(first['returns']) == len(prices["A"]) - 1
+
+
+def test_covariance_batch_matches_blend():
+    """测试协方差引擎批量结果与逐个组合收益率计算一致"""
+    prices = _prices()
+    analyzer = SectorAnalyzer(data_fetcher=NoFetcher())
+    sectors = {
+        name: analyzer.calculate_sector_metrics(name, [name], [1.0], prices=prices, min_days=100)
+        for name in ["A", "B"]
+    }
+
+    mixes = [{"A": w, "B": 1 - w} for w in np.linspace(0, 1, 11)] + [{"A": 0.5, "X": 0.5}]
+    batch = analyzer.calculate_mixed_sector_metrics_batch(mixes, sectors, method="blend")
+
+    assert batch[-1] is None
+    for mix, result in zip(mixes[:-1], batch):
+        expected = analyzer.calculate_mixed_sector_metrics(mix, sectors, method="blend")
+        for key in ['sigma_down', 'sigma_total', 'mdd']:
+            assert result[key] == pytest.approx(expected[key], rel=1e-9)
+
+    # 线性加权的批量结果
+    weighted = analyzer.calculate_mixed_sector_metrics_batch(mixes[:3], sectors)
+    expected = analyzer.calculate_mixed_sector_metrics(mixes[2], sectors)
+    assert weighted[2]['sigma_down'] == pytest.approx(expected['sigma_down'])
+
+    # 半协方差二次型是近似值，单一行业时与精确值相同
+    engine = SectorCovariance.from_sector_metrics(sectors)
+    weights = engine.exposures(mixes[:-1])
+    approx = engine.sigma_down(weights, exact=False)
+    exact = engine.sigma_down(weights)
+    assert approx[[0, -1]] == pytest.approx(exact[[0, -1]])
+    assert np.allclose(engine.covariance, engine.covariance.T)
+
+
+def test_covariance_batch_independent_of_other_mixes():
+    """测试批量blend中每个组合只使用自己行业的共同日历，不受批次中其他组合影响"""
+    prices = _prices()
+    analyzer = SectorAnalyzer(data_fetcher=NoFetcher())
+    sectors = {
+        name: analyzer.calculate_sector_metrics(name, [name], [1.0], prices=prices, min_days=100)
+        for name in ["A", "B", "C"]
+    }
+
+    # C 比 A、B 少几个交易日
+    mixes = [{"A": 0.7, "B": 0.3}, {"A": 0.5, "C": 0.5}, {"B": 0.6, "A": 0.4}]
+    alone = analyzer.calculate_mixed_sector_metrics_batch(mixes[:1], sectors, method="blend")
+    batch = analyzer.calculate_mixed_sector_metrics_batch(mixes, sectors, method="blend")
+
+    for key in ['sigma_down', 'sigma_total', 'mdd']:
+        assert batch[0][key] == pytest.approx(alone[0][key], rel=1e-12)
+    for mix, result in zip(mixes, batch):
+        expected = analyzer.calculate_mixed_sector_metrics(mix, sectors, method="blend")
+        for key in ['sigma_down', 'sigma_total', 'mdd']:
+            assert result[key] == pytest.approx(expected[key], rel=1e-9)
+
+
+def test_calculate_all_sectors_parallel():
+    """测试并发计算行业：共用ETF只获取一次，结果与逐个计算一致且按配置顺序"""
+    config = SectorsConfig(sectors={
+        "Z": {"tickers": ["A"], "weights": [1.0]},
+        "AB": {"tickers": ["A", "B"], "weights": [0.5, 0.5]},
+        "BAD": {"tickers": ["A"], "weights": [0.5]},
+        "AC": {"tickers": ["C", "A"], "weights": [0.3, 0.7]},
+        "M": {"tickers": ["A", "X"], "weights": [0.5, 0.5]},
+    })
+
+    fetcher = PricesFetcher(_prices())
+    sequential = SectorAnalyzer(data_fetcher=fetcher).calculate_all_sectors(config, min_days=100)
+    assert fetcher.requests[0] == ["A", "B", "C", "X"]
+
+    parallel = SectorAnalyzer(data_fetcher=PricesFetcher(_prices())).calculate_all_sectors(
+        config, max_workers=4, min_days=100
+    )
+    assert list(parallel) == list(sequential) == ["Z", "AB", "AC"]
+    for name, metrics in sequential.items():
+        assert parallel[name].sigma_down == metrics.sigma_down
+        assert parallel[name].mdd == metrics.mdd
+
+
+def test_update_sector_metrics():
+    """测试只重新计算新增或定义变化的行业，删除的行业移除"""
+    fetcher = PricesFetcher(_prices())
+    analyzer = SectorAnalyzer(data_fetcher=fetcher)
+    old = SectorsConfig(sectors={
+        "S1": {"tickers": ["A"], "weights": [1.0]},
+        "S2": {"tickers": ["B"], "weights": [1.0]},
+        "S3": {"tickers": ["A", "B"], "weights": [0.5, 0.5]},
+    })
+    metrics = analyzer.calculate_all_sectors(old, min_days=100)
+
+    new = SectorsConfig(sectors={
+        "S1": {"tickers": ["A"], "weights": [1.0]},
+        "S2": {"tickers": ["C"], "weights": [1.0]},
+        "S4": {"tickers": ["A", "C"], "weights": [0.5, 0.5]},
+    })
+    fetcher.requests.clear()
+    updated, changed = update_sector_metrics(analyzer, old, new, metrics, min_days=100)
+
+    assert changed == ["S2", "S4"]
+    assert list(updated) == ["S1", "S2", "S4"]
+    assert updated["S1"] is metrics["S1"]
+    assert updated["S2"].tickers == ["C"]
+    assert fetcher.requests[0] == ["C", "A"]
@@ -0,0 +1,69 @@
+"""
+测试流式指标模块
+"""
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from volrisk.metrics import calculate_all_metrics
+from volrisk.streaming import MetricsAccumulator
+
+
+def _prices(n=300, seed=2):
+    rng = np.random.default_rng(seed)
+    return pd.Series(100 * np.cumprod(1 + rng.normal(0, 0.02, n)))
+
+
+def _assert_matches(acc, prices, mar):
+    expected = calculate_all_metrics(prices, mar)
+    result = acc.metrics()
+    for key in ['sigma_total', 'sigma_down', 'mdd']:
+        assert result[key] == pytest.approx(expected[key], rel=1e-9)
+    assert result['sample_days'] == expected['sample_days']
+    assert result['trading_days'] == expected['trading_days']
+
+
+def test_accumulator_stream_and_batch():
+    """测试逐个价格与批量加入的结果都与整段计算一致"""
+    prices = _prices()
+
+    streamed = MetricsAccumulator(mar=0.001)
+    for price in prices:
+        streamed.update(price)
+    _assert_matches(streamed, prices, 0.001)
+
+    batched = MetricsAccumulator(mar=0.001).update_many(prices[:100]).update_many(prices[100:])
+    _assert_matches(batched, prices, 0.001)
+
+
+def test_accumulator_merge_shards():
+    """测试分片并行计算后合并与整段计算一致（回撤跨分片）"""
+    # 前段创新高，后段先跌破前段高点再创新高
+    prices = pd.Series([100, 120, 110, 115, 90, 95, 130, 100, 125, 80, 140])
+    for split in range(1, len(prices)):
+        merged = MetricsAccumulator.from_prices(prices[:split])
+        merged.merge(MetricsAccumulator.from_prices(prices[split:]))
+        _assert_matches(merged, prices, 0.0)
+
+    prices = _prices(1000, seed=3)
+    shards = [MetricsAccumulator.from_prices(prices[i:i + 137]) for i in range(0, 1000, 137)]
+    merged = MetricsAccumulator()
+    for shard in shards:
+        merged.merge(shard)
+    _assert_matches(merged, prices, 0.0)
+
+
+def test_accumulator_serialize():
+    """测试状态序列化后继续更新"""
+    prices = _prices()
+    acc = MetricsAccumulator.from_prices(prices[:200], mar=0.001)
+
+    restored = MetricsAccumulator.from_dict(json.loads(json.dumps(acc.to_dict())))
+    for price in prices[200:]:
+        restored.update(price)
+
+    _assert_matches(restored, prices, 0.001)
+
+    with pytest.raises(ValueError):
+        restored.merge(MetricsAccumulator.from_prices(prices, mar=0.0))
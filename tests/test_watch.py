@@ -0,0 +1,28 @@
+"""
+测试监视模块
+"""
+
+import os
+from volrisk.watch import ConfigWatcher
+
+
+def test_config_watcher(tmp_path):
+    """测试只报告内容保存过的文件，文件暂时不存在时不算变化"""
+    companies = tmp_path / "companies.yml"
+    sectors = tmp_path / "sectors.yml"
+    companies.write_text("companies: []\n", encoding='utf-8')
+    sectors.write_text("sectors: {}\n", encoding='utf-8')
+
+    watcher = ConfigWatcher([companies, sectors])
+    assert watcher.poll() == []
+
+    companies.write_text("companies: [1]\n", encoding='utf-8')
+    assert watcher.poll() == [companies]
+    assert watcher.poll() == []
+
+    sectors.unlink()
+    assert watcher.poll() == []
+    sectors.write_text("sectors: {}\n", encoding='utf-8')
+    stat = sectors.stat()
+    os.utime(sectors, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert watcher.poll() == [sectors]
@@ -1,11 +1,12 @@
 """
 β回归计算模块
-使用OLS回归或鲁棒回归计算个股相对行业的敏感度系数
+使用OLS回归或鲁棒回归计算个股相对行业的敏感度系数，支持全市场批量向量化计算
 """
 
+import hashlib
 import numpy as np
 import pandas as pd
-from typing import Optional, Literal
+from typing import Dict, Optional, Literal, Union
 import warnings
 
 
@@ -147,9 +148,10 @@ def beta_huber(
 def calculate_beta(
     stock_returns: pd.Series,
     sector_returns: pd.Series,
-    method: Literal['OLS', 'Huber'] = 'OLS',
+    method: Literal['OLS', 'Huber', 'Downside', 'CoSemi'] = 'OLS',
     min_overlap: int = 50,
-    fallback_beta: Optional[float] = None
+    fallback_beta: Optional[float] = None,
+    mar: float = 0.0
 ) -> tuple[float, dict]:
     """
     计算个股相对行业的β系数
@@ -157,9 +159,10 @@ def calculate_beta(
     Args:
         stock_returns: 个股收益率序列
         sector_returns: 行业收益率序列
-        method: 回归方法，'OLS' 或 'Huber'
+        method: 回归方法，'OLS'、'Huber'、'Downside'（下行β）或 'CoSemi'（协半方差β）
         min_overlap: 最少重叠天数
         fallback_beta: 回归失败时的备用β值
+        mar: 最低可接受收益（Downside/CoSemi使用）
 
     Returns:
         (beta, regression_info)
@@ -172,6 +175,10 @@ def calculate_beta(
             return beta_ols(stock_returns, sector_returns, min_overlap)
         elif method == 'Huber':
             return beta_huber(stock_returns, sector_returns, min_overlap)
+        elif method == 'Downside':
+            return beta_downside(stock_returns, sector_returns, mar, min_overlap)
+        elif method == 'CoSemi':
+            return beta_cosemi(stock_returns, sector_returns, mar, min_overlap)
         else:
             raise ValueError(f"不支持的回归方法: {method}")
 
@@ -190,13 +197,409 @@ def calculate_beta(
             raise ValueError(f"β回归失败且未提供备用β: {e}")
 
 
+def _masked_moments(y: np.ndarray, x: np.ndarray, mask: Optional[np.ndarray] = None) -> dict:
+    """
+    逐列计算 y 对 x 回归所需的矩
+
+    Args:
+        y: 日期×股票 的个股收益率矩阵
+        x: 日期×股票 的对应行业收益率矩阵（已按股票映射展开）
+        mask: 参与计算的日期掩码，默认为两者都非NaN的日期
+
+    Returns:
+        字典：mask, n, mean_x, mean_y, dx, dy（去均值且无效处为0）,
+        sxx, sxy, syy（离差平方和/交叉积和）
+    """
+    if mask is None:
+        mask = ~np.isnan(y) & ~np.isnan(x)
+    n = mask.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        count = np.where(n > 0, n, np.nan)
+        mean_x = np.where(mask, x, 0.0).sum(axis=0) / count
+        mean_y = np.where(mask, y, 0.0).sum(axis=0) / count
+
+    dx = np.where(mask, x - mean_x, 0.0)
+    dy = np.where(mask, y - mean_y, 0.0)
+
+    return {
+        'mask': mask,
+        'n': n,
+        'mean_x': mean_x,
+        'mean_y': mean_y,
+        'dx': dx,
+        'dy': dy,
+        'sxx': (dx * dx).sum(axis=0),
+        'sxy': (dx * dy).sum(axis=0),
+        'syy': (dy * dy).sum(axis=0)
+    }
+
+
+def _align_batch(
+    stock_returns: pd.DataFrame,
+    sector_returns: pd.DataFrame,
+    sector_map: Dict[str, str]
+) -> tuple[list, np.ndarray, np.ndarray]:
+    """
+    将个股与其映射行业的收益率对齐为两个同形矩阵
+
+    Returns:
+        (股票列表, 个股收益率矩阵, 对应行业收益率矩阵)，只包含映射行业存在的股票
+    """
+    stocks = [
+        stock for stock in stock_returns.columns
+        if sector_map.get(stock) in sector_returns.columns
+    ]
+    index = stock_returns.index.union(sector_returns.index)
+    y = stock_returns.reindex(index=index, columns=stocks).to_numpy(dtype=float)
+
+    sectors = sector_returns.reindex(index=index)
+    position = {sector: i for i, sector in enumerate(sectors.columns)}
+    x = sectors.to_numpy(dtype=float)[:, [position[sector_map[stock]] for stock in stocks]]
+
+    return stocks, y, x
+
+
+def _aligned_pair(stock_returns: pd.Series, sector_returns: pd.Series) -> pd.DataFrame:
+    """对齐个股与行业收益率（取交集）"""
+    return pd.DataFrame({'stock': stock_returns, 'sector': sector_returns}).dropna()
+
+
+def beta_batch(
+    stock_returns: pd.DataFrame,
+    sector_returns: pd.DataFrame,
+    sector_map: Dict[str, str],
+    mar: float = 0.0,
+    min_overlap: int = 50
+) -> pd.DataFrame:
+    """
+    批量计算所有股票相对各自行业的各类β（一次对齐、向量化）
+
+    - OLS: Cov(r_i, r_s) / Var(r_s)，与 beta_ols 一致
+    - Downside: 只用行业收益低于MAR的日期回归，即 Cov(r_i, r_s | r_s<MAR) / Var(r_s | r_s<MAR)
+    - CoSemi: 协半方差β，E[min(r_i-MAR,0)·min(r_s-MAR,0)] / E[min(r_s-MAR,0)²]
+
+    Args:
+        stock_returns: 日期×股票 的收益率矩阵
+        sector_returns: 日期×行业 的收益率矩阵
+        sector_map: 股票 -> 行业 的映射
+        mar: 最低可接受收益（Downside/CoSemi使用）
+        min_overlap: 最少重叠天数，不足的股票结果为NaN
+
+    Returns:
+        DataFrame，每行一只股票，列为 sector, n_obs, alpha, beta, r_squared, std_err,
+        beta_downside, n_down, beta_cosemi；映射行业缺失的股票不出现在结果中
+    """
+    stocks, y, x = _align_batch(stock_returns, sector_returns, sector_map)
+
+    # OLS
+    moments = _masked_moments(y, x)
+    mask, n = moments['mask'], moments['n']
+    sxx, sxy, syy = moments['sxx'], moments['sxy'], moments['syy']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta = np.where(sxx > 0, sxy / sxx, np.nan)
+        alpha = moments['mean_y'] - beta * moments['mean_x']
+
+        # 残差平方和 = Syy - β·Sxy
+        ss_res = np.maximum(syy - beta * sxy, 0.0)
+        r_squared = np.where(syy > 0, 1 - ss_res / syy, 0.0)
+        std_err = np.where(n > 2, np.sqrt(ss_res / (n - 2) / sxx), np.nan)
+
+    # Downside：同一对齐矩阵，行业收益低于MAR的子样本
+    down = _masked_moments(y, x, mask & (np.nan_to_num(x, nan=np.inf) < mar))
+    n_down = down['n']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta_downside = np.where(
+            (down['sxx'] > 0) & (n_down > 2), down['sxy'] / down['sxx'], np.nan
+        )
+
+    # CoSemi：低于MAR部分的协半方差
+    semi_x = np.where(mask, np.minimum(x - mar, 0.0), 0.0)
+    semi_y = np.where(mask, np.minimum(y - mar, 0.0), 0.0)
+    semi_xx = (semi_x * semi_x).sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        beta_cosemi = np.where(semi_xx > 0, (semi_x * semi_y).sum(axis=0) / semi_xx, np.nan)
+
+    insufficient = n < min_overlap
+    for values in (beta, alpha, r_squared, std_err, beta_downside, beta_cosemi):
+        values[insufficient] = np.nan
+
+    return pd.DataFrame({
+        'sector': [sector_map[stock] for stock in stocks],
+        'n_obs': n,
+        'alpha': alpha,
+        'beta': beta,
+        'r_squared': r_squared,
+        'std_err': std_err,
+        'beta_downside': beta_downside,
+        'n_down': n_down,
+        'beta_cosemi': beta_cosemi
+    }, index=pd.Index(stocks, name='ticker'))
+
+
+def beta_ols_batch(
+    stock_returns: pd.DataFrame,
+    sector_returns: pd.DataFrame,
+    sector_map: Dict[str, str],
+    min_overlap: int = 50
+) -> pd.DataFrame:
+    """
+    批量OLS回归：所有股票相对各自行业的β一次向量化计算
+
+    每只股票的结果与 beta_ols(个股收益率, 所属行业收益率) 一致
+
+    Returns:
+        DataFrame，每行一只股票，列为 sector, alpha, beta, r_squared, std_err, n_obs, method
+    """
+    result = beta_batch(stock_returns, sector_returns, sector_map, min_overlap=min_overlap)
+    result = result[['sector', 'alpha', 'beta', 'r_squared', 'std_err', 'n_obs']]
+    return result.assign(method='OLS')
+
+
+def _single_beta(
+    stock_returns: pd.Series,
+    sector_returns: pd.Series,
+    column: str,
+    count_column: str,
+    method: str,
+    mar: float,
+    min_overlap: int
+) -> tuple[float, dict]:
+    """用批量估计器计算单只股票的下行类β"""
+    aligned = _aligned_pair(stock_returns, sector_returns)
+    if len(aligned) < min_overlap:
+        raise ValueError(
+            f"重叠样本不足：需要至少{min_overlap}天，实际{len(aligned)}天"
+        )
+
+    row = beta_batch(
+        aligned[['stock']], aligned[['sector']], {'stock': 'sector'}, mar, min_overlap
+    ).iloc[0]
+    beta = row[column]
+    if np.isnan(beta):
+        raise ValueError(f"行业收益低于MAR的样本不足，无法计算{method}β")
+
+    return beta, {
+        'alpha': np.nan,
+        'beta': beta,
+        'r_squared': np.nan,
+        'n_obs': int(row[count_column]),
+        'mar': mar,
+        'method': method
+    }
+
+
+def beta_downside(
+    stock_returns: pd.Series,
+    sector_returns: pd.Series,
+    mar: float = 0.0,
+    min_overlap: int = 50
+) -> tuple[float, dict]:
+    """
+    下行β：只用行业收益低于MAR的日期回归
+
+    Args:
+        stock_returns: 个股收益率序列
+        sector_returns: 行业收益率序列
+        mar: 最低可接受收益
+        min_overlap: 最少重叠天数（全部样本）
+
+    Returns:
+        (beta, regression_info)，n_obs为下行样本数
+    """
+    return _single_beta(
+        stock_returns, sector_returns, 'beta_downside', 'n_down', 'Downside', mar, min_overlap
+    )
+
+
+def beta_cosemi(
+    stock_returns: pd.Series,
+    sector_returns: pd.Series,
+    mar: float = 0.0,
+    min_overlap: int = 50
+) -> tuple[float, dict]:
+    """
+    协半方差β：E[min(r_i-MAR,0)·min(r_s-MAR,0)] / E[min(r_s-MAR,0)²]
+
+    Args:
+        stock_returns: 个股收益率序列
+        sector_returns: 行业收益率序列
+        mar: 最低可接受收益
+        min_overlap: 最少重叠天数
+
+    Returns:
+        (beta, regression_info)
+    """
+    return _single_beta(
+        stock_returns, sector_returns, 'beta_cosemi', 'n_obs', 'CoSemi', mar, min_overlap
+    )
+
+
+def rolling_beta(
+    stock_returns: pd.Series,
+    sector_returns: pd.Series,
+    window: int = 120
+) -> pd.Series:
+    """
+    滚动窗口OLS β（O(n)）
+
+    用 x, y, x², xy 的累计和相减得到每个窗口的协方差与方差，不逐窗口重新回归；
+    每个位置的值与对该窗口调用 beta_ols 一致
+
+    Args:
+        stock_returns: 个股收益率序列
+        sector_returns: 行业收益率序列
+        window: 窗口长度（重叠交易日数）
+
+    Returns:
+        β序列，索引为对齐后的日期，窗口不足的日期为NaN
+    """
+    if window < 2:
+        raise ValueError(f"滚动窗口至少为2天，当前为{window}")
+
+    aligned = _aligned_pair(stock_returns, sector_returns)
+    result = pd.Series(np.nan, index=aligned.index)
+    if len(aligned) < window:
+        return result
+
+    # 平移到整体均值附近，减少累计和相减的精度损失
+    x = aligned['sector'].to_numpy() - aligned['sector'].mean()
+    y = aligned['stock'].to_numpy() - aligned['stock'].mean()
+
+    def window_sums(values):
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        return csum[window:] - csum[:-window]
+
+    sx, sy = window_sums(x), window_sums(y)
+    sxx = window_sums(x * x) - sx * sx / window
+    sxy = window_sums(x * y) - sx * sy / window
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result.iloc[window - 1:] = np.where(sxx > 0, sxy / sxx, np.nan)
+
+    return result
+
+
+class EWMABeta:
+    """
+    指数加权β的在线估计器
+
+    维护 x, y, x², xy 的指数加权均值（与 pandas ewm(adjust=False) 相同的递推），
+    每个新观测O(1)更新
+    """
+
+    def __init__(self, halflife: float = 60.0):
+        """
+        初始化估计器
+
+        Args:
+            halflife: 半衰期（交易日）
+        """
+        if halflife <= 0:
+            raise ValueError(f"半衰期必须大于0，当前为{halflife}")
+
+        self.halflife = halflife
+        self.alpha = 1 - np.exp(np.log(0.5) / halflife)
+        self.n_obs = 0
+        self._means = np.zeros(4)  # x, y, x², xy
+
+    def update(self, stock_return: float, sector_return: float) -> float:
+        """
+        加入一对收益率（任一为NaN时忽略）
+
+        Returns:
+            更新后的β
+        """
+        if np.isnan(stock_return) or np.isnan(sector_return):
+            return self.beta
+
+        values = np.array([
+            sector_return,
+            stock_return,
+            sector_return * sector_return,
+            sector_return * stock_return
+        ])
+        if self.n_obs == 0:
+            self._means = values
+        else:
+            self._means += self.alpha * (values - self._means)
+        self.n_obs += 1
+
+        return self.beta
+
+    @property
+    def beta(self) -> float:
+        """当前β，方差为0时为NaN"""
+        mean_x, mean_y, mean_xx, mean_xy = self._means
+        var_x = mean_xx - mean_x * mean_x
+        if self.n_obs < 2 or var_x <= 0:
+            return np.nan
+        return (mean_xy - mean_x * mean_y) / var_x
+
+
+def ewma_beta(
+    stock_returns: pd.Series,
+    sector_returns: pd.Series,
+    halflife: float = 60.0,
+    min_periods: int = 20
+) -> pd.Series:
+    """
+    指数加权β序列（向量化，与逐个调用 EWMABeta.update 结果一致）
+
+    Args:
+        stock_returns: 个股收益率序列
+        sector_returns: 行业收益率序列
+        halflife: 半衰期（交易日）
+        min_periods: 观测数少于该值的日期为NaN
+
+    Returns:
+        β序列，索引为对齐后的日期
+    """
+    aligned = _aligned_pair(stock_returns, sector_returns)
+    x, y = aligned['sector'], aligned['stock']
+
+    means = pd.DataFrame({'x': x, 'y': y, 'xx': x * x, 'xy': x * y}).ewm(
+        halflife=halflife, adjust=False
+    ).mean()
+    var_x = means['xx'] - means['x'] ** 2
+    cov_xy = means['xy'] - means['x'] * means['y']
+
+    beta = (cov_xy / var_x.where(var_x > 0)).astype(float)
+    beta.iloc[:max(min_periods, 2) - 1] = np.nan
+    return beta
+
+
+def content_hash(data: Union[pd.Series, pd.DataFrame]) -> str:
+    """
+    按内容（索引、数值、列名）计算哈希，用作缓存键
+
+    Args:
+        data: Series或DataFrame
+
+    Returns:
+        十六进制摘要
+    """
+    digest = hashlib.sha1(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    if isinstance(data, pd.DataFrame):
+        digest.update(repr(list(data.columns)).encode('utf-8'))
+    return digest.hexdigest()
+
+
 class BetaCalculator:
-    """β计算器，支持批量计算和缓存"""
+    """
+    β计算器，支持批量计算和缓存
+
+    缓存按输入内容哈希（见 content_hash）保存在实例内存中，同一进程内内容相同的输入
+    （即使是不同对象）直接命中；进程退出后不保留。跨运行的复用由行业指标结果缓存
+    （results.SectorResultCache）与增量排名（incremental）负责
+    """
 
     def __init__(
         self,
-        method: Literal['OLS', 'Huber'] = 'OLS',
-        min_overlap: int = 50
+        method: Literal['OLS', 'Huber', 'Downside', 'CoSemi'] = 'OLS',
+        min_overlap: int = 50,
+        mar: float = 0.0
     ):
         """
         初始化β计算器
@@ -204,10 +607,12 @@ class BetaCalculator:
         Args:
             method: 回归方法
             min_overlap: 最少重叠天数
+            mar: 最低可接受收益（Downside/CoSemi使用）
         """
         self.method = method
         self.min_overlap = min_overlap
-        self._cache = {}
+        self.mar = mar
+        self._cache = {}  # 按输入内容哈希缓存
 
     def calculate(
         self,
@@ -228,8 +633,16 @@ class BetaCalculator:
         Returns:
             (beta, regression_info)
         """
-        # 生成缓存键
-        cache_key = f"{id(stock_returns)}_{id(sector_returns)}_{self.method}"
+        # 按内容生成缓存键（相同数据的不同对象也能命中）
+        cache_key = (
+            'single',
+            content_hash(stock_returns),
+            content_hash(sector_returns),
+            self.method,
+            self.min_overlap,
+            self.mar,
+            fallback_beta
+        )
 
         if use_cache and cache_key in self._cache:
             return self._cache[cache_key]
@@ -239,7 +652,8 @@ class BetaCalculator:
             sector_returns=sector_returns,
             method=self.method,
             min_overlap=self.min_overlap,
-            fallback_beta=fallback_beta
+            fallback_beta=fallback_beta,
+            mar=self.mar
         )
 
         if use_cache:
@@ -247,6 +661,118 @@ class BetaCalculator:
 
         return result
 
+    def calculate_batch(
+        self,
+        stock_returns: pd.DataFrame,
+        sector_returns: pd.DataFrame,
+        sector_map: Dict[str, str],
+        use_cache: bool = True
+    ) -> pd.DataFrame:
+        """
+        批量计算所有股票相对各自行业的β（OLS、Downside、CoSemi一次计算，向量化）
+
+        Args:
+            stock_returns: 日期×股票 的收益率矩阵
+            sector_returns: 日期×行业 的收益率矩阵
+            sector_map: 股票 -> 行业 的映射
+            use_cache: 是否使用缓存
+
+        Returns:
+            回归结果表，见 beta_batch
+        """
+        cache_key = (
+            'batch',
+            content_hash(stock_returns),
+            content_hash(sector_returns),
+            tuple(sorted(sector_map.items())),
+            self.min_overlap,
+            self.mar
+        )
+
+        if use_cache and cache_key in self._cache:
+            return self._cache[cache_key]
+
+        result = beta_batch(
+            stock_returns, sector_returns, sector_map, self.mar, self.min_overlap
+        )
+
+        if use_cache:
+            self._cache[cache_key] = result
+
+        return result
+
+    def calculate_rolling(
+        self,
+        stock_returns: pd.Series,
+        sector_returns: pd.Series,
+        window: int = 120,
+        use_cache: bool = True
+    ) -> pd.Series:
+        """滚动窗口β序列，见 rolling_beta"""
+        cache_key = ('rolling', content_hash(stock_returns), content_hash(sector_returns), window)
+        if use_cache and cache_key in self._cache:
+            return self._cache[cache_key]
+
+        result = rolling_beta(stock_returns, sector_returns, window)
+        if use_cache:
+            self._cache[cache_key] = result
+        return result
+
+    def calculate_ewma(
+        self,
+        stock_returns: pd.Series,
+        sector_returns: pd.Series,
+        halflife: float = 60.0,
+        use_cache: bool = True
+    ) -> pd.Series:
+        """指数加权β序列，见 ewma_beta"""
+        cache_key = ('ewma', content_hash(stock_returns), content_hash(sector_returns), halflife)
+        if use_cache and cache_key in self._cache:
+            return self._cache[cache_key]
+
+        result = ewma_beta(stock_returns, sector_returns, halflife)
+        if use_cache:
+            self._cache[cache_key] = result
+        return result
+
+    def latest(
+        self,
+        stock_returns: pd.Series,
+        sector_returns: pd.Series,
+        kind: Literal['rolling', 'ewma', 'full'] = 'rolling',
+        window: int = 120,
+        halflife: float = 60.0
+    ) -> Optional[float]:
+        """
+        最新的β估计值
+
+        Args:
+            stock_returns: 个股收益率序列
+            sector_returns: 行业收益率序列
+            kind: rolling=滚动窗口，ewma=指数加权，full=全样本回归（self.method）
+            window: 滚动窗口长度
+            halflife: 指数加权半衰期
+
+        Returns:
+            β，数据不足时返回None
+        """
+        if kind == 'full':
+            try:
+                beta, _ = self.calculate(stock_returns, sector_returns)
+            except ValueError:
+                return None
+            return beta
+
+        if kind == 'rolling':
+            series = self.calculate_rolling(stock_returns, sector_returns, window)
+        elif kind == 'ewma':
+            series = self.calculate_ewma(stock_returns, sector_returns, halflife)
+        else:
+            raise ValueError(f"不支持的β估计方式: {kind}")
+
+        series = series.dropna()
+        return float(series.iloc[-1]) if len(series) > 0 else None
+
     def clear_cache(self):
         """清除缓存"""
         self._cache.clear()
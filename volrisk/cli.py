@@ -3,20 +3,89 @@ CLI接口
 使用 Typer 实现命令行接口
 """
 
+import hashlib
+import time
 from typing import Optional
 from pathlib import Path
 from datetime import datetime, timedelta
 import typer
 
 from .data import DataFetcher
-from .sector import SectorAnalyzer, SectorsConfig
+from .executor import FetchExecutor
+from .export import COLUMNAR_FORMATS, EXPORT_FORMATS, require_pyarrow
+from .incremental import analyze_incremental
+from .planner import RunPlan, build_run_plan
+from .providers import MarketDataProvider, get_provider
+from .results import SectorResultCache
+from .sector import BLEND_METHODS, SectorAnalyzer, SectorsConfig
 from .ranker import Ranker, CompaniesConfig
+from .watch import ConfigWatcher, update_sector_metrics
 
 app = typer.Typer(
     name="volrisk",
     help="值博率分析工具 - 基于下行波动率的损失风险评估"
 )
 
+# 全局选项选定的行情数据源（在命令第一次需要时才创建，见 _get_provider）
+_provider_spec: Optional[str] = None
+_record: Optional[str] = None
+_provider: Optional[MarketDataProvider] = None
+
+
+@app.callback()
+def global_options(
+    provider: Optional[str] = typer.Option(
+        None, "--provider",
+        help="行情数据源：yfinance 或 local:<目录>（默认读取 VOLRISK_PROVIDER）"
+    ),
+    offline: bool = typer.Option(
+        False, "--offline", help="离线回放模式，等价于 --provider offline（回放 ~/.cache/volrisk/replay）"
+    ),
+    record: Optional[str] = typer.Option(
+        None, "--record", help="将在线获取的行情与公司信息录制到该目录，供离线回放"
+    ),
+):
+    """
+    值博率分析工具 - 基于下行波动率的损失风险评估
+    """
+    global _provider_spec, _record
+
+    _provider_spec = "offline" if offline else provider
+    _record = record
+
+
+def _get_provider(fetch: bool = True) -> MarketDataProvider:
+    """
+    按全局选项创建数据源
+
+    Args:
+        fetch: 命令是否获取数据；False时（只访问缓存的命令）不录制，只用于确定缓存目录
+    """
+    global _provider
+
+    if _provider is not None:
+        return _provider
+
+    try:
+        provider = get_provider(_provider_spec, record=_record if fetch else None)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"错误: {e}")
+        raise typer.Exit(code=1)
+
+    if fetch:
+        _provider = provider
+    return provider
+
+
+def _make_fetcher(executor: Optional[FetchExecutor] = None, fetch: bool = True) -> DataFetcher:
+    """按全局选项的数据源创建数据获取器（fetch=False 见 _get_provider）"""
+    return DataFetcher(provider=_get_provider(fetch), executor=executor)
+
+
+def _make_result_cache(fetcher: DataFetcher, enabled: bool = True) -> Optional[SectorResultCache]:
+    """行业指标结果缓存，与行情存储放在同一缓存目录下"""
+    return SectorResultCache(fetcher.cache_dir / "results") if enabled else None
+
 
 @app.command()
 def fetch(
@@ -25,12 +94,13 @@ def fetch(
     start: Optional[str] = typer.Option(None, help="开始日期（YYYY-MM-DD），优先于period"),
     end: Optional[str] = typer.Option(None, help="结束日期（YYYY-MM-DD）"),
     interval: str = typer.Option("1d", help="数据间隔（1d=日线）"),
+    adjust: bool = typer.Option(True, "--adjust/--no-adjust", help="是否使用复权价"),
     force: bool = typer.Option(False, "--force", help="强制刷新（忽略缓存）"),
 ):
     """
     获取单个股票/ETF的数据
     """
-    fetcher = DataFetcher()
+    fetcher = _make_fetcher()
 
     print(f"正在获取 {ticker} 的数据...")
     data = fetcher.fetch(
@@ -39,7 +109,8 @@ def fetch(
         end=end,
         period=period,
         interval=interval,
-        force_refresh=force
+        force_refresh=force,
+        auto_adjust=adjust
     )
 
     if data is not None:
@@ -60,6 +131,19 @@ def calc_sector(
     period: str = typer.Option("1y", help="时间周期"),
     mar: float = typer.Option(0.0, help="最低可接受收益（MAR）"),
     min_days: int = typer.Option(150, help="最少交易日数"),
+    max_workers: int = typer.Option(8, help="并发获取数据、计算行业指标的最大线程数"),
+    rate_limit: float = typer.Option(5.0, help="每秒最多请求数（按数据源host限速）"),
+    method: str = typer.Option(
+        "weighted", help="多ETF/多行业合成方式：weighted=指标线性加权，blend=组合收益率计算"
+    ),
+    rolling: Optional[str] = typer.Option(
+        None, help="滚动窗口（交易日，逗号分隔，如 60,120,250），计算滚动指标时间序列"
+    ),
+    rolling_output: Optional[str] = typer.Option(None, help="滚动指标输出CSV路径"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="只输出获取/计算计划及开销估计，不下载不计算"),
+    result_cache: bool = typer.Option(
+        True, "--result-cache/--no-result-cache", help="行情与参数未变化时复用已缓存的行业指标"
+    ),
 ):
     """
     计算行业ETF的风险指标
@@ -69,12 +153,44 @@ def calc_sector(
         print(f"错误: 配置文件不存在: {config_path}")
         raise typer.Exit(code=1)
 
+    if method not in BLEND_METHODS:
+        print(f"错误: 不支持的合成方式: {method}（可选 {', '.join(BLEND_METHODS)}）")
+        raise typer.Exit(code=1)
+
+    windows = []
+    if rolling:
+        try:
+            windows = [int(w) for w in rolling.split(',') if w.strip()]
+        except ValueError:
+            windows = []
+        if not windows or min(windows) < 2:
+            print(f"错误: 滚动窗口格式无效: {rolling}（示例: 60,120,250）")
+            raise typer.Exit(code=1)
+
     # 加载配置
     print(f"加载配置: {config_path}")
     sectors_config = SectorsConfig.from_yaml(str(config_path))
 
     # 创建分析器
-    analyzer = SectorAnalyzer()
+    fetcher = _make_fetcher(
+        FetchExecutor(max_workers=max_workers, rate_limit=rate_limit), fetch=not dry_run
+    )
+    analyzer = SectorAnalyzer(data_fetcher=fetcher, result_cache=_make_result_cache(fetcher, result_cache))
+
+    if dry_run:
+        _print_plan(build_run_plan(
+            sectors_config, fetcher, windows=windows, start=start, end=end, period=period
+        ))
+        return
+
+    if windows:
+        _print_rolling_sectors(
+            analyzer.calculate_rolling_sectors(
+                sectors_config, windows, start=start, end=end, period=period, mar=mar
+            ),
+            rolling_output
+        )
+        return
 
     # 计算所有行业指标
     print(f"\n{'='*80}")
@@ -83,11 +199,13 @@ def calc_sector(
 
     results = analyzer.calculate_all_sectors(
         config=sectors_config,
+        max_workers=max_workers,
         start=start,
         end=end,
         period=period,
         mar=mar,
-        min_days=min_days
+        min_days=min_days,
+        method=method
     )
 
     # 输出摘要
@@ -106,16 +224,76 @@ def calc_sector(
         print(f"  日期范围:   {metrics.start_date} 至 {metrics.end_date}")
 
 
+def _state_path(fetcher: DataFetcher, output: str) -> Path:
+    """排名状态文件路径（按输出文件区分，供 --incremental 使用）"""
+    digest = hashlib.sha1(str(Path(output).resolve()).encode('utf-8')).hexdigest()[:16]
+    return fetcher.cache_dir / "runs" / f"{digest}.json"
+
+
+def _print_plan(plan: RunPlan):
+    """输出运行计划（--dry-run）"""
+    print(f"\n{'='*80}")
+    print("运行计划（dry run）")
+    print(f"{'='*80}")
+    print(plan.report())
+    print(f"{'='*80}")
+
+
+def _print_rolling_sectors(rolling_df, output: Optional[str]):
+    """输出各行业各窗口的最新滚动指标，并可保存完整时间序列"""
+    print(f"\n{'='*80}")
+    print("行业滚动指标（最新值）")
+    print(f"{'='*80}")
+
+    if rolling_df.empty:
+        print("没有足够数据计算滚动指标（可用 --period 加长时间周期）")
+        return
+
+    latest = rolling_df.groupby(['sector_name', 'window'], sort=False).tail(1)
+    print(f"{'行业':<16}{'窗口':>6}{'日期':>12}{'σ_down':>10}{'σ_total':>10}{'MDD':>10}{'累计MDD':>10}")
+    for _, row in latest.iterrows():
+        print(f"{row['sector_name']:<16}{row['window']:>6}{str(row['date'].date()):>12}"
+              f"{row['sigma_down']:>10.4f}{row['sigma_total']:>10.4f}"
+              f"{row['mdd']:>10.4f}{row['running_mdd']:>10.4f}")
+
+    if output:
+        rolling_df.to_csv(output, index=False, encoding='utf-8-sig')
+        print(f"\n✓ 滚动指标已保存: {output}")
+
+
 @app.command()
 def rank(
     companies: str = typer.Option("config/companies.yml", help="公司配置文件路径"),
     sectors: str = typer.Option("config/sectors.yml", help="行业配置文件路径"),
     output: str = typer.Option("output.xlsx", help="输出文件路径"),
-    format: str = typer.Option("xlsx", help="输出格式（xlsx, csv, json）"),
+    format: str = typer.Option(
+        "xlsx", help="输出格式（xlsx, csv, json, parquet, arrow；parquet/arrow需要pyarrow）"
+    ),
     start: Optional[str] = typer.Option(None, help="开始日期（YYYY-MM-DD）"),
     end: Optional[str] = typer.Option(None, help="结束日期（YYYY-MM-DD）"),
     period: str = typer.Option("1y", help="时间周期"),
     mar: float = typer.Option(0.0, help="最低可接受收益（MAR）"),
+    max_workers: int = typer.Option(8, help="并发获取数据、计算行业指标的最大线程数"),
+    rate_limit: float = typer.Option(5.0, help="每秒最多请求数（按数据源host限速）"),
+    method: str = typer.Option(
+        "weighted", help="多ETF/多行业合成方式：weighted=指标线性加权，blend=组合收益率计算"
+    ),
+    beta_kind: str = typer.Option(
+        "rolling", help="未指定β且配置了ticker的公司的β估计方式（rolling, ewma, full）"
+    ),
+    beta_window: int = typer.Option(120, help="滚动β窗口（交易日）"),
+    beta_halflife: float = typer.Option(60.0, help="指数加权β半衰期（交易日）"),
+    dry_run: bool = typer.Option(False, "--dry-run", help="只输出获取/计算计划及开销估计，不下载不计算"),
+    result_cache: bool = typer.Option(
+        True, "--result-cache/--no-result-cache", help="行情与参数未变化时复用已缓存的行业指标"
+    ),
+    incremental: bool = typer.Option(
+        False, "--incremental", help="与上次输出到同一文件的运行对比，只重新计算变化的公司"
+    ),
+    watch: bool = typer.Option(
+        False, "--watch", help="常驻运行，配置文件保存后只重新计算变化的行业与公司并重新导出"
+    ),
+    poll_interval: float = typer.Option(0.2, help="--watch 时轮询配置文件的间隔（秒）"),
 ):
     """
     计算公司值博率并排名
@@ -132,6 +310,25 @@ def rank(
         print(f"错误: 行业配置文件不存在: {sectors_path}")
         raise typer.Exit(code=1)
 
+    if beta_kind not in ("rolling", "ewma", "full"):
+        print(f"错误: 不支持的β估计方式: {beta_kind}（可选 rolling, ewma, full）")
+        raise typer.Exit(code=1)
+
+    if method not in BLEND_METHODS:
+        print(f"错误: 不支持的合成方式: {method}（可选 {', '.join(BLEND_METHODS)}）")
+        raise typer.Exit(code=1)
+
+    if format not in EXPORT_FORMATS:
+        print(f"错误: 不支持的输出格式: {format}（可选 {', '.join(EXPORT_FORMATS)}）")
+        raise typer.Exit(code=1)
+
+    if format in COLUMNAR_FORMATS:
+        try:
+            require_pyarrow()
+        except ImportError as e:
+            print(f"错误: {e}")
+            raise typer.Exit(code=1)
+
     # 加载配置
     print(f"加载配置...")
     print(f"  - 行业配置: {sectors_path}")
@@ -140,18 +337,36 @@ def rank(
     sectors_config = SectorsConfig.from_yaml(str(sectors_path))
     companies_config = CompaniesConfig.from_yaml(str(companies_path))
 
+    fetcher = _make_fetcher(
+        FetchExecutor(max_workers=max_workers, rate_limit=rate_limit), fetch=not dry_run
+    )
+    plan = build_run_plan(
+        sectors_config, fetcher, companies_config, start=start, end=end, period=period
+    )
+    if dry_run:
+        _print_plan(plan)
+        return
+
+    # 需要下载的ticker（行业ETF与β估计用的个股去重后）一次批量获取，结果共享给行业计算与β估计；
+    # 存储已覆盖的ticker由使用方按需读取（行业指标命中结果缓存时不需要读取价格）
+    downloads = [t for t, action in plan.fetch['actions'].items() if action in ('tail', 'full')]
+    prices = fetcher.fetch_multiple(downloads, start=start, end=end, period=period) if downloads else {}
+
     # 步骤1: 计算行业指标
     print(f"\n{'='*80}")
     print("步骤 1/2: 计算行业指标")
     print(f"{'='*80}")
 
-    analyzer = SectorAnalyzer()
+    analyzer = SectorAnalyzer(data_fetcher=fetcher, result_cache=_make_result_cache(fetcher, result_cache))
     sector_metrics = analyzer.calculate_all_sectors(
         config=sectors_config,
+        max_workers=max_workers,
+        prices=prices,
         start=start,
         end=end,
         period=period,
-        mar=mar
+        mar=mar,
+        method=method
     )
 
     if not sector_metrics:
@@ -163,27 +378,109 @@ def rank(
     print("步骤 2/2: 计算公司值博率")
     print(f"{'='*80}")
 
-    ranker = Ranker(sector_analyzer=analyzer)
-    results = ranker.analyze_companies(
-        companies_config=companies_config,
-        sector_metrics=sector_metrics
+    ranker = Ranker(
+        sector_analyzer=analyzer,
+        beta_kind=beta_kind,
+        beta_window=beta_window,
+        beta_halflife=beta_halflife
     )
-
-    if not results:
-        print("错误: 没有成功分析任何公司")
+    state_path = _state_path(fetcher, output)
+    run_params = {
+        'start': start, 'end': end, 'period': period, 'beta_kind': beta_kind,
+        'beta_window': beta_window, 'beta_halflife': beta_halflife,
+    }
+
+    def score_and_export(companies_config: CompaniesConfig, sector_metrics: dict, reuse: bool) -> bool:
+        """计算公司值博率（reuse时只重新计算变化的公司）并导出，没有成功分析任何公司时返回False"""
+        results, stats = analyze_incremental(
+            ranker,
+            companies_config,
+            sector_metrics,
+            state_path=state_path,
+            params=run_params,
+            method=method,
+            mar=mar,
+            prices=prices,
+            reuse=reuse
+        )
+        if reuse:
+            if stats['full']:
+                print("提示: 没有可复用的上次结果（或运行参数已变化），全部重新计算")
+            else:
+                print(f"增量计算: 重新计算 {stats['recomputed']} 家，沿用 {stats['reused']} 家，"
+                      f"移除 {stats['removed']} 家")
+
+        if results.empty:
+            print("错误: 没有成功分析任何公司")
+            return False
+
+        # 步骤3: 排序并导出
+        print(f"\n{'='*80}")
+        print("导出结果")
+        print(f"{'='*80}")
+
+        ranker.rank_and_export(
+            results=results,
+            output_path=output,
+            format=format,
+            sector_metrics=sector_metrics  # 传递行业指标用于详细报告
+        )
+        return True
+
+    if not score_and_export(companies_config, sector_metrics, reuse=incremental) and not watch:
         raise typer.Exit(code=1)
 
-    # 步骤3: 排序并导出
-    print(f"\n{'='*80}")
-    print("导出结果")
-    print(f"{'='*80}")
-
-    ranker.rank_and_export(
-        results=results,
-        output_path=output,
-        format=format,
-        sector_metrics=sector_metrics  # 传递行业指标用于详细报告
-    )
+    if not watch:
+        return
+
+    # 常驻进程：行业指标、已获取的价格与β缓存保留在内存中，
+    # 配置保存后只重新计算变化的行业与公司
+    watcher = ConfigWatcher([companies_path, sectors_path])
+    print(f"\n监视配置文件变化（Ctrl+C 退出）: {companies_path}, {sectors_path}")
+    try:
+        while True:
+            changed = watcher.wait(poll_interval)
+            started = time.perf_counter()
+            print(f"\n{'='*80}")
+            print(f"检测到变化: {', '.join(str(path) for path in changed)}")
+
+            try:
+                new_sectors_config = (
+                    SectorsConfig.from_yaml(str(sectors_path)) if sectors_path in changed
+                    else sectors_config
+                )
+                new_companies_config = (
+                    CompaniesConfig.from_yaml(str(companies_path)) if companies_path in changed
+                    else companies_config
+                )
+            except Exception as e:
+                print(f"错误: 读取配置失败，保留上次结果: {e}")
+                continue
+
+            try:
+                if new_sectors_config is not sectors_config:
+                    sector_metrics, recalculated = update_sector_metrics(
+                        analyzer,
+                        sectors_config,
+                        new_sectors_config,
+                        sector_metrics,
+                        max_workers=max_workers,
+                        start=start,
+                        end=end,
+                        period=period,
+                        mar=mar,
+                        method=method
+                    )
+                    print(f"行业指标: 重新计算 {len(recalculated)} 个，共 {len(sector_metrics)} 个")
+                sectors_config = new_sectors_config
+                companies_config = new_companies_config
+
+                if score_and_export(companies_config, sector_metrics, reuse=True):
+                    print(f"✓ 已更新（{time.perf_counter() - started:.2f}秒）")
+            except Exception as e:
+                print(f"错误: 更新失败，继续监视: {e}")
+    except KeyboardInterrupt:
+        print("\n已停止监视")
 
 
 @app.command()
@@ -193,16 +490,81 @@ def clear_cache(
     """
     清除缓存数据
     """
-    fetcher = DataFetcher()
+    fetcher = _make_fetcher(fetch=False)
 
     if ticker:
         print(f"清除 {ticker} 的缓存...")
     else:
         print("清除所有缓存...")
+        _make_result_cache(fetcher).clear()
 
     fetcher.clear_cache(ticker)
 
 
+cache_app = typer.Typer(help="缓存管理（统计、淘汰）")
+app.add_typer(cache_app, name="cache")
+
+
+def _format_bytes(size: float) -> str:
+    """字节数转可读字符串"""
+    if size < 1024:
+        return f"{int(size)}B"
+    for unit in ["KB", "MB", "GB"]:
+        size /= 1024
+        if size < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}"
+
+
+@cache_app.command("stats")
+def cache_stats(
+    top: int = typer.Option(20, help="显示占用最大的前N个ticker"),
+):
+    """
+    显示缓存统计：命中率、总大小、每个ticker的占用
+    """
+    stats = _make_fetcher(fetch=False).cache_stats()
+
+    print(f"缓存对象: {stats['entries']} 个")
+    print(f"总大小:   {_format_bytes(stats['bytes'])}")
+    print(f"总行数:   {stats['rows']}")
+    if stats['hits'] + stats['misses'] > 0:
+        print(f"命中率:   {stats['hit_rate']:.1%} "
+              f"(命中 {stats['hits']} / 未命中 {stats['misses']})")
+    else:
+        print("命中率:   N/A")
+
+    if stats['tickers']:
+        print(f"\n{'ticker':<14}{'对象':>6}{'行数':>10}{'大小':>12}  最近访问")
+        for item in stats['tickers'][:top]:
+            print(f"{item['ticker']:<14}{item['entries']:>6}{item['rows']:>10}"
+                  f"{_format_bytes(item['bytes']):>12}  {item['accessed_at']}")
+
+
+@cache_app.command("prune")
+def cache_prune(
+    max_mb: Optional[float] = typer.Option(None, help="缓存总大小上限（MB），超出时按LRU淘汰"),
+    max_age_days: Optional[float] = typer.Option(None, help="淘汰超过N天未访问的缓存"),
+):
+    """
+    按大小和年龄淘汰缓存
+    """
+    fetcher = _make_fetcher(fetch=False)
+    max_bytes = int(max_mb * 1024 * 1024) if max_mb is not None else fetcher.max_cache_bytes
+    if max_age_days is None:
+        max_age_days = fetcher.max_cache_age_days
+
+    if max_bytes is None and max_age_days is None:
+        print("错误: 请指定 --max-mb 或 --max-age-days（或设置 VOLRISK_CACHE_MAX_MB 等环境变量）")
+        raise typer.Exit(code=1)
+
+    evicted = fetcher.prune_cache(max_bytes, max_age_days)
+    freed = sum(entry['bytes'] for entry in evicted)
+    print(f"已淘汰 {len(evicted)} 个缓存对象，释放 {_format_bytes(freed)}")
+    for entry in evicted:
+        print(f"  - {entry['ticker']} ({entry['interval']}, {entry['adjust']}) "
+              f"{_format_bytes(entry['bytes'])}")
+
+
 @app.command()
 def version():
     """
@@ -0,0 +1,157 @@
+"""
+协方差模块
+由行业收益率构建协方差与下行半协方差矩阵，批量计算任意行业组合（sector_mix）的风险指标
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    from .sector import SectorMetrics
+
+
+class SectorCovariance:
+    """
+    行业协方差引擎
+
+    行业收益率对齐到共同日历后，每次运行构建一次：
+    - 协方差矩阵 Σ（总体，ddof=0）：组合总波动率 σ_total = sqrt(w'Σw)，与组合收益率序列计算一致
+    - 下行半协方差矩阵 S_ij = mean(min(r_i-MAR,0)·min(r_j-MAR,0))：
+      w'Sw 为组合下行方差的近似（Estrada），精确值由组合收益率矩阵 R·W 批量计算
+    """
+
+    def __init__(
+        self,
+        returns: pd.DataFrame,
+        mar: float = 0.0,
+        td_per_year: int = 252
+    ):
+        """
+        初始化协方差引擎
+
+        Args:
+            returns: 日期×行业 的收益率矩阵，含NaN的日期会被剔除（共同日历）
+            mar: 最低可接受收益
+            td_per_year: 年化交易日数
+        """
+        aligned = returns.dropna()
+        self.sectors: List[str] = list(aligned.columns)
+        self.index = aligned.index
+        self.mar = mar
+        self.td_per_year = td_per_year
+
+        self.returns = aligned.to_numpy(dtype=float)
+        n = len(self.returns)
+        if n > 0:
+            centered = self.returns - self.returns.mean(axis=0)
+            downside = np.minimum(self.returns - mar, 0.0)
+            self.covariance = centered.T @ centered / n
+            self.semicovariance = downside.T @ downside / n
+        else:
+            k = len(self.sectors)
+            self.covariance = np.full((k, k), np.nan)
+            self.semicovariance = np.full((k, k), np.nan)
+
+    @classmethod
+    def from_sector_metrics(
+        cls,
+        sector_metrics: Dict[str, 'SectorMetrics'],
+        sectors: Optional[List[str]] = None,
+        mar: float = 0.0,
+        td_per_year: int = 252
+    ) -> 'SectorCovariance':
+        """
+        由已计算的行业指标（SectorMetrics.returns）构建
+
+        Args:
+            sector_metrics: 行业指标字典
+            sectors: 只使用这些行业（默认全部有收益率序列的行业）
+            mar: 最低可接受收益
+            td_per_year: 年化交易日数
+        """
+        if sectors is None:
+            sectors = [s for s, m in sector_metrics.items() if m.returns is not None]
+
+        returns = pd.concat({s: sector_metrics[s].returns for s in sectors}, axis=1)
+        return cls(returns, mar, td_per_year)
+
+    def exposures(self, mixes: List[Dict[str, float]]) -> np.ndarray:
+        """
+        将行业权重字典转换为暴露矩阵
+
+        Args:
+            mixes: 每个组合的 {行业: 权重}
+
+        Returns:
+            组合数×行业数 的权重矩阵
+
+        Raises:
+            KeyError: 组合包含引擎中没有的行业
+        """
+        position = {sector: i for i, sector in enumerate(self.sectors)}
+        weights = np.zeros((len(mixes), len(self.sectors)))
+        for row, mix in enumerate(mixes):
+            for sector, weight in mix.items():
+                if sector not in position:
+                    raise KeyError(f"行业 {sector} 没有收益率数据")
+                weights[row, position[sector]] += weight
+        return weights
+
+    def _annualize(self, values: np.ndarray) -> np.ndarray:
+        """日频波动率年化"""
+        return values * np.sqrt(self.td_per_year)
+
+    def sigma_total(self, weights: np.ndarray) -> np.ndarray:
+        """批量计算组合年化总波动率 sqrt(w'Σw)，weights为 组合数×行业数"""
+        weights = np.atleast_2d(weights)
+        variance = np.einsum('ij,jk,ik->i', weights, self.covariance, weights)
+        return self._annualize(np.sqrt(np.maximum(variance, 0.0)))
+
+    def sigma_down(self, weights: np.ndarray, exact: bool = True) -> np.ndarray:
+        """
+        批量计算组合年化下行波动率
+
+        Args:
+            weights: 组合数×行业数 的权重矩阵
+            exact: True时由组合收益率矩阵 R·W' 精确计算；False时用半协方差二次型 w'Sw 近似
+        """
+        weights = np.atleast_2d(weights)
+        if not exact:
+            variance = np.einsum('ij,jk,ik->i', weights, self.semicovariance, weights)
+            return self._annualize(np.sqrt(np.maximum(variance, 0.0)))
+
+        if len(self.returns) == 0:
+            return np.full(len(weights), np.nan)
+
+        portfolio = self.returns @ weights.T
+        downside = np.minimum(portfolio - self.mar, 0.0)
+        return self._annualize(np.sqrt((downside ** 2).mean(axis=0)))
+
+    def mdd(self, weights: np.ndarray) -> np.ndarray:
+        """批量计算组合最大回撤（每日再平衡的组合净值）"""
+        weights = np.atleast_2d(weights)
+        if len(self.returns) == 0:
+            return np.full(len(weights), np.nan)
+
+        nav = np.cumprod(1.0 + self.returns @ weights.T, axis=0)
+        nav = np.vstack([np.ones(len(weights)), nav])
+        return (nav / np.maximum.accumulate(nav, axis=0) - 1.0).min(axis=0)
+
+    def metrics(self, mixes: List[Dict[str, float]], exact: bool = True) -> pd.DataFrame:
+        """
+        批量计算多个行业组合的风险指标
+
+        Args:
+            mixes: 每个组合的 {行业: 权重}
+            exact: σ_down是否精确计算（见 sigma_down）
+
+        Returns:
+            DataFrame，每行一个组合，列为 sigma_down, sigma_total, mdd
+        """
+        weights = self.exposures(mixes)
+        return pd.DataFrame({
+            'sigma_down': self.sigma_down(weights, exact),
+            'sigma_total': self.sigma_total(weights),
+            'mdd': self.mdd(weights)
+        })
@@ -1,184 +1,639 @@
 """
 数据获取模块
-使用 yfinance 获取股票和ETF的历史数据，支持本地缓存
+通过行情数据源（默认 yfinance，可切换为本地回放）获取股票和ETF的历史数据，支持本地增量存储
 """
 
 import os
+import re
+import threading
 import time
-import hashlib
+from collections import Counter
 from pathlib import Path
-from datetime import datetime, timedelta
 from typing import Optional, Union
 import pandas as pd
-import yfinance as yf
+
+from .executor import FetchExecutor, backoff_delay
+from .providers import MarketDataProvider, get_provider, split_by_ticker
+from .store import STORE_INTERVALS, MemoryCache, PriceStore
+
+# 重叠bar的复权价相对变化超过该阈值时，视为复权因子变化（分红/拆股），重新下载全部历史
+ADJUST_TOLERANCE = 1e-4
+
+PERIOD_UNITS = {'d': 'days', 'wk': 'weeks', 'mo': 'months', 'y': 'years'}
+
+
+def _with_adj_close(data: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """确保行情数据有Adj Close列（auto_adjust时用Close代替），缺失时返回None"""
+    if 'Adj Close' not in data.columns and 'Close' in data.columns:
+        data = data.copy()
+        data['Adj Close'] = data['Close']
+
+    if 'Adj Close' not in data.columns:
+        return None
+
+    return data
+
+
+def _today() -> pd.Timestamp:
+    """当天零点"""
+    return pd.Timestamp.today().normalize()
+
+
+def _date_str(ts: Optional[pd.Timestamp]) -> Optional[str]:
+    """Timestamp转YYYY-MM-DD"""
+    return str(ts.date()) if ts is not None else None
+
+
+def period_start(period: str, today: Optional[pd.Timestamp] = None) -> Optional[pd.Timestamp]:
+    """
+    将yfinance的period换算为开始日期
+
+    Args:
+        period: 时间周期（5d, 1mo, 6mo, 1y, 2y, ytd, max等）
+        today: 基准日期，默认为当天
+
+    Returns:
+        开始日期；max返回None（自上市起）
+    """
+    today = today if today is not None else _today()
+
+    if period == "max":
+        return None
+    if period == "ytd":
+        return pd.Timestamp(year=today.year, month=1, day=1)
+
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError(f"不支持的时间周期: {period}")
+
+    return today - pd.DateOffset(**{PERIOD_UNITS[match.group(2)]: int(match.group(1))})
+
+
+def adjust_mode(auto_adjust: bool) -> str:
+    """缓存键中的复权方式"""
+    return "auto" if auto_adjust else "raw"
+
+
+def slice_window(
+    series: pd.Series,
+    win_start: Optional[pd.Timestamp],
+    win_end: Optional[pd.Timestamp]
+) -> pd.Series:
+    """按 [开始, 结束) 切片有序序列（位置切片，不复制数据）"""
+    lo = series.index.searchsorted(win_start) if win_start is not None else 0
+    hi = series.index.searchsorted(win_end) if win_end is not None else len(series)
+    return series.iloc[lo:hi]
+
+
+def resolve_window(
+    start: Optional[str],
+    end: Optional[str],
+    period: str,
+    today: Optional[pd.Timestamp] = None
+) -> tuple[Optional[pd.Timestamp], Optional[pd.Timestamp]]:
+    """
+    将 start/end/period 换算为 [开始, 结束) 日期窗口，period相对today换算
+
+    Returns:
+        (开始日期或None, 结束日期（不含）或None)
+    """
+    win_start = pd.Timestamp(start) if start is not None else period_start(period, today)
+    win_end = pd.Timestamp(end) if end is not None else None
+    return win_start, win_end
+
+
+# 数据指纹使用的清单字段（fetched_at为微秒精度，存储每次写入都会变化）
+FINGERPRINT_FIELDS = ('covered_start', 'first_date', 'last_date', 'rows', 'bytes', 'fetched_at', 'tail')
 
 
 class DataFetcher:
-    """数据获取器，支持缓存和重试机制"""
+    """数据获取器，支持增量存储和重试机制"""
 
-    def __init__(self, cache_dir: Optional[str] = None):
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        provider: Optional[MarketDataProvider] = None,
+        executor: Optional[FetchExecutor] = None,
+        max_cache_bytes: Optional[int] = None,
+        max_cache_age_days: Optional[float] = None,
+        memory_cache_bytes: int = 128 * 1024 * 1024
+    ):
         """
         初始化数据获取器
 
         Args:
-            cache_dir: 缓存目录，默认为 ~/.cache/volrisk/
+            cache_dir: 缓存目录，默认为 ~/.cache/volrisk/（本地数据源使用其回放目录下的cache/）
+            provider: 行情数据源，默认由 VOLRISK_PROVIDER 环境变量决定（见 get_provider）
+            executor: 并发获取执行器（并发数、限速），默认8线程、每秒5次请求
+            max_cache_bytes: 缓存大小上限，超出时按LRU淘汰；
+                默认读取环境变量 VOLRISK_CACHE_MAX_MB，未设置则不限
+            max_cache_age_days: 缓存对象最长未访问天数；
+                默认读取环境变量 VOLRISK_CACHE_MAX_AGE_DAYS，未设置则不限
+            memory_cache_bytes: 进程内LRU缓存的字节数上限，0表示不使用
         """
+        provider = provider or get_provider()
         if cache_dir is None:
-            cache_dir = os.path.expanduser("~/.cache/volrisk")
+            cache_dir = provider.default_cache_dir or os.path.expanduser("~/.cache/volrisk")
+
+        if max_cache_bytes is None and os.environ.get("VOLRISK_CACHE_MAX_MB"):
+            max_cache_bytes = int(float(os.environ["VOLRISK_CACHE_MAX_MB"]) * 1024 * 1024)
+        if max_cache_age_days is None and os.environ.get("VOLRISK_CACHE_MAX_AGE_DAYS"):
+            max_cache_age_days = float(os.environ["VOLRISK_CACHE_MAX_AGE_DAYS"])
 
         self.cache_dir = Path(cache_dir)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-
-    def _get_cache_path(
+        self.store = PriceStore(self.cache_dir / "store")
+        self.memory = MemoryCache(memory_cache_bytes)
+        self._memory_hits = Counter()  # 尚未写入清单的进程内缓存命中
+        self._memory_hits_lock = threading.Lock()
+        self.provider = provider
+        self.executor = executor or FetchExecutor()
+        self.max_cache_bytes = max_cache_bytes
+        self.max_cache_age_days = max_cache_age_days
+
+    def _today(self) -> pd.Timestamp:
+        """数据截止日期：回放数据源使用其录制日期，否则为当天"""
+        as_of = self.provider.as_of
+        return as_of if as_of is not None else _today()
+
+    def _plan_download(
         self,
         ticker: str,
-        start: Optional[str],
-        end: Optional[str],
-        period: Optional[str]
-    ) -> Path:
-        """生成缓存文件路径"""
-        # 创建唯一的缓存键
-        cache_key = f"{ticker}_{start}_{end}_{period}"
-        cache_hash = hashlib.md5(cache_key.encode()).hexdigest()
-        return self.cache_dir / f"{ticker}_{cache_hash}.parquet"
-
-    def _load_from_cache(self, cache_path: Path, max_age_days: int = 1) -> Optional[pd.DataFrame]:
-        """从缓存加载数据"""
-        if not cache_path.exists():
-            return None
+        win_start: Optional[pd.Timestamp],
+        win_end: Optional[pd.Timestamp],
+        force_refresh: bool = False,
+        interval: str = "1d",
+        adjust: str = "auto"
+    ) -> Optional[dict]:
+        """
+        根据存储覆盖范围，计算满足窗口还需要下载的区间
 
-        # 检查缓存文件的年龄
-        cache_age = datetime.now() - datetime.fromtimestamp(cache_path.stat().st_mtime)
-        if cache_age > timedelta(days=max_age_days):
-            return None
+        Returns:
+            下载计划 {start, end, replace, check}；存储已覆盖窗口时返回None
+            - 无存储或强制刷新：下载整个窗口
+            - 窗口起点早于存储起点：从窗口起点重新下载至今
+            - 只缺尾部：从倒数第二根bar开始下载，用重叠bar校验复权价是否变化
+        """
+        today_end = self._today() + pd.Timedelta(days=1)
+        fetch_end = win_end if win_end is not None and win_end < today_end else None
+        need_until = fetch_end if fetch_end is not None else today_end
 
-        try:
-            return pd.read_parquet(cache_path)
-        except Exception as e:
-            print(f"警告: 读取缓存失败 {cache_path}: {e}")
+        coverage = None if force_refresh else self._coverage(ticker, interval, adjust)
+        if coverage is None or not coverage.get('tail'):
+            return {'start': win_start, 'end': fetch_end, 'replace': True, 'check': None}
+
+        covered_start = coverage.get('covered_start')
+        covered_start = pd.Timestamp(covered_start) if covered_start is not None else None
+        if covered_start is not None and (win_start is None or win_start < covered_start):
+            return {'start': win_start, 'end': None, 'replace': True, 'check': None}
+
+        if pd.Timestamp(coverage['covered_until']) >= need_until:
             return None
 
-    def _save_to_cache(self, df: pd.DataFrame, cache_path: Path):
-        """保存数据到缓存"""
+        check_date, check_close = coverage['tail'][0]
+        return {
+            'start': pd.Timestamp(check_date),
+            'end': fetch_end,
+            'replace': False,
+            'check': (pd.Timestamp(check_date), check_close)
+        }
+
+    def _coverage(self, ticker: str, interval: str, adjust: str) -> Optional[dict]:
+        """覆盖范围：优先使用进程内缓存，否则查询清单"""
+        cached = self.memory.get((ticker, interval, adjust))
+        if cached is not None:
+            return cached[0]
+        return self.store.coverage(ticker, interval, adjust)
+
+    def _history_plan(self, ticker: str, interval: str, adjust: str) -> dict:
+        """复权因子变化后，重新下载存储覆盖的全部历史"""
+        coverage = self.store.coverage(ticker, interval, adjust) or {}
+        covered_start = coverage.get('covered_start')
+        return {
+            'start': pd.Timestamp(covered_start) if covered_start is not None else None,
+            'end': None,
+            'replace': True,
+            'check': None
+        }
+
+    def _update_store(
+        self,
+        ticker: str,
+        data: pd.DataFrame,
+        plan: dict,
+        interval: str = "1d",
+        adjust: str = "auto"
+    ) -> bool:
+        """
+        将下载结果写入存储
+
+        Returns:
+            是否写入；重叠bar的复权价变化时不写入并返回False
+        """
+        if plan['check'] is not None:
+            check_date, check_close = plan['check']
+            if check_date in data.index:
+                new_close = data.loc[check_date, 'Adj Close']
+                if pd.notna(new_close) and abs(new_close / check_close - 1) > ADJUST_TOLERANCE:
+                    print(f"提示: {ticker} 复权价格已变化，重新下载全部历史")
+                    return False
+
+        covered_until = plan['end']
+        if covered_until is None:
+            covered_until = self._today() + pd.Timedelta(days=1)
+        self.memory.pop((ticker, interval, adjust))
         try:
-            df.to_parquet(cache_path)
+            self.store.write(
+                ticker,
+                data,
+                covered_start=plan['start'],
+                covered_until=covered_until,
+                replace=plan['replace'],
+                interval=interval,
+                adjust=adjust
+            )
         except Exception as e:
-            print(f"警告: 保存缓存失败 {cache_path}: {e}")
+            print(f"警告: 保存缓存失败 {ticker}: {e}")
 
-    def fetch(
+        return True
+
+    def _read_window(
         self,
         ticker: str,
-        start: Optional[str] = None,
-        end: Optional[str] = None,
-        period: str = "1y",
+        win_start: Optional[pd.Timestamp],
+        win_end: Optional[pd.Timestamp],
         interval: str = "1d",
-        use_cache: bool = True,
-        force_refresh: bool = False,
-        max_retries: int = 2
+        adjust: str = "auto"
     ) -> Optional[pd.Series]:
         """
-        获取股票/ETF的调整后收盘价数据
-
-        Args:
-            ticker: 股票代码（如 512480.SS）
-            start: 开始日期（YYYY-MM-DD），优先于period
-            end: 结束日期（YYYY-MM-DD）
-            period: 时间周期（1y, 2y等），当start为None时使用
-            interval: 数据间隔（1d=日线）
-            use_cache: 是否使用缓存
-            force_refresh: 是否强制刷新（忽略缓存）
-            max_retries: 最大重试次数
+        切出窗口内的Adj Close序列
 
-        Returns:
-            调整后收盘价的Series，索引为日期
+        进程内缓存未命中时从磁盘读取完整历史并放入缓存，之后的窗口直接切片
         """
-        # 尝试从缓存加载
-        cache_path = self._get_cache_path(ticker, start, end, period)
-        if use_cache and not force_refresh:
-            cached_data = self._load_from_cache(cache_path)
-            if cached_data is not None and 'Adj Close' in cached_data.columns:
-                return cached_data['Adj Close']
+        key = (ticker, interval, adjust)
+        cached = self.memory.get(key)
+
+        if cached is not None:
+            adj_close = cached[1]
+        else:
+            coverage = self.store.coverage(ticker, interval, adjust)
+            data = self.store.load(ticker, interval=interval, adjust=adjust)
+            if coverage is None or data is None or 'Adj Close' not in data.columns:
+                return None
+            adj_close = data['Adj Close'].dropna()
+            self.memory.put(key, coverage, adj_close)
+
+        adj_close = slice_window(adj_close, win_start, win_end)
+        return adj_close if len(adj_close) > 0 else None
 
-        # 从yfinance获取数据
+    def _download(
+        self,
+        tickers: list[str],
+        start: Optional[str],
+        end: Optional[str],
+        period: Optional[str],
+        interval: str,
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """经限速后向数据源发起一次下载请求"""
+        if self.provider.host is not None:
+            self.executor.throttle(self.provider.host)
+        return self.provider.download(
+            tickers,
+            start=start,
+            end=end,
+            period=None if start is not None else period,
+            interval=interval,
+            auto_adjust=auto_adjust
+        )
+
+    def _download_with_retry(
+        self,
+        ticker: str,
+        start: Optional[str],
+        end: Optional[str],
+        period: Optional[str],
+        interval: str,
+        max_retries: int,
+        auto_adjust: bool = True
+    ) -> Optional[pd.DataFrame]:
+        """下载单个ticker，失败时按指数退避重试，返回含Adj Close的行情"""
         for attempt in range(max_retries):
             try:
                 # 如果指定了start，使用start/end；否则使用period
-                if start is not None:
-                    data = yf.download(
-                        ticker,
-                        start=start,
-                        end=end,
-                        interval=interval,
-                        auto_adjust=True,
-                        progress=False
-                    )
-                else:
-                    data = yf.download(
-                        ticker,
-                        period=period,
-                        interval=interval,
-                        auto_adjust=True,
-                        progress=False
-                    )
+                raw = self._download([ticker], start, end, period, interval, auto_adjust)
 
-                if data.empty:
+                # 处理多层列索引（当下载多个ticker时）
+                data = split_by_ticker(raw, [ticker]).get(ticker)
+
+                if data is None:
                     print(f"警告: {ticker} 返回空数据")
                     if attempt < max_retries - 1:
                         print(f"重试中... ({attempt + 1}/{max_retries})")
-                        time.sleep(1)
+                        time.sleep(backoff_delay(attempt, base=1.0))
                         continue
                     return None
 
-                # 处理多层列索引（当下载多个ticker时）
-                if isinstance(data.columns, pd.MultiIndex):
-                    data = data.xs(ticker, axis=1, level=1)
-
                 # 确保有Adj Close列
-                if 'Adj Close' not in data.columns and 'Close' in data.columns:
-                    data['Adj Close'] = data['Close']
-
-                if 'Adj Close' not in data.columns:
+                data = _with_adj_close(data)
+                if data is None:
                     print(f"错误: {ticker} 没有Adj Close数据")
                     return None
 
-                # 保存到缓存
-                if use_cache:
-                    self._save_to_cache(data, cache_path)
-
-                # 返回Adj Close序列，去除NaN
-                adj_close = data['Adj Close'].dropna()
-                return adj_close
+                return data
 
             except Exception as e:
                 print(f"错误: 获取 {ticker} 数据失败: {e}")
                 if attempt < max_retries - 1:
                     print(f"重试中... ({attempt + 1}/{max_retries})")
-                    time.sleep(2)
+                    time.sleep(backoff_delay(attempt, base=2.0))
                 else:
                     print(f"已达到最大重试次数，放弃获取 {ticker}")
                     return None
 
         return None
 
+    def fetch(
+        self,
+        ticker: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: str = "1y",
+        interval: str = "1d",
+        use_cache: bool = True,
+        force_refresh: bool = False,
+        max_retries: int = 2,
+        auto_adjust: bool = True
+    ) -> Optional[pd.Series]:
+        """
+        获取股票/ETF的调整后收盘价数据
+
+        日线及以上数据保存在按 (ticker, 数据间隔, 复权方式) 分区的增量存储中：
+        已覆盖的窗口直接从本地切片，只下载缺失的尾部（或早于存储起点的头部）
+
+        Args:
+            ticker: 股票代码（如 512480.SS）
+            start: 开始日期（YYYY-MM-DD），优先于period
+            end: 结束日期（YYYY-MM-DD）
+            period: 时间周期（1y, 2y等），当start为None时使用
+            interval: 数据间隔（1d=日线）
+            use_cache: 是否使用缓存
+            force_refresh: 是否强制刷新（忽略缓存）
+            max_retries: 最大重试次数
+            auto_adjust: 是否使用复权价（与数据间隔一起作为缓存键）
+
+        Returns:
+            调整后收盘价的Series，索引为日期
+        """
+        # 日内数据或不使用缓存时直接下载
+        if not use_cache or interval not in STORE_INTERVALS:
+            data = self._download_with_retry(
+                ticker, start, end, period, interval, max_retries, auto_adjust
+            )
+            return data['Adj Close'].dropna() if data is not None else None
+
+        adjust = adjust_mode(auto_adjust)
+        win_start, win_end = resolve_window(start, end, period, self._today())
+        in_memory = (ticker, interval, adjust) in self.memory
+        plan = self._plan_download(ticker, win_start, win_end, force_refresh, interval, adjust)
+
+        if plan is not None:
+            data = self._download_with_retry(
+                ticker, _date_str(plan['start']), _date_str(plan['end']), "max",
+                interval, max_retries, auto_adjust
+            )
+
+            if data is not None and not self._update_store(ticker, data, plan, interval, adjust):
+                plan = self._history_plan(ticker, interval, adjust)
+                data = self._download_with_retry(
+                    ticker, _date_str(plan['start']), None, "max",
+                    interval, max_retries, auto_adjust
+                )
+                if data is not None:
+                    self._update_store(ticker, data, plan, interval, adjust)
+
+            if data is None:
+                if self.store.coverage(ticker, interval, adjust) is None:
+                    return None
+                print(f"警告: {ticker} 更新失败，使用已缓存数据")
+
+        adj_close = self._read_window(ticker, win_start, win_end, interval, adjust)
+
+        # 进程内缓存命中时只在内存中计数，批量写入清单
+        if in_memory and plan is None:
+            self._record_memory_hit((ticker, interval, adjust))
+        else:
+            self.store.manifest.touch(ticker, interval, adjust, hit=plan is None)
+
+        if plan is not None:
+            self._enforce_limits()
+
+        return adj_close
+
     def fetch_multiple(
         self,
         tickers: list[str],
+        batch: bool = True,
+        batch_size: int = 100,
         **kwargs
     ) -> dict[str, pd.Series]:
         """
         批量获取多个股票的数据
 
+        batch模式下，所有需要下载的ticker按下载区间分组（全量/尾部），
+        每组合并为一次多ticker下载，按ticker拆分后逐个写入存储；
+        批量结果中缺失的ticker再逐个重试。
+        逐个获取通过执行器并发进行，慢ticker不会阻塞其他ticker
+
         Args:
             tickers: 股票代码列表
+            batch: 是否合并为多ticker下载
+            batch_size: 每次批量下载的最大ticker数
             **kwargs: 传递给fetch的其他参数
 
         Returns:
             字典，键为ticker，值为Adj Close序列
         """
+        if not batch:
+            results = self._fetch_concurrent(tickers, **kwargs)
+            return {ticker: results[ticker] for ticker in tickers if ticker in results}
+
+        start = kwargs.get('start')
+        end = kwargs.get('end')
+        period = kwargs.get('period', "1y")
+        interval = kwargs.get('interval', "1d")
+        use_cache = kwargs.get('use_cache', True)
+        force_refresh = kwargs.get('force_refresh', False)
+        auto_adjust = kwargs.get('auto_adjust', True)
+
+        use_store = use_cache and interval in STORE_INTERVALS
+        adjust = adjust_mode(auto_adjust)
+        win_start, win_end = resolve_window(start, end, period, self._today())
+
         results = {}
-        for ticker in tickers:
+        groups = {}  # 下载区间 -> [(ticker, 下载计划)]
+
+        # 先从存储切片，需要下载的ticker按下载区间分组（去重，保持顺序）
+        for ticker in dict.fromkeys(tickers):
+            if use_store:
+                in_memory = (ticker, interval, adjust) in self.memory
+                plan = self._plan_download(
+                    ticker, win_start, win_end, force_refresh, interval, adjust
+                )
+                if plan is None:
+                    adj_close = self._read_window(ticker, win_start, win_end, interval, adjust)
+                    if in_memory:
+                        self._record_memory_hit((ticker, interval, adjust))
+                    else:
+                        self.store.manifest.touch(ticker, interval, adjust, hit=True)
+                    if adj_close is not None:
+                        results[ticker] = adj_close
+                    continue
+                request = (_date_str(plan['start']), _date_str(plan['end']), "max")
+            else:
+                plan = None
+                request = (start, end, period)
+
+            groups.setdefault(request, []).append((ticker, plan))
+
+        # 每组合并下载
+        for (req_start, req_end, req_period), items in groups.items():
+            for i in range(0, len(items), batch_size):
+                chunk = items[i:i + batch_size]
+                chunk_tickers = [ticker for ticker, _ in chunk]
+                print(f"正在批量获取 {len(chunk)} 个ticker的数据...")
+                try:
+                    raw = self._download(
+                        chunk_tickers, req_start, req_end, req_period, interval, auto_adjust
+                    )
+                except Exception as e:
+                    print(f"错误: 批量获取数据失败: {e}")
+                    continue
+
+                frames = split_by_ticker(raw, chunk_tickers)
+                for ticker, plan in chunk:
+                    data = frames.get(ticker)
+                    data = _with_adj_close(data) if data is not None else None
+                    if data is None:
+                        continue
+
+                    if plan is None:
+                        adj_close = data['Adj Close'].dropna()
+                        if len(adj_close) > 0:
+                            results[ticker] = adj_close
+                    elif self._update_store(ticker, data, plan, interval, adjust):
+                        adj_close = self._read_window(
+                            ticker, win_start, win_end, interval, adjust
+                        )
+                        self.store.manifest.touch(ticker, interval, adjust, hit=False)
+                        if adj_close is not None:
+                            results[ticker] = adj_close
+
+        # 批量结果中缺失（或复权价变化）的ticker逐个重试
+        retry = [
+            ticker
+            for items in groups.values()
+            for ticker, _ in items
+            if ticker not in results
+        ]
+        results.update(self._fetch_concurrent(retry, **kwargs))
+
+        if use_store:
+            self.flush_access()
+            if groups:
+                self._enforce_limits()
+
+        return {ticker: results[ticker] for ticker in tickers if ticker in results}
+
+    def plan_fetch(
+        self,
+        tickers: list[str],
+        batch_size: int = 100,
+        **kwargs
+    ) -> dict:
+        """
+        计算 fetch_multiple 将如何获取这些ticker（只读存储清单，不访问网络）
+
+        Args:
+            tickers: 股票代码列表（重复的只计一次）
+            batch_size: 每次批量下载的最大ticker数
+            **kwargs: 同 fetch_multiple（start, end, period, interval, use_cache, force_refresh, auto_adjust）
+
+        Returns:
+            字典：
+            - actions: {ticker: 'memory'（进程内缓存）| 'store'（本地存储）| 'tail'（增量下载尾部）| 'full'（下载整个窗口）}
+            - requests: 批量下载请求数
+            - start / end: 解析后的下载窗口；today: 数据源的当前日期
+        """
+        start = kwargs.get('start')
+        end = kwargs.get('end')
+        period = kwargs.get('period', "1y")
+        interval = kwargs.get('interval', "1d")
+        use_cache = kwargs.get('use_cache', True)
+        force_refresh = kwargs.get('force_refresh', False)
+        adjust = adjust_mode(kwargs.get('auto_adjust', True))
+
+        use_store = use_cache and interval in STORE_INTERVALS
+        win_start, win_end = resolve_window(start, end, period, self._today())
+
+        actions = {}
+        groups = Counter()  # 下载区间 -> ticker数
+        for ticker in dict.fromkeys(tickers):
+            if not use_store:
+                actions[ticker] = 'full'
+                groups[(start, end, period)] += 1
+                continue
+
+            plan = self._plan_download(ticker, win_start, win_end, force_refresh, interval, adjust)
+            if plan is None:
+                actions[ticker] = 'memory' if (ticker, interval, adjust) in self.memory else 'store'
+                continue
+
+            actions[ticker] = 'full' if plan['replace'] else 'tail'
+            groups[(_date_str(plan['start']), _date_str(plan['end']))] += 1
+
+        return {
+            'actions': actions,
+            'requests': sum(-(-count // batch_size) for count in groups.values()),
+            'start': win_start,
+            'end': win_end,
+            'today': self._today()
+        }
+
+    def fingerprint(
+        self,
+        tickers: list[str],
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> dict[str, Optional[dict]]:
+        """
+        存储中各ticker数据的指纹（只查询清单），存储有任何写入（增量、复权重下）后都会变化
+
+        Args:
+            tickers: 股票代码列表
+            interval: 数据间隔
+            auto_adjust: 是否使用复权价
+
+        Returns:
+            {ticker: 指纹}，不在存储中的ticker为None
+        """
+        adjust = adjust_mode(auto_adjust)
+        fingerprints = {}
+        for ticker in dict.fromkeys(tickers):
+            entry = self.store.coverage(ticker, interval, adjust)
+            fingerprints[ticker] = None if entry is None else {
+                key: entry[key] for key in FINGERPRINT_FIELDS
+            }
+        return fingerprints
+
+    def _fetch_concurrent(self, tickers: list[str], **kwargs) -> dict[str, pd.Series]:
+        """通过执行器并发逐个获取，返回成功获取的ticker"""
+        def fetch_one(ticker: str) -> Optional[pd.Series]:
             print(f"正在获取 {ticker} 的数据...")
-            data = self.fetch(ticker, **kwargs)
+            return self.fetch(ticker, **kwargs)
+
+        results = {}
+        for ticker, data in self.executor.map(fetch_one, tickers).items():
             if data is not None:
                 results[ticker] = data
             else:
@@ -186,6 +641,68 @@ class DataFetcher:
 
         return results
 
+    def _record_memory_hit(self, key: tuple[str, str, str]):
+        """记录一次进程内缓存命中，累计较多时写入清单"""
+        with self._memory_hits_lock:
+            self._memory_hits[key] += 1
+            pending = sum(self._memory_hits.values())
+
+        if pending >= 1000:
+            self.flush_access()
+
+    def flush_access(self):
+        """将进程内缓存命中写入清单（访问时间与命中次数）"""
+        with self._memory_hits_lock:
+            hits, self._memory_hits = self._memory_hits, Counter()
+
+        try:
+            self.store.manifest.touch_many(hits)
+        except Exception as e:
+            print(f"警告: 更新缓存访问记录失败: {e}")
+
+    def _enforce_limits(self):
+        """缓存超出配置的大小或年龄上限时自动淘汰"""
+        if self.max_cache_bytes is None and self.max_cache_age_days is None:
+            return
+
+        evicted = self.prune_cache(self.max_cache_bytes, self.max_cache_age_days)
+        if evicted:
+            print(f"缓存超出上限，已淘汰 {len(evicted)} 个缓存对象")
+
+    def prune_cache(
+        self,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None
+    ) -> list[dict]:
+        """
+        按大小和年龄淘汰缓存（LRU），并删除旧版按窗口保存的快照文件
+
+        Args:
+            max_bytes: 缓存总大小上限（字节）
+            max_age_days: 最长未访问天数
+
+        Returns:
+            被淘汰对象的清单记录
+        """
+        self.flush_access()
+
+        for cache_file in self.cache_dir.glob("*.parquet"):
+            try:
+                cache_file.unlink()
+            except Exception as e:
+                print(f"警告: 删除缓存文件失败 {cache_file}: {e}")
+
+        evicted = self.store.prune(max_bytes, max_age_days)
+        for entry in evicted:
+            self.memory.pop((entry['ticker'], entry['interval'], entry['adjust']))
+
+        return evicted
+
+    def cache_stats(self) -> dict:
+        """缓存统计（命中率、总大小、每个ticker的占用），见 PriceStore.stats"""
+        self.flush_access()
+        return self.store.stats()
+
     def clear_cache(self, ticker: Optional[str] = None):
         """
         清除缓存
@@ -193,12 +710,11 @@ class DataFetcher:
         Args:
             ticker: 如果指定，只清除该ticker的缓存；否则清除所有缓存
         """
-        if ticker:
-            pattern = f"{ticker}_*.parquet"
-        else:
-            pattern = "*.parquet"
+        self.memory.clear()
+        deleted = self.store.clear(ticker)
 
-        deleted = 0
+        # 旧版按窗口保存的快照文件
+        pattern = f"{ticker}_*.parquet" if ticker else "*.parquet"
         for cache_file in self.cache_dir.glob(pattern):
             try:
                 cache_file.unlink()
@@ -206,7 +722,7 @@ class DataFetcher:
             except Exception as e:
                 print(f"警告: 删除缓存文件失败 {cache_file}: {e}")
 
-        print(f"已删除 {deleted} 个缓存文件")
+        print(f"已删除 {deleted} 个缓存")
 
 
 # 便捷函数
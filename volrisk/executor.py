@@ -0,0 +1,149 @@
+"""
+并发获取模块
+有界线程池执行数据获取，按host令牌桶限速，重试使用带抖动的指数退避
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+
+T = TypeVar('T')
+
+
+def backoff_delay(
+    attempt: int,
+    base: float = 1.0,
+    cap: float = 30.0,
+    jitter: bool = True
+) -> float:
+    """
+    计算第attempt次重试前的等待秒数（指数退避，full jitter）
+
+    Args:
+        attempt: 已失败次数（从0开始）
+        base: 基础等待秒数
+        cap: 最大等待秒数
+        jitter: 是否在 [0, delay] 内随机抖动，避免并发请求同时重试
+
+    Returns:
+        等待秒数
+    """
+    delay = min(cap, base * (2 ** attempt))
+    return random.uniform(0, delay) if jitter else delay
+
+
+class TokenBucket:
+    """令牌桶限速器（线程安全）"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数（即平均请求速率）
+            burst: 桶容量（允许的突发请求数），默认为 max(1, rate)
+        """
+        if rate <= 0:
+            raise ValueError(f"限速速率必须大于0，当前为{rate}")
+
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到取得一个令牌"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait = (1 - self._tokens) / self.rate
+
+            time.sleep(wait)
+
+
+class FetchExecutor:
+    """并发获取执行器：有界线程池 + 按host限速"""
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        rate_limit: Optional[float] = 5.0,
+        burst: Optional[int] = None
+    ):
+        """
+        初始化执行器
+
+        Args:
+            max_workers: 最大并发数
+            rate_limit: 每个host每秒最多请求数，None表示不限速
+            burst: 每个host允许的突发请求数
+        """
+        if max_workers < 1:
+            raise ValueError(f"并发数必须至少为1，当前为{max_workers}")
+
+        self.max_workers = max_workers
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def throttle(self, host: str):
+        """请求host前调用，超出限速时阻塞当前线程"""
+        if self.rate_limit is None:
+            return
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate_limit, self.burst)
+                self._buckets[host] = bucket
+
+        bucket.acquire()
+
+    def map(
+        self,
+        fn: Callable[[str], T],
+        keys: Iterable[str]
+    ) -> Dict[str, Optional[T]]:
+        """
+        并发执行 fn(key)
+
+        单个任务的重试等待只阻塞其所在线程，不影响其他任务
+
+        Args:
+            fn: 任务函数
+            keys: 任务键（如ticker），重复键只执行一次
+
+        Returns:
+            字典，按keys顺序，值为fn返回值；抛出异常的任务值为None
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        results = {}
+        workers = min(self.max_workers, len(keys))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {key: pool.submit(fn, key) for key in keys}
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    print(f"错误: 执行 {key} 失败: {e}")
+                    results[key] = None
+
+        return results
@@ -3,7 +3,8 @@
 支持多种估值倍数模型（PE, EV/EBITDA, EV/Sales）
 """
 
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal
+import numpy as np
 from pydantic import BaseModel, Field
 
 
@@ -86,6 +87,38 @@ def calculate_expected_return(
     raise ValueError("必须提供 expected_return 或 model 之一")
 
 
+def expected_return_batch(
+    expected_return: List[Optional[float]],
+    models: List[Optional[ValuationModel]]
+) -> Dict[str, np.ndarray]:
+    """
+    批量计算期望收益（向量化，与 calculate_expected_return 逐行结果一致）
+
+    Args:
+        expected_return: 每行直接指定的期望收益（None表示使用估值模型，优先级同单个计算）
+        models: 每行的估值模型（可为None）
+
+    Returns:
+        字典，er_raw、er、execution_prob 均为数组（两者都未提供的行为NaN）
+    """
+    def field(name: str) -> np.ndarray:
+        return np.array([np.nan if m is None else getattr(m, name) for m in models], dtype=float)
+
+    direct = np.array([np.nan if v is None else v for v in expected_return], dtype=float)
+    execution_prob = field('execution_prob')
+
+    multiple_return = (field('target_multiple') / field('current_multiple')) * (1 + field('growth_12m')) - 1
+    er_raw = multiple_return + field('dividend_yield') + field('buyback_yield')
+    er = er_raw * execution_prob
+
+    is_direct = ~np.isnan(direct)
+    return {
+        'er_raw': np.where(is_direct, direct, er_raw),
+        'er': np.where(is_direct, direct, er),
+        'execution_prob': np.where(is_direct, 1.0, execution_prob)
+    }
+
+
 class ExpectedReturnCalculator:
     """期望收益计算器"""
 
@@ -0,0 +1,168 @@
+"""
+导出模块
+结果表保持数值类型写出，Excel以只写模式按块流式写出并按列设置数字格式（显示精度只是格式，不改变单元格的值）；
+parquet/arrow格式（需要pyarrow）每张表单独写一个文件，可直接内存映射读取
+"""
+
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import pandas as pd
+
+# rank命令支持的输出格式
+EXPORT_FORMATS = ("xlsx", "csv", "json", "parquet", "arrow")
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+# 常用数字格式
+FMT_2 = '0.00'
+FMT_4 = '0.0000'
+FMT_6 = '0.000000'
+FMT_8 = '0.00000000'
+FMT_PCT = '0.00%'
+FMT_INT = '0'
+
+
+def _excel_values(values: pd.Series) -> list:
+    """列转换为单元格值：NaN为空单元格，±inf写为文本（同pandas的inf_rep）"""
+    result = values.astype(object).tolist() if isinstance(values.dtype, pd.CategoricalDtype) \
+        else values.tolist()
+    for i, value in enumerate(result):
+        if isinstance(value, float):
+            if value != value:
+                result[i] = None
+            elif value in (float('inf'), float('-inf')):
+                result[i] = 'inf' if value > 0 else '-inf'
+    return result
+
+
+def _frames(data: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> Iterator[pd.DataFrame]:
+    """单个数据表或按行分块的数据表序列统一为块的迭代器"""
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+
+def write_workbook(
+    output_path: Path,
+    sheets: Iterable[Tuple[str, Union[pd.DataFrame, Iterable[pd.DataFrame]], Optional[Dict[str, str]]]],
+    chunk_size: int = 5000
+):
+    """
+    以openpyxl只写模式流式写出Excel（行写出后即落盘，不保留工作簿的单元格对象）
+
+    Args:
+        output_path: 输出路径
+        sheets: 依次产生 (sheet名称, 数据, {列名: Excel数字格式}) 的可迭代对象；
+            数据为一个数据表，或按行分块的数据表序列（各块列相同，至少一块，可以为空表）。
+            传入分块生成器时sheet的行在写出时才逐块构建，内存中只有当前块
+        chunk_size: 每次转换为单元格值的行数
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+
+    for sheet_name, data, number_formats in sheets:
+        worksheet = workbook.create_sheet(sheet_name)
+        styles = None
+
+        for frame in _frames(data):
+            if styles is None:
+                header = []
+                for column in frame.columns:
+                    cell = WriteOnlyCell(worksheet, value=str(column))
+                    cell.font = header_font
+                    header.append(cell)
+                worksheet.append(header)
+
+                # 每列的数字格式只注册一次，数据单元格共享该样式
+                styles = []
+                for column in frame.columns:
+                    number_format = (number_formats or {}).get(column)
+                    if number_format is None:
+                        styles.append(None)
+                    else:
+                        template = WriteOnlyCell(worksheet)
+                        template.number_format = number_format
+                        styles.append(template._style)
+
+            for start in range(0, len(frame), chunk_size):
+                chunk = frame.iloc[start:start + chunk_size]
+                columns = [_excel_values(chunk[column]) for column in chunk.columns]
+                for values in zip(*columns):
+                    row = []
+                    for value, style in zip(values, styles):
+                        if style is not None and value is not None:
+                            value = WriteOnlyCell(worksheet, value=value)
+                            value._style = style
+                        row.append(value)
+                    worksheet.append(row)
+
+    workbook.save(output_path)
+
+
+def require_pyarrow():
+    """
+    检查pyarrow是否可用
+
+    Raises:
+        ImportError: 未安装pyarrow
+    """
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise ImportError("parquet/arrow输出需要pyarrow，请先安装: pip install pyarrow")
+
+
+def table_path(output_path: Path, name: Optional[str] = None) -> Path:
+    """
+    附属表的文件路径：rank.parquet -> rank.<name>.parquet
+
+    Args:
+        output_path: 主表路径
+        name: 附属表名称，None表示主表
+    """
+    if name is None:
+        return output_path
+    return output_path.with_name(f"{output_path.stem}.{name}{output_path.suffix}")
+
+
+def write_tables(
+    tables: Dict[Optional[str], pd.DataFrame],
+    output_path: Path,
+    format: str
+) -> List[Path]:
+    """
+    以parquet或Arrow IPC文件格式写出多张表（分类列保存为字典编码）
+
+    Args:
+        tables: {表名: 数据表}，表名为None的是主表，写到output_path，其余见 table_path
+        output_path: 主表路径
+        format: parquet 或 arrow
+
+    Returns:
+        写出的文件路径列表
+
+    Raises:
+        ValueError: 不支持的格式
+        ImportError: 未安装pyarrow
+    """
+    if format not in COLUMNAR_FORMATS:
+        raise ValueError(f"不支持的列式输出格式: {format}")
+    require_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    paths = []
+    for name, df in tables.items():
+        path = table_path(Path(output_path), name)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if format == "parquet":
+            pq.write_table(table, path)
+        else:
+            with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        paths.append(path)
+    return paths
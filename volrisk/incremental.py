@@ -0,0 +1,231 @@
+"""
+增量排名模块
+保存每次排名的输入签名与结果表，下次运行时与新配置对比，
+只重新计算配置或所用行业指标发生变化的公司，与保存的结果合并后重新排序
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from .beta import content_hash
+from .ranker import CompaniesConfig, CompanyConfig, Ranker
+from .sector import SectorMetrics
+
+# 结果表结构或计算方式变化时递增，使旧状态失效
+STATE_VERSION = 1
+
+
+def _sha1(payload) -> str:
+    text = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def sector_signature(metrics: SectorMetrics) -> str:
+    """行业指标的签名（标量指标与组合收益率序列的内容）"""
+    returns = content_hash(metrics.returns) if metrics.returns is not None else None
+    return _sha1({
+        'tickers': metrics.tickers,
+        'weights': metrics.weights,
+        'sigma_down': metrics.sigma_down,
+        'sigma_total': metrics.sigma_total,
+        'mdd': metrics.mdd,
+        'method': metrics.method,
+        'returns': returns,
+    })
+
+
+def company_signature(
+    company: CompanyConfig,
+    sector_signatures: Dict[str, str],
+    ticker_fingerprint: Optional[dict] = None
+) -> str:
+    """
+    公司结果的输入签名：公司配置、所用行业指标的签名、估计β用的个股数据指纹
+
+    Args:
+        company: 公司配置
+        sector_signatures: {行业: 签名}
+        ticker_fingerprint: 个股在存储中的数据指纹（估计β时使用）
+    """
+    sectors = [company.sector] if company.sector is not None else sorted(company.sector_mix or {})
+    return _sha1({
+        'config': company.model_dump(mode='json'),
+        'sectors': [sector_signatures.get(s) for s in sectors],
+        'ticker': ticker_fingerprint,
+    })
+
+
+class RankState:
+    """上次排名保存的输入签名与结果表"""
+
+    def __init__(
+        self,
+        params: dict,
+        companies: Dict[str, str],
+        table: pd.DataFrame
+    ):
+        """
+        Args:
+            params: 运行参数（合成方式、MAR、数据窗口、β估计方式等），变化时全部重新计算
+            companies: {公司名称: 输入签名}
+            table: analyze_companies 的结果表
+        """
+        self.params = params
+        self.companies = companies
+        self.table = table
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['RankState']:
+        """读取状态文件，不存在、损坏或版本不符时返回None"""
+        path = Path(path)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('version') != STATE_VERSION:
+            return None
+
+        table = pd.DataFrame(state['table']['data'], columns=state['table']['columns'])
+        return cls(state['params'], state['companies'], _restore_dtypes(table))
+
+    def save(self, path: Path):
+        """写入状态文件（先写临时文件再替换）"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        table = self.table.astype(object)
+        state = {
+            'version': STATE_VERSION,
+            'params': self.params,
+            'companies': self.companies,
+            'table': {
+                'columns': list(table.columns),
+                'data': [[_json_value(v) for v in row] for row in table.itertuples(index=False)],
+            },
+        }
+
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+
+def _json_value(value):
+    """numpy标量转换为Python值（float保留inf/NaN，json可精确往返）"""
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _restore_dtypes(table: pd.DataFrame) -> pd.DataFrame:
+    """恢复结果表的列类型：name为字符串，sector_info/mode为分类，其余为float"""
+    table = table.copy()
+    for column in table.columns:
+        if column == 'name':
+            table[column] = pd.Series(table[column].tolist(), index=table.index)
+        elif column == 'sector_info':
+            table[column] = pd.Categorical(table[column].astype(str))
+        elif column == 'mode':
+            table[column] = pd.Categorical(
+                table[column].astype(str), categories=["SemiMDD", "SchemeC"]
+            )
+        else:
+            table[column] = table[column].astype(float)
+    return table
+
+
+def analyze_incremental(
+    ranker: Ranker,
+    companies_config: CompaniesConfig,
+    sector_metrics: Dict[str, SectorMetrics],
+    state_path: Path,
+    params: dict,
+    method: str = "weighted",
+    mar: float = 0.0,
+    prices: Optional[Dict[str, pd.Series]] = None,
+    reuse: bool = True
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    增量分析公司：只重新计算变化的公司，其余沿用上次的结果，并保存本次状态
+
+    以下情况公司需要重新计算：新增公司、公司配置变化、所用行业的指标变化、
+    估计β用的个股数据变化；运行参数变化或公司名称重复时全部重新计算
+
+    Args:
+        ranker: 排名器
+        companies_config: 公司配置
+        sector_metrics: 行业指标字典
+        state_path: 状态文件路径
+        params: 运行参数
+        method: 多行业合成方式
+        mar: 最低可接受收益
+        prices: 已获取的个股价格序列（传给 analyze_companies）
+        reuse: False时全部重新计算（仍保存状态供下次增量运行）
+
+    Returns:
+        (结果表（按配置顺序）, 统计 {recomputed, reused, removed, full})
+    """
+    companies = companies_config.companies
+    names = [c.name for c in companies]
+
+    sector_signatures = {name: sector_signature(m) for name, m in sector_metrics.items()}
+    beta_tickers = [
+        c.ticker for c in companies
+        if c.ticker is not None and c.risk.mode == "SchemeC" and c.risk.beta is None
+    ]
+    fingerprint = getattr(ranker.sector_analyzer.data_fetcher, 'fingerprint', None)
+    fingerprints = fingerprint(beta_tickers) if fingerprint and beta_tickers else {}
+    signatures = {
+        c.name: company_signature(c, sector_signatures, fingerprints.get(c.ticker))
+        for c in companies
+    }
+
+    params = json.loads(json.dumps({**params, 'method': method, 'mar': mar}, default=str))
+    state = RankState.load(state_path) if reuse else None
+    full = state is None or state.params != params or len(set(names)) != len(names)
+
+    if full:
+        dirty = list(companies)
+        reused = None
+    else:
+        dirty = [c for c in companies if state.companies.get(c.name) != signatures[c.name]]
+        clean = set(names) - {c.name for c in dirty}
+        reused = state.table[state.table['name'].isin(clean)]
+
+    # 每家公司的结果只取决于自己的输入（blend合成按行业集合分别构建协方差引擎），
+    # 因此只重新计算变化的公司与全部重新计算结果一致
+    recomputed = ranker.analyze_companies(
+        CompaniesConfig(companies=dirty), sector_metrics, method=method, mar=mar, prices=prices
+    ) if dirty else None
+
+    frames = [frame for frame in (reused, recomputed) if frame is not None and len(frame) > 0]
+    if frames:
+        table = pd.concat(frames, ignore_index=True)
+        order = {name: i for i, name in enumerate(names)}
+        table = table.iloc[np.argsort(table['name'].map(order).to_numpy(), kind='stable')]
+        table = _restore_dtypes(table.reset_index(drop=True))
+    else:
+        table = ranker.analyze_companies(CompaniesConfig(companies=[]), sector_metrics)
+
+    # 只保存成功的公司，失败的下次重新计算
+    present = set(table['name'])
+    RankState(
+        params,
+        {name: sig for name, sig in signatures.items() if name in present},
+        table
+    ).save(state_path)
+
+    stats = {
+        'recomputed': len(dirty),
+        'reused': 0 if reused is None else len(reused),
+        'removed': 0 if state is None or full else len(set(state.companies) - set(names)),
+        'full': full,
+    }
+    return table, stats
@@ -145,6 +145,311 @@ def calculate_all_metrics(
     }
 
 
+def price_panel(prices: dict) -> pd.DataFrame:
+    """
+    将多个价格序列对齐为 日期×ticker 的价格矩阵（日期取并集，缺失为NaN）
+
+    Args:
+        prices: {ticker: adj_close序列}
+
+    Returns:
+        价格矩阵，列顺序与prices一致
+    """
+    if not prices:
+        return pd.DataFrame()
+
+    panel = pd.concat(prices, axis=1, sort=True)
+    panel.columns = list(prices.keys())
+    return panel
+
+
+def _panel_returns(values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    价格矩阵的逐列收益率
+
+    每列等价于先去掉NaN再pct_change：收益率相对该列上一个有效价格计算
+
+    Returns:
+        (收益率矩阵（无效处为0）, 收益率有效掩码, 前向填充后的价格矩阵)
+    """
+    n_rows, n_cols = values.shape
+    valid = ~np.isnan(values)
+
+    # 前向填充：每个位置取该列最近一个有效价格的行号
+    rows = np.where(valid, np.arange(n_rows)[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(n_cols)]
+    filled[np.cumsum(valid, axis=0) == 0] = np.nan
+
+    returns = np.zeros_like(values)
+    mask = np.zeros_like(valid)
+    if n_rows > 1:
+        mask[1:] = valid[1:] & ~np.isnan(filled[:-1])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns[1:] = np.where(mask[1:], values[1:] / filled[:-1] - 1.0, 0.0)
+
+    return returns, mask, filled
+
+
+def panel_metrics(
+    prices: Union[pd.DataFrame, np.ndarray],
+    mar: float = 0.0,
+    annualize: bool = True,
+    td_per_year: int = 252
+) -> pd.DataFrame:
+    """
+    一次性计算价格矩阵中所有列的风险指标（向量化）
+
+    每列的结果与对该列去掉NaN后调用 calculate_all_metrics 一致，
+    列之间的交易日历可以不同（停牌、上市日期不同）
+
+    Args:
+        prices: 日期×ticker 的价格DataFrame，或二维ndarray（行为日期）
+        mar: 最低可接受收益
+        annualize: 是否年化波动率
+        td_per_year: 年化交易日数
+
+    Returns:
+        DataFrame，每行一个ticker，列为 sigma_total, sigma_down, mdd,
+        sample_days, trading_days, start_date, end_date
+        （ndarray输入时行索引为列号，无日期列）
+    """
+    if isinstance(prices, pd.DataFrame):
+        values = prices.to_numpy(dtype=float)
+        columns = prices.columns
+        index = prices.index
+    else:
+        values = np.asarray(prices, dtype=float)
+        if values.ndim == 1:
+            values = values[:, None]
+        columns = pd.RangeIndex(values.shape[1])
+        index = None
+
+    returns, mask, filled = _panel_returns(values)
+    sample_days = (~np.isnan(values)).sum(axis=0)
+    trading_days = mask.sum(axis=0)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = np.where(trading_days > 0, trading_days, np.nan)
+
+        # 总体标准差（ddof=0），两遍法避免大均值下的精度损失
+        mean = returns.sum(axis=0) / n
+        centered = np.where(mask, returns - mean, 0.0)
+        sigma_total = np.sqrt((centered ** 2).sum(axis=0) / n)
+
+        # 下行半方差
+        downside = np.where(mask, np.minimum(returns - mar, 0.0), 0.0)
+        sigma_down = np.sqrt((downside ** 2).sum(axis=0) / n)
+
+        # 最大回撤：前向填充价格的累计最大值（fmax忽略上市前的NaN）
+        peak = np.fmax.accumulate(filled, axis=0)
+        drawdown = np.where(np.isnan(values), np.nan, filled / peak - 1.0)
+
+    mdd = np.full(values.shape[1], np.nan)
+    has_data = sample_days > 0
+    if has_data.any():
+        mdd[has_data] = np.nanmin(drawdown[:, has_data], axis=0)
+
+    if annualize:
+        sigma_total = sigma_total * np.sqrt(td_per_year)
+        sigma_down = sigma_down * np.sqrt(td_per_year)
+
+    result = pd.DataFrame({
+        'sigma_total': sigma_total,
+        'sigma_down': sigma_down,
+        'mdd': mdd,
+        'sample_days': sample_days,
+        'trading_days': trading_days
+    }, index=columns)
+
+    if isinstance(index, pd.DatetimeIndex) and len(index) > 0:
+        valid = ~np.isnan(values)
+        first = index[valid.argmax(axis=0)].strftime('%Y-%m-%d')
+        last = index[len(index) - 1 - valid[::-1].argmax(axis=0)].strftime('%Y-%m-%d')
+        result['start_date'] = np.where(has_data, first, None)
+        result['end_date'] = np.where(has_data, last, None)
+
+    return result
+
+
+def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """长度为window的滑动窗口求和（累计和相减，O(n)），前window-1个位置为NaN"""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.concatenate([[0.0], np.cumsum(values)])
+        out[window - 1:] = csum[window:] - csum[:-window]
+    return out
+
+
+def rolling_max_drawdown(prices: np.ndarray, window: int) -> np.ndarray:
+    """
+    滑动窗口最大回撤（O(n)，不逐窗口重新扫描）
+
+    将序列按window分块，块内计算前缀/后缀的最高价、最低价和最大回撤，
+    每个窗口由前一块的后缀与后一块的前缀合并得到：
+    跨块回撤 = 后段最低价 / 前段最高价 - 1
+
+    Args:
+        prices: 价格数组（不含NaN）
+        window: 窗口长度（价格个数）
+
+    Returns:
+        与prices等长的数组，位置i为 prices[i-window+1:i+1] 的最大回撤（负值），
+        前window-1个位置为NaN
+    """
+    n = len(prices)
+    out = np.full(n, np.nan)
+    if window < 1 or n < window:
+        return out
+
+    # 补齐为整块，填充值为块内最后一个价格（不产生新的回撤）
+    n_blocks = -(-n // window)
+    padded = np.full(n_blocks * window, prices[-1], dtype=float)
+    padded[:n] = prices
+    blocks = padded.reshape(n_blocks, window)
+
+    # 块内前缀：最高价、最低价、最大回撤
+    pre_max = np.maximum.accumulate(blocks, axis=1)
+    pre_min = np.minimum.accumulate(blocks, axis=1)
+    pre_dd = np.minimum.accumulate(blocks / pre_max - 1.0, axis=1)
+
+    # 块内后缀：从位置s到块尾
+    rev = blocks[:, ::-1]
+    suf_max = np.maximum.accumulate(rev, axis=1)[:, ::-1]
+    suf_min = np.minimum.accumulate(rev, axis=1)[:, ::-1]
+    suf_dd = np.minimum.accumulate((suf_min / blocks - 1.0)[:, ::-1], axis=1)[:, ::-1]
+
+    pre_max, pre_min, pre_dd = (x.ravel()[:n] for x in (pre_max, pre_min, pre_dd))
+    suf_max, suf_dd = (x.ravel()[:n] for x in (suf_max, suf_dd))
+
+    end = np.arange(window - 1, n)
+    begin = end - window + 1
+    aligned = begin % window == 0
+
+    # 窗口恰为一整块：后缀即整个窗口
+    out[end[aligned]] = suf_dd[begin[aligned]]
+
+    # 跨两块：前一块的后缀 + 后一块的前缀
+    b, e = begin[~aligned], end[~aligned]
+    out[e] = np.minimum.reduce([
+        suf_dd[b],
+        pre_dd[e],
+        pre_min[e] / suf_max[b] - 1.0
+    ])
+
+    return out
+
+
+def rolling_metrics(
+    adj_close: pd.Series,
+    window: int,
+    mar: float = 0.0,
+    annualize: bool = True,
+    td_per_year: int = 252
+) -> pd.DataFrame:
+    """
+    滚动窗口的风险指标时间序列（O(n)）
+
+    位置t的值等于对 adj_close 在t及之前window个价格调用 calculate_all_metrics 的结果；
+    波动率用收益率及其平方的累计和相减得到，回撤见 rolling_max_drawdown
+
+    Args:
+        adj_close: 调整后收盘价序列
+        window: 窗口长度（价格个数，如60/120/250）
+        mar: 最低可接受收益
+        annualize: 是否年化波动率
+        td_per_year: 年化交易日数
+
+    Returns:
+        DataFrame，索引为日期，列为 sigma_total, sigma_down, mdd（窗口内最大回撤）,
+        running_mdd（自序列起点以来的最大回撤）；窗口不足的日期为NaN
+    """
+    if window < 2:
+        raise ValueError(f"滚动窗口至少为2个价格，当前为{window}")
+
+    adj_close = adj_close.dropna()
+    prices = adj_close.to_numpy(dtype=float)
+    columns = ['sigma_total', 'sigma_down', 'mdd', 'running_mdd']
+    if len(prices) == 0:
+        return pd.DataFrame(columns=columns, index=adj_close.index, dtype=float)
+
+    # 收益率对齐到价格位置（位置0无收益）
+    returns = np.zeros(len(prices))
+    returns[1:] = prices[1:] / prices[:-1] - 1.0
+    downside = np.minimum(returns - mar, 0.0)
+    downside[0] = 0.0
+
+    # 位置i的窗口收益率为 returns[i-n+1:i+1]；方差与平移无关，先减去整体均值减少相减误差
+    n = window - 1
+    shifted = returns - returns[1:].mean() if len(returns) > 1 else returns
+    sum1 = _rolling_sum(shifted, n)
+    sum2 = _rolling_sum(shifted ** 2, n)
+    sum_down = _rolling_sum(downside ** 2, n)
+
+    sigma_total = np.sqrt(np.maximum(sum2 / n - (sum1 / n) ** 2, 0.0))
+    sigma_down = np.sqrt(sum_down / n)
+    if annualize:
+        sigma_total = sigma_total * np.sqrt(td_per_year)
+        sigma_down = sigma_down * np.sqrt(td_per_year)
+
+    sigma_total[:window - 1] = np.nan
+    sigma_down[:window - 1] = np.nan
+
+    running_mdd = np.minimum.accumulate(prices / np.maximum.accumulate(prices) - 1.0)
+
+    return pd.DataFrame({
+        'sigma_total': sigma_total,
+        'sigma_down': sigma_down,
+        'mdd': rolling_max_drawdown(prices, window),
+        'running_mdd': running_mdd
+    }, index=adj_close.index)
+
+
+def blend_returns(
+    returns: pd.DataFrame,
+    weights: Union[list, np.ndarray, pd.Series]
+) -> pd.Series:
+    """
+    组合收益率序列（每日按权重再平衡）
+
+    只保留所有列都有收益率的日期（共同日历），r_p = R·w
+
+    Args:
+        returns: 日期×成分 的收益率矩阵
+        weights: 成分权重（与列顺序一致，或以列名为索引的Series）
+
+    Returns:
+        组合收益率序列
+    """
+    if isinstance(weights, pd.Series):
+        weights = weights.reindex(returns.columns).to_numpy(dtype=float)
+    weights = np.asarray(weights, dtype=float)
+
+    aligned = returns.dropna()
+    return pd.Series(aligned.to_numpy() @ weights, index=aligned.index)
+
+
+def return_metrics(
+    returns: pd.Series,
+    mar: float = 0.0,
+    annualize: bool = True,
+    td_per_year: int = 252
+) -> dict:
+    """
+    由收益率序列计算风险指标（如组合收益率），最大回撤按净值 cumprod(1+r) 计算
+
+    Returns:
+        包含 sigma_total, sigma_down, mdd, trading_days 的字典
+    """
+    nav = np.concatenate([[1.0], np.cumprod(1.0 + returns.to_numpy(dtype=float))])
+    return {
+        'sigma_total': total_volatility(returns, annualize, td_per_year),
+        'sigma_down': downside_volatility(returns, mar, annualize, td_per_year),
+        'mdd': max_drawdown(pd.Series(nav)) if len(returns) > 0 else np.nan,
+        'trading_days': len(returns)
+    }
+
+
 def blend_volatilities(
     sector_metrics: dict,
     exposures: dict
@@ -152,7 +457,8 @@ def blend_volatilities(
     """
     混合多行业的波动率（线性加权）
 
-    用于处理多行业暴露的公司（如紫金矿业60%有色+40%黄金）
+    用于处理多行业暴露的公司（如紫金矿业60%有色+40%黄金）；
+    线性加权忽略行业间相关性，会高估风险，组合收益率口径见 blend_returns
 
     Args:
         sector_metrics: {sector_name: metrics_dict} 行业指标字典
@@ -0,0 +1,189 @@
+"""
+运行计划模块
+汇总一次运行需要的全部ticker与计算（行业ETF、β估计用的个股、多行业组合、滚动窗口），
+去重后每个ticker只获取一次、每个组合只计算一次，并估计网络与计算开销（--dry-run）
+"""
+
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import pandas as pd
+
+from .data import DataFetcher
+
+if TYPE_CHECKING:
+    from .ranker import CompaniesConfig
+    from .sector import SectorsConfig
+
+# 下载方式的显示名称
+ACTION_LABELS = {
+    'memory': "进程内缓存",
+    'store': "本地存储",
+    'tail': "增量下载",
+    'full': "完整下载",
+}
+
+
+class RunPlan:
+    """
+    一次运行的获取/计算计划
+
+    属性：
+    - sector_tickers: {ETF: [使用它的行业]}
+    - company_tickers: {个股: [需要用它估计β的公司]}
+    - mixes: {多行业组合: [使用它的公司]}，组合为按行业排序的 ((行业, 权重), ...)
+    - windows: 滚动窗口列表
+    - fetch: DataFetcher.plan_fetch 的结果
+    """
+
+    def __init__(
+        self,
+        sector_tickers: Dict[str, List[str]],
+        company_tickers: Dict[str, List[str]],
+        mixes: Dict[Tuple[Tuple[str, float], ...], List[str]],
+        windows: List[int],
+        fetch: dict,
+        companies: int = 0
+    ):
+        self.sector_tickers = sector_tickers
+        self.company_tickers = company_tickers
+        self.mixes = mixes
+        self.windows = windows
+        self.fetch = fetch
+        self.companies = companies
+
+    @property
+    def tickers(self) -> List[str]:
+        """需要获取的全部ticker（去重，行业ETF在前）"""
+        return list(dict.fromkeys([*self.sector_tickers, *self.company_tickers]))
+
+    @property
+    def sectors(self) -> List[str]:
+        """需要计算的行业"""
+        return list(dict.fromkeys(s for names in self.sector_tickers.values() for s in names))
+
+    def trading_days(self) -> Optional[int]:
+        """下载窗口内的交易日数估计（工作日数；窗口无起点时为None）"""
+        start, end = self.fetch['start'], self.fetch['end']
+        if start is None:
+            return None
+        end = end if end is not None else self.fetch['today']
+        return len(pd.bdate_range(start, end))
+
+    def cost(self) -> dict:
+        """
+        开销估计
+
+        Returns:
+            字典：
+            - references / unique_tickers: 配置中ticker引用次数 / 去重后的ticker数
+            - downloads: 需要下载的ticker数（按下载方式）
+            - requests: 批量下载请求数
+            - price_points: 参与计算的价格点数（ticker数 × 交易日数）
+            - rolling_points: 滚动指标计算的点数（行业ETF数 × 交易日数 × 窗口数）
+            - sectors, mixes, betas, companies: 各类计算的次数
+        """
+        actions = pd.Series(self.fetch['actions'], dtype=object)
+        days = self.trading_days()
+        references = (
+            sum(len(v) for v in self.sector_tickers.values())
+            + sum(len(v) for v in self.company_tickers.values())
+        )
+        return {
+            'references': references,
+            'unique_tickers': len(self.tickers),
+            'downloads': actions.value_counts().to_dict(),
+            'requests': self.fetch['requests'],
+            'price_points': len(self.tickers) * days if days is not None else None,
+            'rolling_points': (
+                len(self.sector_tickers) * days * len(self.windows) if days is not None else None
+            ),
+            'sectors': len(self.sectors),
+            'mixes': len(self.mixes),
+            'betas': sum(len(v) for v in self.company_tickers.values()),
+            'companies': self.companies,
+        }
+
+    def report(self) -> str:
+        """计划的文本描述（--dry-run 输出）"""
+        cost = self.cost()
+        lines = [
+            f"ticker引用 {cost['references']} 次，去重后 {cost['unique_tickers']} 个",
+        ]
+
+        shared = {t: s for t, s in self.sector_tickers.items() if len(s) > 1}
+        for ticker, sectors in shared.items():
+            lines.append(f"  {ticker}: 共用于 {len(sectors)} 个行业（{', '.join(sectors)}）")
+
+        lines.append("\n网络:")
+        for action, label in ACTION_LABELS.items():
+            count = cost['downloads'].get(action, 0)
+            if count:
+                lines.append(f"  {label}: {count} 个ticker")
+        lines.append(f"  批量下载请求: {cost['requests']} 次")
+
+        days = self.trading_days()
+        lines.append("\n计算:")
+        lines.append(f"  交易日数(估计): {days if days is not None else '未知'}")
+        if cost['price_points'] is not None:
+            lines.append(f"  价格点数: {cost['price_points']:,}")
+        lines.append(f"  行业指标: {cost['sectors']} 个")
+        if self.windows:
+            points = f"，{cost['rolling_points']:,} 点" if cost['rolling_points'] is not None else ""
+            lines.append(f"  滚动窗口: {', '.join(map(str, self.windows))}{points}")
+        if self.companies:
+            lines.append(f"  多行业组合: {cost['mixes']} 个（去重后）")
+            lines.append(f"  β估计: {cost['betas']} 家公司")
+            lines.append(f"  公司评分: {cost['companies']} 家（向量化一次完成）")
+
+        return "\n".join(lines)
+
+
+def build_run_plan(
+    sectors_config: 'SectorsConfig',
+    data_fetcher: DataFetcher,
+    companies_config: Optional['CompaniesConfig'] = None,
+    windows: Optional[List[int]] = None,
+    batch_size: int = 100,
+    **kwargs
+) -> RunPlan:
+    """
+    构建运行计划
+
+    Args:
+        sectors_config: 行业配置
+        data_fetcher: 数据获取器（只读取存储清单估计下载量，不访问网络）
+        companies_config: 公司配置（rank时提供）
+        windows: 滚动窗口列表（calc-sector --rolling 时提供）
+        batch_size: 每次批量下载的最大ticker数
+        **kwargs: 下载窗口参数（start, end, period）
+
+    Returns:
+        RunPlan
+    """
+    sector_tickers: Dict[str, List[str]] = {}
+    for sector_name, sector_config in sectors_config.sectors.items():
+        for ticker in dict.fromkeys(sector_config.tickers):
+            sector_tickers.setdefault(ticker, []).append(sector_name)
+
+    company_tickers: Dict[str, List[str]] = {}
+    mixes: Dict[Tuple[Tuple[str, float], ...], List[str]] = {}
+    companies = companies_config.companies if companies_config is not None else []
+    for company in companies:
+        if company.sector is None and company.sector_mix is not None:
+            key = tuple(sorted(company.sector_mix.items()))
+            mixes.setdefault(key, []).append(company.name)
+
+        # 与 Ranker.estimate_betas 的条件一致
+        if company.ticker is not None and company.risk.mode == "SchemeC" and company.risk.beta is None:
+            company_tickers.setdefault(company.ticker, []).append(company.name)
+
+    tickers = list(dict.fromkeys([*sector_tickers, *company_tickers]))
+    fetch = data_fetcher.plan_fetch(tickers, batch_size=batch_size, **kwargs)
+
+    return RunPlan(
+        sector_tickers=sector_tickers,
+        company_tickers=company_tickers,
+        mixes=mixes,
+        windows=list(windows or []),
+        fetch=fetch,
+        companies=len(companies)
+    )
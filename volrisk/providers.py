@@ -0,0 +1,382 @@
+"""
+行情数据源模块
+抽象行情下载接口，支持单次请求下载多个ticker；
+本地数据源回放录制的行情与公司信息快照，用于离线复现与基准测试
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+import pandas as pd
+import yfinance as yf
+
+# 离线模式默认的回放目录
+DEFAULT_REPLAY_DIR = "~/.cache/volrisk/replay"
+
+
+class MarketDataProvider:
+    """行情数据源基类"""
+
+    name = "base"
+    host: Optional[str] = None  # 请求限速所按的host，None表示不限速
+    as_of: Optional[pd.Timestamp] = None  # 数据截止日期，None表示当天
+    default_cache_dir: Optional[str] = None  # 建议的缓存目录，None表示默认目录
+
+    def download(
+        self,
+        tickers: list[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = None,
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """
+        下载一个或多个ticker的行情数据
+
+        Args:
+            tickers: 股票代码列表
+            start: 开始日期（YYYY-MM-DD），优先于period
+            end: 结束日期（YYYY-MM-DD，不含）
+            period: 时间周期（1y, 2y等），当start为None时使用
+            interval: 数据间隔（1d=日线）
+            auto_adjust: 是否返回复权价（False时返回原始价与Adj Close）
+
+        Returns:
+            行情DataFrame；多ticker时列为 (字段, ticker) 两层索引
+        """
+        raise NotImplementedError
+
+    def history(
+        self,
+        ticker: str,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = "1y",
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """
+        下载单个ticker的行情（单层列索引），参数同download
+
+        Returns:
+            行情DataFrame，无数据时为空DataFrame
+        """
+        data = self.download(
+            [ticker], start=start, end=end, period=period,
+            interval=interval, auto_adjust=auto_adjust
+        )
+        return split_by_ticker(data, [ticker]).get(ticker, pd.DataFrame())
+
+    def info(self, ticker: str) -> dict:
+        """
+        获取公司信息快照（行业、市值、估值等，字段同 yfinance 的 Ticker.info）
+
+        Args:
+            ticker: 股票代码
+
+        Returns:
+            信息字典
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """基于 yfinance 的行情数据源"""
+
+    name = "yfinance"
+    host = "finance.yahoo.com"
+
+    def download(
+        self,
+        tickers: list[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = None,
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """调用 yf.download，一次请求获取全部ticker"""
+        if start is not None:
+            return yf.download(
+                tickers,
+                start=start,
+                end=end,
+                interval=interval,
+                auto_adjust=auto_adjust,
+                progress=False
+            )
+
+        return yf.download(
+            tickers,
+            period=period,
+            interval=interval,
+            auto_adjust=auto_adjust,
+            progress=False
+        )
+
+    def info(self, ticker: str) -> dict:
+        """调用 yf.Ticker(ticker).info"""
+        return yf.Ticker(ticker).info or {}
+
+
+def _bars_dir(interval: str, auto_adjust: bool) -> str:
+    """本地行情目录名：按数据间隔与复权方式区分"""
+    return interval if auto_adjust else f"{interval}_raw"
+
+
+class LocalProvider(MarketDataProvider):
+    """
+    本地文件数据源：回放录制的行情与公司信息快照
+
+    目录结构：
+        <root>/bars/<数据间隔>[_raw]/<ticker>.parquet 或 .csv（索引为日期）
+        <root>/info/<ticker>.json
+        <root>/replay.json（可选，{"as_of": "YYYY-MM-DD"}，period按该日期换算）
+    """
+
+    name = "local"
+
+    def __init__(self, root: str, as_of: Optional[str] = None):
+        """
+        初始化本地数据源
+
+        Args:
+            root: 回放目录
+            as_of: 数据截止日期，默认读取 replay.json，未记录时使用当天
+        """
+        self.root = Path(root).expanduser()
+        if not self.root.exists():
+            raise FileNotFoundError(f"回放目录不存在: {self.root}")
+
+        if as_of is None:
+            meta_file = self.root / "replay.json"
+            if meta_file.exists():
+                with open(meta_file, 'r', encoding='utf-8') as f:
+                    as_of = json.load(f).get('as_of')
+
+        self.as_of = pd.Timestamp(as_of).normalize() if as_of is not None else None
+        # 回放数据与在线数据不共用缓存
+        self.default_cache_dir = str(self.root / "cache")
+
+    def load_bars(
+        self,
+        ticker: str,
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> Optional[pd.DataFrame]:
+        """读取ticker的全部录制行情，未录制时返回None"""
+        bars_dir = self.root / "bars" / _bars_dir(interval, auto_adjust)
+
+        parquet_file = bars_dir / f"{ticker}.parquet"
+        if parquet_file.exists():
+            data = pd.read_parquet(parquet_file)
+        else:
+            csv_file = bars_dir / f"{ticker}.csv"
+            if not csv_file.exists():
+                return None
+            data = pd.read_csv(csv_file, index_col=0, parse_dates=True)
+
+        data.index = pd.DatetimeIndex(data.index)
+        if data.index.tz is not None:
+            data.index = data.index.tz_localize(None)
+        return data.sort_index()
+
+    def download(
+        self,
+        tickers: list[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = None,
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """按 start/end（或相对as_of的period）切出录制行情，未录制的ticker缺失"""
+        # 避免循环导入
+        from .data import period_start
+
+        if start is not None:
+            win_start = pd.Timestamp(start)
+        elif period is not None:
+            win_start = period_start(period, self.as_of)
+        else:
+            win_start = None
+        win_end = pd.Timestamp(end) if end is not None else None
+
+        frames = {}
+        for ticker in dict.fromkeys(tickers):
+            data = self.load_bars(ticker, interval, auto_adjust)
+            if data is None:
+                continue
+            if win_start is not None:
+                data = data[data.index >= win_start]
+            if win_end is not None:
+                data = data[data.index < win_end]
+            if self.as_of is not None:
+                data = data[data.index < self.as_of + pd.Timedelta(days=1)]
+            if not data.empty:
+                frames[ticker] = data
+
+        if not frames:
+            return pd.DataFrame()
+
+        return pd.concat(frames, axis=1, names=['Ticker', 'Price']).swaplevel(axis=1)
+
+    def info(self, ticker: str) -> dict:
+        """读取录制的公司信息快照，未录制时返回空字典"""
+        info_file = self.root / "info" / f"{ticker}.json"
+        if not info_file.exists():
+            return {}
+
+        with open(info_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class RecordingProvider(MarketDataProvider):
+    """录制数据源：转发请求到在线数据源，并把结果保存为 LocalProvider 可回放的文件"""
+
+    def __init__(self, inner: MarketDataProvider, root: str):
+        """
+        初始化录制数据源
+
+        Args:
+            inner: 实际请求的数据源
+            root: 录制目录，同一ticker多次录制的行情会合并
+        """
+        self.inner = inner
+        self.name = inner.name
+        self.host = inner.host
+        self.as_of = inner.as_of
+        self.root = Path(root).expanduser()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        as_of = inner.as_of if inner.as_of is not None else pd.Timestamp.today()
+        with open(self.root / "replay.json", 'w', encoding='utf-8') as f:
+            json.dump({'as_of': str(as_of.date()), 'source': inner.name}, f)
+
+    def _record_bars(self, ticker: str, data: pd.DataFrame, interval: str, auto_adjust: bool):
+        """合并保存ticker的行情（同一日期以新数据为准）"""
+        bars_dir = self.root / "bars" / _bars_dir(interval, auto_adjust)
+        bars_dir.mkdir(parents=True, exist_ok=True)
+        path = bars_dir / f"{ticker}.parquet"
+
+        with self._lock:
+            if path.exists():
+                data = pd.concat([pd.read_parquet(path), data])
+                data = data[~data.index.duplicated(keep='last')].sort_index()
+            data.to_parquet(path)
+
+    def download(
+        self,
+        tickers: list[str],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: Optional[str] = None,
+        interval: str = "1d",
+        auto_adjust: bool = True
+    ) -> pd.DataFrame:
+        """下载并录制每个ticker的行情"""
+        data = self.inner.download(
+            tickers, start=start, end=end, period=period,
+            interval=interval, auto_adjust=auto_adjust
+        )
+
+        for ticker, frame in split_by_ticker(data, list(tickers)).items():
+            try:
+                self._record_bars(ticker, frame, interval, auto_adjust)
+            except Exception as e:
+                print(f"警告: 录制 {ticker} 行情失败: {e}")
+
+        return data
+
+    def info(self, ticker: str) -> dict:
+        """获取并录制公司信息快照"""
+        info = self.inner.info(ticker)
+
+        info_dir = self.root / "info"
+        info_dir.mkdir(parents=True, exist_ok=True)
+        with open(info_dir / f"{ticker}.json", 'w', encoding='utf-8') as f:
+            json.dump(info, f, ensure_ascii=False, indent=2, default=str)
+
+        return info
+
+
+def get_provider(
+    spec: Optional[str] = None,
+    record: Optional[str] = None
+) -> MarketDataProvider:
+    """
+    根据配置创建数据源
+
+    Args:
+        spec: 数据源：yfinance、local:<目录> 或 offline（默认回放目录）；
+            默认读取环境变量 VOLRISK_PROVIDER，未设置则为 yfinance
+        record: 录制目录，指定时在线数据源的结果同时保存供离线回放
+
+    Returns:
+        数据源实例
+    """
+    spec = spec or os.environ.get("VOLRISK_PROVIDER") or "yfinance"
+
+    if spec == "yfinance":
+        provider = YFinanceProvider()
+    elif spec == "offline":
+        provider = LocalProvider(DEFAULT_REPLAY_DIR)
+    elif spec.startswith("local:"):
+        provider = LocalProvider(spec[len("local:"):])
+    else:
+        raise ValueError(f"不支持的数据源: {spec}（可选 yfinance、local:<目录>、offline）")
+
+    if record is not None:
+        if isinstance(provider, LocalProvider):
+            raise ValueError("本地数据源不支持录制")
+        provider = RecordingProvider(provider, record)
+
+    return provider
+
+
+def split_by_ticker(data: pd.DataFrame, tickers: list[str]) -> dict[str, pd.DataFrame]:
+    """
+    将多ticker下载结果拆分为每个ticker一个DataFrame
+
+    兼容 (字段, ticker) 与 (ticker, 字段) 两种列索引顺序，
+    以及单ticker下载返回的单层列索引
+
+    Args:
+        data: 下载结果
+        tickers: 请求的ticker列表
+
+    Returns:
+        字典，键为ticker，值为单层列索引的行情DataFrame（不含全空行）
+    """
+    if data is None or data.empty:
+        return {}
+
+    if not isinstance(data.columns, pd.MultiIndex):
+        if len(tickers) != 1:
+            return {}
+        frame = data.dropna(how='all')
+        return {tickers[0]: frame} if not frame.empty else {}
+
+    # 找到包含ticker的列索引层
+    level = None
+    for i in range(data.columns.nlevels):
+        if set(tickers) & set(data.columns.get_level_values(i)):
+            level = i
+            break
+    if level is None:
+        return {}
+
+    available = set(data.columns.get_level_values(level))
+    frames = {}
+    for ticker in tickers:
+        if ticker not in available:
+            continue
+        frame = data.xs(ticker, axis=1, level=level).dropna(how='all')
+        if not frame.empty:
+            frames[ticker] = frame
+
+    return frames
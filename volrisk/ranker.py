@@ -5,18 +5,25 @@
 
 from typing import Dict, List, Optional, Union
 from pathlib import Path
+import numpy as np
 import pandas as pd
 import yaml
 from pydantic import BaseModel, Field
 
+from .beta import BetaCalculator
+from .metrics import get_returns
 from .sector import SectorAnalyzer, SectorMetrics, SectorsConfig
-from .expected import ValuationModel, calculate_expected_return
-from .risk import RiskConfig, calculate_risk
+from .expected import ValuationModel, expected_return_batch
+from .export import (
+    COLUMNAR_FORMATS, FMT_2, FMT_4, FMT_6, FMT_8, FMT_INT, write_tables, write_workbook
+)
+from .risk import RiskConfig, calculate_risk_batch, risk_config_columns
 
 
 class CompanyConfig(BaseModel):
     """公司配置"""
     name: str = Field(..., description="公司名称")
+    ticker: Optional[str] = Field(None, description="个股代码（未指定risk.beta时用于估计β）")
     sector: Optional[str] = Field(None, description="单一行业代码")
     sector_mix: Optional[Dict[str, float]] = Field(None, description="多行业权重混合")
     expected_return: Optional[float] = Field(None, description="直接指定的期望收益")
@@ -48,180 +55,268 @@ class CompaniesConfig(BaseModel):
         return cls(**data)
 
 
-class CompanyResult:
-    """公司分析结果"""
-
-    def __init__(
-        self,
-        name: str,
-        sector_info: str,
-        sigma_down: float,
-        sigma_total: float,
-        mdd: float,
-        er_raw: float,
-        er: float,
-        loss_risk: float,
-        value_to_risk: float,
-        risk_details: dict,
-        er_details: dict
-    ):
-        self.name = name
-        self.sector_info = sector_info
-        self.sigma_down = sigma_down
-        self.sigma_total = sigma_total
-        self.mdd = mdd
-        self.er_raw = er_raw
-        self.er = er
-        self.loss_risk = loss_risk
-        self.value_to_risk = value_to_risk
-        self.risk_details = risk_details
-        self.er_details = er_details
-
-    def to_dict(self) -> dict:
-        """转换为字典（用于DataFrame）"""
-        base = {
-            '公司名称': self.name,
-            '行业代理': self.sector_info,
-            'σ总波动': f"{self.sigma_total:.4f}",
-            'σ下行': f"{self.sigma_down:.4f}",
-            'MDD': f"{abs(self.mdd):.4f}",
-            'ER原始': f"{self.er_raw:.4f}",
-            'ER执行后': f"{self.er:.4f}",
-            '损失风险': f"{self.loss_risk:.4f}",
-            '值博率': f"{self.value_to_risk:.2f}",
-        }
-
-        # 添加风险参数
-        if self.risk_details['mode'] == 'SemiMDD':
-            base['Idio'] = f"{self.risk_details['params'].get('idio', 1.0):.2f}"
-            base['W'] = f"{self.risk_details['params'].get('w', 0.5):.2f}"
-        else:  # SchemeC
-            base['Beta'] = f"{self.risk_details['params'].get('beta', 1.0):.2f}"
-
-        # 添加脆弱度
-        fragility = self.risk_details.get('fragility_add', 0.0)
-        if fragility > 0:
-            base['脆弱度加点'] = f"{fragility:.4f}"
-
-        return base
-
-
 class Ranker:
     """排名器"""
 
     def __init__(
         self,
-        sector_analyzer: Optional[SectorAnalyzer] = None
+        sector_analyzer: Optional[SectorAnalyzer] = None,
+        beta_calculator: Optional[BetaCalculator] = None,
+        beta_kind: str = "rolling",
+        beta_window: int = 120,
+        beta_halflife: float = 60.0
     ):
         """
         初始化排名器
 
         Args:
             sector_analyzer: 行业分析器，如果为None则创建新实例
+            beta_calculator: β计算器（配置了ticker但未指定risk.beta的公司用其估计β）
+            beta_kind: β估计方式（rolling/ewma/full，取最新值）
+            beta_window: 滚动β窗口长度
+            beta_halflife: 指数加权β半衰期
         """
         self.sector_analyzer = sector_analyzer or SectorAnalyzer()
+        self.beta_calculator = beta_calculator or BetaCalculator()
+        self.beta_kind = beta_kind
+        self.beta_window = beta_window
+        self.beta_halflife = beta_halflife
+
+    def estimate_betas(
+        self,
+        companies: List[CompanyConfig],
+        sector_metrics: Dict[str, SectorMetrics],
+        method: str = "weighted",
+        mar: float = 0.0,
+        prices: Optional[Dict[str, pd.Series]] = None
+    ) -> Dict[int, float]:
+        """
+        估计未指定β的Scheme C公司的β（个股相对行业收益率的最新滚动/指数加权β）
+
+        Args:
+            companies: 公司配置列表
+            sector_metrics: 行业指标字典（使用其中的行业收益率序列）
+            method: 多行业合成方式
+            mar: 最低可接受收益
+            prices: 已获取的个股价格序列（如运行计划统一获取的结果），缺失的再获取
+
+        Returns:
+            字典，键为公司在列表中的位置，值为β（估计失败的公司不在其中）
+        """
+        targets = {}  # 位置 -> 行业收益率
+        for position, company in enumerate(companies):
+            if company.ticker is None or company.risk.mode != "SchemeC" or company.risk.beta is not None:
+                continue
+
+            if company.sector is not None:
+                metrics = sector_metrics.get(company.sector)
+                sector_returns = metrics.returns if metrics is not None else None
+            elif company.sector_mix is not None:
+                mixed = self.sector_analyzer.calculate_mixed_sector_metrics(
+                    company.sector_mix, sector_metrics, method="blend", mar=mar
+                )
+                sector_returns = mixed['returns'] if mixed is not None else None
+            else:
+                sector_returns = None
+
+            if sector_returns is not None and len(sector_returns) > 0:
+                targets[position] = sector_returns
+
+        if not targets:
+            return {}
+
+        prices = dict(prices or {})
+        missing = list(dict.fromkeys(
+            companies[i].ticker for i in targets if companies[i].ticker not in prices
+        ))
+        if missing:
+            start = min(returns.index[0] for returns in targets.values())
+            prices.update(self.sector_analyzer.data_fetcher.fetch_multiple(
+                missing, start=str(start.date())
+            ))
+
+        betas = {}
+        for position, sector_returns in targets.items():
+            company = companies[position]
+            if company.ticker not in prices:
+                print(f"警告: {company.name} 无法获取 {company.ticker} 的数据，β使用默认值1.0")
+                continue
+
+            beta = self.beta_calculator.latest(
+                get_returns(prices[company.ticker]),
+                sector_returns,
+                kind=self.beta_kind,
+                window=self.beta_window,
+                halflife=self.beta_halflife
+            )
+            if beta is None or pd.isna(beta):
+                print(f"警告: {company.name} 重叠数据不足，β使用默认值1.0")
+                continue
+
+            if beta < 0:
+                print(f"警告: {company.name} 估计β为负({beta:.2f})，按0处理")
+                beta = 0.0
+
+            betas[position] = beta
+            print(f"  {company.name}: β({self.beta_kind}) = {beta:.2f}")
+
+        return betas
 
     def analyze_companies(
         self,
         companies_config: CompaniesConfig,
-        sector_metrics: Dict[str, SectorMetrics]
-    ) -> List[CompanyResult]:
+        sector_metrics: Dict[str, SectorMetrics],
+        method: str = "weighted",
+        mar: float = 0.0,
+        prices: Optional[Dict[str, pd.Series]] = None
+    ) -> pd.DataFrame:
         """
         分析所有公司
 
         Args:
             companies_config: 公司配置
             sector_metrics: 行业指标字典
+            method: 多行业合成方式（weighted/blend，见 calculate_mixed_sector_metrics）
+            mar: 最低可接受收益
+            prices: 已获取的个股价格序列（传给 estimate_betas）
 
         Returns:
-            公司结果列表
+            结果表（每行一家公司，按配置顺序，未排名），列为：
+            - name, sector_info（分类）, mode（分类）
+            - sigma_down, sigma_total, mdd: 行业风险指标
+            - er_raw, er, execution_prob: 期望收益
+            - beta, frag, w_down, w_beta, w_frag, idio, w, fragility_add: 风险参数
+            - downside_component, beta_component, fragility_component, mdd_component: 风险分解
+            - loss_risk, value_to_risk
         """
-        results = []
-
-        for company_config in companies_config.companies:
+        companies = companies_config.companies
+
+        # 所有多行业公司的混合指标一次批量计算
+        mix_positions = [
+            i for i, company in enumerate(companies)
+            if company.sector is None and company.sector_mix is not None
+        ]
+        mixed_batch = self.sector_analyzer.calculate_mixed_sector_metrics_batch(
+            [companies[i].sector_mix for i in mix_positions],
+            sector_metrics,
+            method=method,
+            mar=mar
+        ) if mix_positions else []
+        mixed_by_position = dict(zip(mix_positions, mixed_batch))
+
+        # 配置了ticker但未指定β的公司，用个股相对行业的最新β
+        estimated_betas = self.estimate_betas(companies, sector_metrics, method, mar, prices)
+
+        # 验证配置并收集行业指标（只做属性读取，计算在下面整列进行）
+        positions = []
+        sector_info = []
+        sector_columns = []  # (sigma_down, sigma_total, mdd)
+        for position, company_config in enumerate(companies):
             try:
-                # 验证配置
                 company_config.validate_sector()
                 company_config.validate_expected_return()
+            except ValueError as e:
+                print(f"错误: 分析 {company_config.name} 失败: {e}")
+                continue
 
-                # 获取行业指标
-                if company_config.sector is not None:
-                    # 单一行业
-                    sector_name = company_config.sector
-                    if sector_name not in sector_metrics:
-                        print(f"错误: {company_config.name} 的行业 {sector_name} 没有指标数据")
-                        continue
-
-                    metrics = sector_metrics[sector_name]
-                    sigma_down = metrics.sigma_down
-                    sigma_total = metrics.sigma_total
-                    mdd = metrics.mdd
-                    sector_info = f"{sector_name}({','.join(metrics.tickers)})"
-
-                else:
-                    # 混合行业
-                    mixed_metrics = self.sector_analyzer.calculate_mixed_sector_metrics(
-                        company_config.sector_mix,
-                        sector_metrics
-                    )
-                    if mixed_metrics is None:
-                        print(f"错误: {company_config.name} 的混合行业指标计算失败")
-                        continue
-
-                    sigma_down = mixed_metrics['sigma_down']
-                    sigma_total = mixed_metrics['sigma_total']
-                    mdd = mixed_metrics['mdd']
-
-                    # 构建sector_info字符串
-                    mix_parts = [f"{s}({w:.0%})" for s, w in company_config.sector_mix.items()]
-                    sector_info = " + ".join(mix_parts)
-
-                # 计算期望收益
-                er, er_details = calculate_expected_return(
-                    expected_return=company_config.expected_return,
-                    model=company_config.model
-                )
-
-                # 计算风险
-                risk_result = calculate_risk(
-                    sigma_down=sigma_down,
-                    sigma_total=sigma_total,
-                    mdd=mdd,
-                    config=company_config.risk
-                )
-
-                loss_risk = risk_result['total_risk']
-
-                # 计算值博率
-                value_to_risk = er / loss_risk if loss_risk > 0 else float('inf')
-
-                # 创建结果
-                result = CompanyResult(
-                    name=company_config.name,
-                    sector_info=sector_info,
-                    sigma_down=sigma_down,
-                    sigma_total=sigma_total,
-                    mdd=mdd,
-                    er_raw=er_details.get('er_raw', er),
-                    er=er,
-                    loss_risk=loss_risk,
-                    value_to_risk=value_to_risk,
-                    risk_details=risk_result,
-                    er_details=er_details
+            if company_config.sector is not None:
+                # 单一行业
+                sector_name = company_config.sector
+                if sector_name not in sector_metrics:
+                    print(f"错误: {company_config.name} 的行业 {sector_name} 没有指标数据")
+                    continue
+
+                metrics = sector_metrics[sector_name]
+                sector_columns.append((metrics.sigma_down, metrics.sigma_total, metrics.mdd))
+                sector_info.append(f"{sector_name}({','.join(metrics.tickers)})")
+            else:
+                # 混合行业
+                mixed_metrics = mixed_by_position.get(position)
+                if mixed_metrics is None:
+                    print(f"错误: {company_config.name} 的混合行业指标计算失败")
+                    continue
+
+                sector_columns.append(
+                    (mixed_metrics['sigma_down'], mixed_metrics['sigma_total'], mixed_metrics['mdd'])
                 )
+                mix_parts = [f"{s}({w:.0%})" for s, w in company_config.sector_mix.items()]
+                sector_info.append(" + ".join(mix_parts))
+
+            positions.append(position)
+
+        valid = [companies[i] for i in positions]
+        sigma_down, sigma_total, mdd = np.array(sector_columns, dtype=float).reshape(len(valid), 3).T
+
+        # 期望收益
+        er = expected_return_batch(
+            [c.expected_return for c in valid],
+            [c.model for c in valid]
+        )
+
+        # 风险（未指定β时使用估计值）
+        risk_columns = risk_config_columns([c.risk for c in valid])
+        for row, position in enumerate(positions):
+            if position in estimated_betas:
+                risk_columns['beta'][row] = estimated_betas[position]
+        risk = calculate_risk_batch(sigma_down, sigma_total, mdd, risk_columns)
+
+        loss_risk = risk['total_risk']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value_to_risk = np.where(loss_risk > 0, er['er'] / loss_risk, np.inf)
+
+        table = pd.DataFrame({
+            'name': pd.array([c.name for c in valid], dtype=object),
+            'sector_info': pd.Categorical(sector_info),
+            'mode': pd.Categorical(risk_columns['mode'], categories=["SemiMDD", "SchemeC"]),
+            'sigma_down': sigma_down,
+            'sigma_total': sigma_total,
+            'mdd': mdd,
+            'er_raw': er['er_raw'],
+            'er': er['er'],
+            'execution_prob': er['execution_prob'],
+            'beta': risk['beta'],
+            'frag': risk_columns['frag'],
+            'w_down': risk_columns['w_down'],
+            'w_beta': risk_columns['w_beta'],
+            'w_frag': risk_columns['w_frag'],
+            'idio': risk_columns['idio'],
+            'w': risk_columns['w'],
+            'fragility_add': risk_columns['fragility_add'],
+            'downside_component': risk['downside_component'],
+            'beta_component': risk['beta_component'],
+            'fragility_component': risk['fragility_component'],
+            'mdd_component': risk['mdd_component'],
+            'loss_risk': loss_risk,
+            'value_to_risk': value_to_risk
+        })
+
+        if len(table) > 0:
+            print("\n".join(
+                f"✓ {name}: 值博率 = {vtr:.2f}"
+                for name, vtr in zip(table['name'], table['value_to_risk'])
+            ))
+
+        return table
+
+    @staticmethod
+    def rank(results: pd.DataFrame) -> pd.DataFrame:
+        """
+        按值博率降序排名（稳定排序，值博率相同时保持配置顺序）
 
-                results.append(result)
-                print(f"✓ {company_config.name}: 值博率 = {value_to_risk:.2f}")
-
-            except Exception as e:
-                print(f"错误: 分析 {company_config.name} 失败: {e}")
-                continue
+        Args:
+            results: analyze_companies 的结果表
 
-        return results
+        Returns:
+            排序后的结果表，首列为 rank（从1开始）
+        """
+        order = np.argsort(-results['value_to_risk'].to_numpy(), kind='stable')
+        ranked = results.iloc[order].reset_index(drop=True)
+        ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+        return ranked
 
     def rank_and_export(
         self,
-        results: List[CompanyResult],
+        results: pd.DataFrame,
         output_path: str,
         format: str = "xlsx",
         sector_metrics: Dict[str, SectorMetrics] = None
@@ -230,42 +325,46 @@ class Ranker:
         排序并导出结果
 
         Args:
-            results: 公司结果列表
+            results: analyze_companies 的结果表
             output_path: 输出文件路径
-            format: 输出格式（xlsx, csv, json）
+            format: 输出格式（xlsx, csv, json, parquet, arrow）；
+                parquet/arrow写出完整结果表，行业指标写到 <文件名>.sectors.<后缀>
             sector_metrics: 行业指标字典（用于详细报告）
+
+        Returns:
+            排名汇总表（写出文件之后才构建）
         """
-        if not results:
+        if results is None or results.empty:
             print("警告: 没有结果可导出")
             return
 
-        # 按值博率降序排序
-        sorted_results = sorted(results, key=lambda x: x.value_to_risk, reverse=True)
-
-        # 转换为DataFrame
-        df = pd.DataFrame([r.to_dict() for r in sorted_results])
-
-        # 添加排名列
-        df.insert(0, '排名', range(1, len(df) + 1))
+        # 按值博率降序排序，格式化只在导出时进行
+        ranked = self.rank(results)
 
         # 导出
         output_path = Path(output_path)
 
         if format == "xlsx":
-            # 生成详细的Excel报告
+            # 生成详细的Excel报告（各sheet按块从结果表构建并流式写出）
             self._export_detailed_excel(
-                sorted_results,
-                df,
+                ranked,
                 output_path,
                 sector_metrics
             )
             print(f"\n✓ 结果已导出到: {output_path}")
         elif format == "csv":
-            df.to_csv(output_path, index=False, encoding='utf-8-sig')
+            self._summary_frame(ranked).to_csv(output_path, index=False, encoding='utf-8-sig')
             print(f"\n✓ 结果已导出到: {output_path}")
         elif format == "json":
-            df.to_json(output_path, orient='records', force_ascii=False, indent=2)
+            self._summary_frame(ranked).to_json(output_path, orient='records', force_ascii=False, indent=2)
             print(f"\n✓ 结果已导出到: {output_path}")
+        elif format in COLUMNAR_FORMATS:
+            # 完整结果表（含风险分解各列）与行业指标分别写为独立的表
+            tables = {None: ranked}
+            if sector_metrics:
+                tables['sectors'] = self._sector_table(sector_metrics)
+            paths = write_tables(tables, output_path, format)
+            print(f"\n✓ 结果已导出到: {', '.join(str(path) for path in paths)}")
         else:
             raise ValueError(f"不支持的输出格式: {format}")
 
@@ -273,180 +372,224 @@ class Ranker:
         print("\n" + "=" * 80)
         print("排名前10的公司:")
         print("=" * 80)
-        for i, result in enumerate(sorted_results[:10], 1):
-            print(f"{i:2d}. {result.name:12s} | 值博率: {result.value_to_risk:6.2f} | "
-                  f"ER: {result.er:6.2%} | 风险: {result.loss_risk:6.2%}")
+        for row in ranked.head(10).itertuples():
+            print(f"{row.rank:2d}. {row.name:12s} | 值博率: {row.value_to_risk:6.2f} | "
+                  f"ER: {row.er:6.2%} | 风险: {row.loss_risk:6.2%}")
         print("=" * 80)
 
+        return self._summary_frame(ranked)
+
+    @staticmethod
+    def _summary_frame(ranked: pd.DataFrame, full: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        排名汇总表（数值列保持float）
+
+        Args:
+            ranked: 排名后的结果表（或其中的一块行）
+            full: 完整结果表，决定可选列是否出现（分块构建时各块列一致），默认为ranked
+        """
+        full = ranked if full is None else full
+        is_scheme_c = (ranked['mode'] == "SchemeC").to_numpy()
+        any_scheme_c = (full['mode'] == "SchemeC").any()
+        any_semimdd = (full['mode'] != "SchemeC").any()
+
+        df = pd.DataFrame({
+            '排名': ranked['rank'],
+            '公司名称': ranked['name'],
+            '行业代理': ranked['sector_info'].astype(str),
+            'σ总波动': ranked['sigma_total'],
+            'σ下行': ranked['sigma_down'],
+            'MDD': ranked['mdd'].abs(),
+            'ER原始': ranked['er_raw'],
+            'ER执行后': ranked['er'],
+            '损失风险': ranked['loss_risk'],
+            '值博率': ranked['value_to_risk'],
+        })
+
+        # 风险参数：SemiMDD显示Idio/W，SchemeC显示Beta
+        if any_semimdd:
+            df['Idio'] = ranked['idio'].where(~is_scheme_c)
+            df['W'] = ranked['w'].where(~is_scheme_c)
+        if any_scheme_c:
+            df['Beta'] = ranked['beta'].where(is_scheme_c)
+
+        # 脆弱度（SemiMDD的绝对加点）
+        has_fragility = (~is_scheme_c) & (ranked['fragility_add'] > 0).to_numpy()
+        if ((full['mode'] != "SchemeC") & (full['fragility_add'] > 0)).any():
+            df['脆弱度加点'] = ranked['fragility_add'].where(has_fragility)
+
         return df
 
     def _export_detailed_excel(
         self,
-        sorted_results: List[CompanyResult],
-        df: pd.DataFrame,
+        ranked: pd.DataFrame,
         output_path: Path,
-        sector_metrics: Dict[str, SectorMetrics] = None
+        sector_metrics: Dict[str, SectorMetrics] = None,
+        chunk_size: int = 5000
     ):
         """
-        导出详细的Excel报告（多sheet）
+        导出详细的Excel报告（多sheet，流式写出）
+
+        各sheet不整张构建：每次从排名后的结果表取 chunk_size 行构建该块的sheet行并写出，
+        除结果表本身外只占用一块的内存
 
         Args:
-            sorted_results: 排序后的结果列表
-            df: 基础DataFrame
+            ranked: 排名后的结果表
             output_path: 输出路径
             sector_metrics: 行业指标字典
+            chunk_size: 每块的行数
         """
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        def chunks(builder):
+            # 至少产生一块，空结果表也写出表头
+            for start in range(0, max(len(ranked), 1), chunk_size):
+                yield builder(ranked.iloc[start:start + chunk_size], ranked)
+
+        def sheets():
             # Sheet 1: 排名汇总
-            df.to_excel(writer, sheet_name='排名汇总', index=False)
+            yield '排名汇总', chunks(self._summary_frame), SUMMARY_FORMATS
 
             # Sheet 2: 详细计算过程
-            self._create_calculation_sheet(writer, sorted_results)
+            yield '详细计算', chunks(self._calculation_frame), CALCULATION_FORMATS
 
-            # Sheet 3: 行业风险数据
+            # Sheet 3: 行业风险数据（每个行业一行，整表构建）
             if sector_metrics:
-                self._create_sector_sheet(writer, sector_metrics)
+                yield '行业风险数据', self._sector_frame(sector_metrics), SECTOR_FORMATS
 
             # Sheet 4: Scheme C分解
-            self._create_risk_breakdown_sheet(writer, sorted_results)
-
-    def _create_calculation_sheet(
-        self,
-        writer: pd.ExcelWriter,
-        results: List[CompanyResult]
-    ):
-        """创建详细计算过程sheet"""
-        calc_data = []
-
-        for i, result in enumerate(results, 1):
-            # 基础信息
-            row = {
-                '排名': i,
-                '公司名称': result.name,
-                '行业代理': result.sector_info,
-            }
-
-            # 行业风险数据（真实数据）
-            row['σ下行(行业)'] = f"{result.sigma_down:.6f}"
-            row['σ总波动(行业)'] = f"{result.sigma_total:.6f}"
-            row['MDD(行业)'] = f"{abs(result.mdd):.6f}"
-
-            # 个股参数
-            if result.risk_details['mode'] == 'SchemeC':
-                beta = result.risk_details['params'].get('beta', 1.0)
-                frag = result.risk_details['params'].get('frag', 0.0)
-                row['β系数'] = f"{beta:.4f}"
-                row['脆弱度(%)'] = f"{frag:.2f}"
-
-                # Scheme C三项分解
-                w_down = result.risk_details.get('weights', {}).get('w_down', 0.6)
-                w_beta = result.risk_details.get('weights', {}).get('w_beta', 0.3)
-                w_frag = result.risk_details.get('weights', {}).get('w_frag', 0.1)
-
-                component_down = w_down * result.sigma_down
-                component_beta = w_beta * (beta * result.sigma_total)
-                component_frag = w_frag * (frag / 100.0)
-
-                row['下行项(60%)'] = f"{component_down:.6f}"
-                row['β项(30%)'] = f"{component_beta:.6f}"
-                row['脆弱项(10%)'] = f"{component_frag:.6f}"
-                row['损失风险(合计)'] = f"{result.loss_risk:.6f}"
-
-                # 验证计算
-                calc_sum = component_down + component_beta + component_frag
-                row['计算验证'] = f"{calc_sum:.6f}"
-                row['误差'] = f"{abs(calc_sum - result.loss_risk):.8f}"
-
-            # 期望收益
-            row['ER原始'] = f"{result.er_raw:.6f}"
-            row['执行概率'] = f"{result.er_details.get('execution_prob', 1.0):.4f}"
-            row['ER执行后'] = f"{result.er:.6f}"
-
-            # 值博率
-            row['值博率'] = f"{result.value_to_risk:.6f}"
-            row['值博率验证'] = f"{result.er / result.loss_risk:.6f}"
-
-            calc_data.append(row)
-
-        df_calc = pd.DataFrame(calc_data)
-        df_calc.to_excel(writer, sheet_name='详细计算', index=False)
-
-    def _create_sector_sheet(
-        self,
-        writer: pd.ExcelWriter,
-        sector_metrics: Dict[str, SectorMetrics]
-    ):
-        """创建行业风险数据sheet"""
-        sector_data = []
-
-        for sector_name, metrics in sector_metrics.items():
-            row = {
-                '行业代码': sector_name,
-                'ETF代码': ','.join(metrics.tickers),
-                'σ下行(年化)': f"{metrics.sigma_down:.6f}",
-                'σ总波动(年化)': f"{metrics.sigma_total:.6f}",
-                'MDD': f"{abs(metrics.mdd):.6f}",
-                '数据点数': metrics.sample_days,
-                '交易日数': metrics.trading_days,
-                '起始日期': metrics.start_date or 'N/A',
-                '结束日期': metrics.end_date or 'N/A',
-            }
-            sector_data.append(row)
+            yield 'Scheme C分解', chunks(self._risk_breakdown_frame), BREAKDOWN_FORMATS
+
+        write_workbook(output_path, sheets(), chunk_size)
+
+    @staticmethod
+    def _calculation_frame(ranked: pd.DataFrame, full: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """详细计算过程表（ranked/full 同 _summary_frame）"""
+        full = ranked if full is None else full
+        is_scheme_c = (ranked['mode'] == "SchemeC").to_numpy()
+
+        # Scheme C三项分解直接使用结果表中的分项
+        calc_sum = (
+            ranked['downside_component'] + ranked['beta_component'] + ranked['fragility_component']
+        )
+
+        df_calc = pd.DataFrame({
+            '排名': ranked['rank'],
+            '公司名称': ranked['name'],
+            '行业代理': ranked['sector_info'].astype(str),
+            'σ下行(行业)': ranked['sigma_down'],
+            'σ总波动(行业)': ranked['sigma_total'],
+            'MDD(行业)': ranked['mdd'].abs(),
+        })
+        if (full['mode'] == "SchemeC").any():
+            df_calc['β系数'] = ranked['beta'].where(is_scheme_c)
+            df_calc['脆弱度(%)'] = ranked['frag'].where(is_scheme_c)
+            df_calc['下行项(60%)'] = ranked['downside_component'].where(is_scheme_c)
+            df_calc['β项(30%)'] = ranked['beta_component'].where(is_scheme_c)
+            df_calc['脆弱项(10%)'] = ranked['fragility_component'].where(is_scheme_c)
+            df_calc['损失风险(合计)'] = ranked['loss_risk'].where(is_scheme_c)
+            df_calc['计算验证'] = calc_sum.where(is_scheme_c)
+            df_calc['误差'] = (calc_sum - ranked['loss_risk']).abs().where(is_scheme_c)
+
+        # 期望收益
+        df_calc['ER原始'] = ranked['er_raw']
+        df_calc['执行概率'] = ranked['execution_prob']
+        df_calc['ER执行后'] = ranked['er']
+
+        # 值博率
+        df_calc['值博率'] = ranked['value_to_risk']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            df_calc['值博率验证'] = ranked['er'] / ranked['loss_risk']
+
+        return df_calc
+
+    @staticmethod
+    def _sector_frame(sector_metrics: Dict[str, SectorMetrics]) -> pd.DataFrame:
+        """行业风险数据表（按σ下行数值升序）"""
+        df_sector = pd.DataFrame({
+            '行业代码': list(sector_metrics),
+            'ETF代码': [','.join(m.tickers) for m in sector_metrics.values()],
+            'σ下行(年化)': [m.sigma_down for m in sector_metrics.values()],
+            'σ总波动(年化)': [m.sigma_total for m in sector_metrics.values()],
+            'MDD': [abs(m.mdd) for m in sector_metrics.values()],
+            '数据点数': [m.sample_days for m in sector_metrics.values()],
+            '交易日数': [m.trading_days for m in sector_metrics.values()],
+            '起始日期': [m.start_date or 'N/A' for m in sector_metrics.values()],
+            '结束日期': [m.end_date or 'N/A' for m in sector_metrics.values()],
+        })
 
         # 按σ下行排序
-        df_sector = pd.DataFrame(sector_data)
-        df_sector = df_sector.sort_values('σ下行(年化)')
+        df_sector = df_sector.sort_values('σ下行(年化)', kind='stable').reset_index(drop=True)
         df_sector.insert(0, '风险排名', range(1, len(df_sector) + 1))
-        df_sector.to_excel(writer, sheet_name='行业风险数据', index=False)
-
-    def _create_risk_breakdown_sheet(
-        self,
-        writer: pd.ExcelWriter,
-        results: List[CompanyResult]
-    ):
-        """创建Scheme C风险分解sheet"""
-        breakdown_data = []
-
-        for i, result in enumerate(results, 1):
-            if result.risk_details['mode'] != 'SchemeC':
-                continue
-
-            beta = result.risk_details['params'].get('beta', 1.0)
-            frag = result.risk_details['params'].get('frag', 0.0)
-
-            # 权重
-            w_down = result.risk_details.get('weights', {}).get('w_down', 0.6)
-            w_beta = result.risk_details.get('weights', {}).get('w_beta', 0.3)
-            w_frag = result.risk_details.get('weights', {}).get('w_frag', 0.1)
-
-            # 计算各项
-            component_down = w_down * result.sigma_down
-            component_beta = w_beta * (beta * result.sigma_total)
-            component_frag = w_frag * (frag / 100.0)
-
-            row = {
-                '排名': i,
-                '公司': result.name,
-                '--- 输入参数 ---': '',
-                'σ下行': f"{result.sigma_down:.6f}",
-                'σ总波动': f"{result.sigma_total:.6f}",
-                'β': f"{beta:.4f}",
-                'Frag(%)': f"{frag:.2f}",
-                '--- 权重配置 ---': '',
-                'W下行': f"{w_down:.2f}",
-                'Wβ': f"{w_beta:.2f}",
-                'W脆弱': f"{w_frag:.2f}",
-                '--- Scheme C计算 ---': '',
-                '①下行项': f"{w_down:.2f} × {result.sigma_down:.6f} = {component_down:.6f}",
-                '②β项': f"{w_beta:.2f} × ({beta:.4f} × {result.sigma_total:.6f}) = {component_beta:.6f}",
-                '③脆弱项': f"{w_frag:.2f} × {frag/100:.6f} = {component_frag:.6f}",
-                '总风险': f"{component_down:.6f} + {component_beta:.6f} + {component_frag:.6f} = {result.loss_risk:.6f}",
-                '--- 值博率 ---': '',
-                'ER': f"{result.er:.6f}",
-                '损失风险': f"{result.loss_risk:.6f}",
-                '值博率': f"{result.er:.6f} ÷ {result.loss_risk:.6f} = {result.value_to_risk:.6f}",
-            }
-            breakdown_data.append(row)
-
-        df_breakdown = pd.DataFrame(breakdown_data)
-        df_breakdown.to_excel(writer, sheet_name='Scheme C分解', index=False)
+        return df_sector
+
+    @staticmethod
+    def _sector_table(sector_metrics: Dict[str, SectorMetrics]) -> pd.DataFrame:
+        """行业指标表（列式输出用，列名与SectorMetrics属性一致）"""
+        metrics = list(sector_metrics.values())
+        return pd.DataFrame({
+            'sector': pd.array(list(sector_metrics), dtype=object),
+            'tickers': pd.array([','.join(m.tickers) for m in metrics], dtype=object),
+            'method': pd.Categorical([m.method for m in metrics]),
+            'sigma_down': np.array([m.sigma_down for m in metrics], dtype=float),
+            'sigma_total': np.array([m.sigma_total for m in metrics], dtype=float),
+            'mdd': np.array([m.mdd for m in metrics], dtype=float),
+            'sample_days': np.array([m.sample_days for m in metrics], dtype='int64'),
+            'trading_days': np.array([m.trading_days for m in metrics], dtype='int64'),
+            'start_date': pd.to_datetime([m.start_date for m in metrics]),
+            'end_date': pd.to_datetime([m.end_date for m in metrics]),
+        })
+
+    @staticmethod
+    def _risk_breakdown_frame(ranked: pd.DataFrame, full: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """Scheme C风险分解表：输入参数、权重、三项分解与值博率（列固定，full不影响）"""
+        scheme_c = ranked[ranked['mode'] == "SchemeC"]
+
+        return pd.DataFrame({
+            '排名': scheme_c['rank'],
+            '公司': scheme_c['name'],
+            '--- 输入参数 ---': '',
+            'σ下行': scheme_c['sigma_down'],
+            'σ总波动': scheme_c['sigma_total'],
+            'β': scheme_c['beta'],
+            'Frag(%)': scheme_c['frag'],
+            '--- 权重配置 ---': '',
+            'W下行': scheme_c['w_down'],
+            'Wβ': scheme_c['w_beta'],
+            'W脆弱': scheme_c['w_frag'],
+            '--- Scheme C计算 ---': '',
+            '①下行项': scheme_c['downside_component'],
+            '②β项': scheme_c['beta_component'],
+            '③脆弱项': scheme_c['fragility_component'],
+            '总风险': scheme_c['loss_risk'],
+            '--- 值博率 ---': '',
+            'ER': scheme_c['er'],
+            '损失风险': scheme_c['loss_risk'],
+            '值博率': scheme_c['value_to_risk'],
+        }).reset_index(drop=True)
+
+
+# Excel各sheet的列数字格式
+SUMMARY_FORMATS = {
+    'σ总波动': FMT_4, 'σ下行': FMT_4, 'MDD': FMT_4, 'ER原始': FMT_4, 'ER执行后': FMT_4,
+    '损失风险': FMT_4, '值博率': FMT_2, 'Idio': FMT_2, 'W': FMT_2, 'Beta': FMT_2,
+    '脆弱度加点': FMT_4,
+}
+
+CALCULATION_FORMATS = {
+    'σ下行(行业)': FMT_6, 'σ总波动(行业)': FMT_6, 'MDD(行业)': FMT_6,
+    'β系数': FMT_4, '脆弱度(%)': FMT_2,
+    '下行项(60%)': FMT_6, 'β项(30%)': FMT_6, '脆弱项(10%)': FMT_6,
+    '损失风险(合计)': FMT_6, '计算验证': FMT_6, '误差': FMT_8,
+    'ER原始': FMT_6, '执行概率': FMT_4, 'ER执行后': FMT_6, '值博率': FMT_6, '值博率验证': FMT_6,
+}
+
+SECTOR_FORMATS = {
+    'σ下行(年化)': FMT_6, 'σ总波动(年化)': FMT_6, 'MDD': FMT_6,
+    '数据点数': FMT_INT, '交易日数': FMT_INT,
+}
+
+BREAKDOWN_FORMATS = {
+    'σ下行': FMT_6, 'σ总波动': FMT_6, 'β': FMT_4, 'Frag(%)': FMT_2,
+    'W下行': FMT_2, 'Wβ': FMT_2, 'W脆弱': FMT_2,
+    '①下行项': FMT_6, '②β项': FMT_6, '③脆弱项': FMT_6, '总风险': FMT_6,
+    'ER': FMT_6, '损失风险': FMT_6, '值博率': FMT_6,
+}
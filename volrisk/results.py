@@ -0,0 +1,168 @@
+"""
+结果缓存模块
+按（ETF与权重、计算参数、底层行情数据指纹）持久化缓存行业指标，
+行情与参数都未变化时直接复用，不需要读取价格重新计算
+"""
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, List, Optional
+import pandas as pd
+
+from .sector import SectorMetrics
+
+# 计算方式变化时递增，使旧缓存失效
+RESULT_CACHE_VERSION = 1
+
+
+class SectorResultCache:
+    """
+    行业指标结果缓存
+
+    每个结果一个JSON文件：<root>/sectors/<key>.json，包含标量指标与行业组合日收益率。
+    key 为以下内容的sha1：
+    - ETF代码与权重
+    - 计算参数（合成方式、MAR、最少交易日数、解析后的数据窗口、年化方式）
+    - 每个ETF在存储清单中的指纹（见 DataFetcher.fingerprint），数据有任何写入即失效
+    """
+
+    def __init__(self, root: Path):
+        """
+        初始化结果缓存
+
+        Args:
+            root: 缓存根目录（通常为 <数据缓存目录>/results）
+        """
+        self.root = Path(root) / "sectors"
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(
+        tickers: List[str],
+        weights: List[float],
+        params: dict,
+        fingerprints: Dict[str, Optional[dict]]
+    ) -> Optional[str]:
+        """
+        计算缓存key
+
+        Args:
+            tickers: ETF代码列表
+            weights: 权重列表
+            params: 计算参数
+            fingerprints: {ticker: 数据指纹}
+
+        Returns:
+            key；任一ETF没有指纹（不在存储中或数据待更新）时返回None，表示不可缓存
+        """
+        if any(fingerprints.get(ticker) is None for ticker in tickers):
+            return None
+
+        payload = {
+            'version': RESULT_CACHE_VERSION,
+            'tickers': list(tickers),
+            'weights': [float(w) for w in weights],
+            'params': params,
+            'data': [fingerprints[ticker] for ticker in tickers],
+        }
+        text = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def get(self, key: str, sector_name: str) -> Optional[SectorMetrics]:
+        """
+        读取缓存的行业指标
+
+        Args:
+            key: 缓存key
+            sector_name: 行业名称（同一定义可用于不同名称的行业）
+
+        Returns:
+            SectorMetrics，未命中或文件损坏时返回None
+        """
+        path = self._path(key)
+        if not path.exists():
+            return None
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        returns = None
+        if record.get('returns') is not None:
+            returns = pd.Series(
+                record['returns']['values'],
+                index=pd.DatetimeIndex(record['returns']['index']),
+                dtype=float
+            )
+
+        metrics = record['metrics']
+        return SectorMetrics(
+            sector_name=sector_name,
+            tickers=metrics['tickers'],
+            weights=metrics['weights'],
+            sigma_down=metrics['sigma_down'],
+            sigma_total=metrics['sigma_total'],
+            mdd=metrics['mdd'],
+            sample_days=metrics['sample_days'],
+            trading_days=metrics['trading_days'],
+            start_date=metrics['start_date'],
+            end_date=metrics['end_date'],
+            returns=returns,
+            method=metrics['method']
+        )
+
+    def put(self, key: str, metrics: SectorMetrics):
+        """
+        写入行业指标（先写临时文件再替换，避免读到半个文件）
+
+        Args:
+            key: 缓存key
+            metrics: 行业指标
+        """
+        returns = None
+        if metrics.returns is not None:
+            returns = {
+                'index': [ts.isoformat() for ts in metrics.returns.index],
+                'values': [float(v) for v in metrics.returns.to_numpy()],
+            }
+
+        record = {
+            'metrics': {
+                'tickers': list(metrics.tickers),
+                'weights': [float(w) for w in metrics.weights],
+                'sigma_down': float(metrics.sigma_down),
+                'sigma_total': float(metrics.sigma_total),
+                'mdd': float(metrics.mdd),
+                'sample_days': int(metrics.sample_days),
+                'trading_days': int(metrics.trading_days),
+                'start_date': metrics.start_date,
+                'end_date': metrics.end_date,
+                'method': metrics.method,
+            },
+            'returns': returns,
+        }
+
+        path = self._path(key)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(record, f)
+        tmp_path.replace(path)
+
+    def clear(self) -> int:
+        """
+        清除全部缓存结果
+
+        Returns:
+            删除的文件数
+        """
+        removed = 0
+        for path in self.root.glob("*.json"):
+            path.unlink()
+            removed += 1
+        return removed
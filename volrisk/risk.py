@@ -3,9 +3,12 @@
 完整的 Scheme C 风险模型实现
 """
 
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional, Union
+import numpy as np
 from pydantic import BaseModel, Field
 
+ArrayLike = Union[float, np.ndarray, List[float]]
+
 
 class SchemeC_Weights(BaseModel):
     """Scheme C 权重配置"""
@@ -240,6 +243,175 @@ def calculate_risk(
         raise ValueError(f"不支持的风险模式: {config.mode}")
 
 
+def _weights_matrix(
+    weights: Union[None, SchemeC_Weights, np.ndarray],
+    n: int
+) -> np.ndarray:
+    """
+    Scheme C权重转换为 n×3 矩阵（w_down, w_beta, w_frag），整批只验证一次
+
+    Raises:
+        ValueError: 存在权重之和不为1.0的行
+    """
+    if weights is None:
+        weights = SchemeC_Weights()
+    if isinstance(weights, SchemeC_Weights):
+        weights.validate_weights()
+        return np.tile([weights.w_down, weights.w_beta, weights.w_frag], (n, 1))
+
+    matrix = np.broadcast_to(np.asarray(weights, dtype=float), (n, 3))
+    totals = matrix.sum(axis=1)
+    invalid = np.abs(totals - 1.0) > 0.001
+    if invalid.any():
+        row = int(np.flatnonzero(invalid)[0])
+        raise ValueError(f"Scheme C权重之和必须为1.0，第{row}行为{totals[row]}")
+    return matrix
+
+
+def _columns(*values: ArrayLike) -> List[np.ndarray]:
+    """标量或数组参数广播为等长的float数组"""
+    return list(np.broadcast_arrays(*[np.asarray(v, dtype=float) for v in values]))
+
+
+def scheme_c_loss_risk_batch(
+    sigma_down: ArrayLike,
+    sigma_total: ArrayLike,
+    beta: ArrayLike = 1.0,
+    frag: ArrayLike = 0.0,
+    weights: Union[None, SchemeC_Weights, np.ndarray] = None
+) -> Dict[str, np.ndarray]:
+    """
+    批量计算 Scheme C 损失风险（向量化，与 scheme_c_loss_risk 逐行结果一致）
+
+    Args:
+        sigma_down: 行业下行波动率
+        sigma_total: 行业总波动率
+        beta: β系数
+        frag: 脆弱度加点（百分点）
+        weights: 统一的Scheme C权重配置，或 n×3 的逐行权重矩阵（w_down, w_beta, w_frag）
+
+    Returns:
+        字典，total_risk 与各组成部分均为数组
+    """
+    sigma_down, sigma_total, beta, frag = _columns(sigma_down, sigma_total, beta, frag)
+    matrix = _weights_matrix(weights, sigma_down.size)
+    w_down, w_beta, w_frag = (matrix[:, i].reshape(sigma_down.shape) for i in range(3))
+
+    downside_component = w_down * sigma_down
+    beta_component = w_beta * (beta * sigma_total)
+    fragility_component = w_frag * (frag / 100.0)
+
+    return {
+        'total_risk': downside_component + beta_component + fragility_component,
+        'downside_component': downside_component,
+        'beta_component': beta_component,
+        'fragility_component': fragility_component
+    }
+
+
+def risk_semimdd_batch(
+    sigma_down: ArrayLike,
+    mdd: ArrayLike,
+    idio: ArrayLike = 1.0,
+    w: ArrayLike = 0.5,
+    fragility_add: ArrayLike = 0.0
+) -> Dict[str, np.ndarray]:
+    """
+    批量计算 SemiMDD 风险（向量化，与 risk_semimdd 逐行结果一致）
+
+    Args:
+        sigma_down: 行业下行标准差（年化）
+        mdd: 行业最大回撤（负值）
+        idio: 个体下行放大/收敛系数
+        w: 权重
+        fragility_add: 脆弱度绝对加点
+
+    Returns:
+        字典，total_risk 与各组成部分均为数组
+    """
+    sigma_down, mdd, idio, w, fragility_add = _columns(sigma_down, mdd, idio, w, fragility_add)
+
+    downside_component = w * (sigma_down * idio)
+    mdd_component = (1 - w) * np.abs(mdd)
+
+    return {
+        'total_risk': downside_component + mdd_component + fragility_add,
+        'downside_component': downside_component,
+        'mdd_component': mdd_component,
+        'fragility_component': fragility_add
+    }
+
+
+def risk_config_columns(configs: List[RiskConfig]) -> Dict[str, np.ndarray]:
+    """
+    将风险配置列表转换为列（供 calculate_risk_batch 使用）
+
+    Args:
+        configs: 风险配置列表（创建时已验证权重）
+
+    Returns:
+        字典：mode（字符串数组）、beta（未指定为NaN）、frag、w_down、w_beta、w_frag、idio、w、fragility_add
+    """
+    weights = [c.scheme_c_weights or SchemeC_Weights() for c in configs]
+    return {
+        'mode': np.array([c.mode for c in configs], dtype=object),
+        'beta': np.array([np.nan if c.beta is None else c.beta for c in configs], dtype=float),
+        'frag': np.array([c.frag for c in configs], dtype=float),
+        'w_down': np.array([wt.w_down for wt in weights], dtype=float),
+        'w_beta': np.array([wt.w_beta for wt in weights], dtype=float),
+        'w_frag': np.array([wt.w_frag for wt in weights], dtype=float),
+        'idio': np.array([c.idio for c in configs], dtype=float),
+        'w': np.array([c.w for c in configs], dtype=float),
+        'fragility_add': np.array([c.fragility_add for c in configs], dtype=float)
+    }
+
+
+def calculate_risk_batch(
+    sigma_down: ArrayLike,
+    sigma_total: ArrayLike,
+    mdd: ArrayLike,
+    config: Union[List[RiskConfig], Dict[str, np.ndarray]]
+) -> Dict[str, np.ndarray]:
+    """
+    根据逐行配置批量计算风险（SemiMDD与SchemeC行可混合，与 calculate_risk 逐行结果一致）
+
+    Args:
+        sigma_down: 行业下行标准差
+        sigma_total: 行业总波动率
+        mdd: 行业最大回撤
+        config: 风险配置列表，或 risk_config_columns 的结果
+
+    Returns:
+        字典，均为数组：
+        - total_risk, downside_component, fragility_component
+        - beta_component（SemiMDD行为NaN）、mdd_component（SchemeC行为NaN）
+        - beta: SchemeC实际使用的β（未指定时为1.0）
+    """
+    columns = risk_config_columns(config) if isinstance(config, list) else config
+    mode = np.asarray(columns['mode'])
+    unknown = set(np.unique(mode)) - {"SemiMDD", "SchemeC"}
+    if unknown:
+        raise ValueError(f"不支持的风险模式: {sorted(unknown)[0]}")
+
+    beta = np.where(np.isnan(columns['beta']), 1.0, columns['beta'])
+    weights = np.column_stack([columns['w_down'], columns['w_beta'], columns['w_frag']])
+
+    scheme_c = scheme_c_loss_risk_batch(sigma_down, sigma_total, beta, columns['frag'], weights)
+    semimdd = risk_semimdd_batch(
+        sigma_down, mdd, columns['idio'], columns['w'], columns['fragility_add']
+    )
+
+    is_semimdd = mode == "SemiMDD"
+    result = {
+        key: np.where(is_semimdd, semimdd[key], scheme_c[key])
+        for key in ['total_risk', 'downside_component', 'fragility_component']
+    }
+    result['beta_component'] = np.where(is_semimdd, np.nan, scheme_c['beta_component'])
+    result['mdd_component'] = np.where(is_semimdd, semimdd['mdd_component'], np.nan)
+    result['beta'] = beta
+    return result
+
+
 class RiskCalculator:
     """风险计算器"""
 
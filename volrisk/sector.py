@@ -3,14 +3,26 @@
 处理行业ETF数据，支持多ETF混合，计算行业层面的风险指标
 """
 
-from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from pathlib import Path
 import yaml
+import numpy as np
 import pandas as pd
 from pydantic import BaseModel, Field
 
+from .covariance import SectorCovariance
 from .data import DataFetcher
-from .metrics import calculate_all_metrics, validate_data_quality
+from .metrics import (
+    blend_returns, panel_metrics, price_panel, return_metrics, rolling_metrics,
+    validate_data_quality
+)
+
+if TYPE_CHECKING:
+    from .results import SectorResultCache
+
+# 多ETF/多行业的合成方式：weighted=各成分指标线性加权，blend=组合收益率序列计算指标
+BLEND_METHODS = ("weighted", "blend")
 
 
 class SectorConfig(BaseModel):
@@ -52,7 +64,9 @@ class SectorMetrics:
         sample_days: int,
         trading_days: int,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
+        end_date: Optional[str] = None,
+        returns: Optional[pd.Series] = None,
+        method: str = "weighted"
     ):
         self.sector_name = sector_name
         self.tickers = tickers
@@ -64,6 +78,8 @@ class SectorMetrics:
         self.trading_days = trading_days
         self.start_date = start_date
         self.end_date = end_date
+        self.returns = returns  # 行业组合日收益率（ETF共同日历），用于多行业合成
+        self.method = method
 
     def to_dict(self) -> dict:
         """转换为字典"""
@@ -84,14 +100,21 @@ class SectorMetrics:
 class SectorAnalyzer:
     """行业分析器"""
 
-    def __init__(self, data_fetcher: Optional[DataFetcher] = None):
+    def __init__(
+        self,
+        data_fetcher: Optional[DataFetcher] = None,
+        result_cache: Optional['SectorResultCache'] = None
+    ):
         """
         初始化行业分析器
 
         Args:
             data_fetcher: 数据获取器实例，如果为None则创建新实例
+            result_cache: 行业指标结果缓存（calculate_all_sectors使用），None表示不缓存
         """
         self.data_fetcher = data_fetcher or DataFetcher()
+        self.result_cache = result_cache
+        self._blend_cache: Dict[tuple, dict] = {}  # sector_mix -> 组合收益率与指标
 
     def calculate_sector_metrics(
         self,
@@ -102,7 +125,11 @@ class SectorAnalyzer:
         end: Optional[str] = None,
         period: str = "1y",
         mar: float = 0.0,
-        min_days: int = 150
+        min_days: int = 150,
+        prices: Optional[Dict[str, pd.Series]] = None,
+        ticker_metrics: Optional[pd.DataFrame] = None,
+        method: str = "weighted",
+        fetch_missing: bool = True
     ) -> Optional[SectorMetrics]:
         """
         计算单个行业的指标
@@ -118,6 +145,12 @@ class SectorAnalyzer:
             period: 时间周期
             mar: 最低可接受收益
             min_days: 最少交易日数
+            prices: 已获取的价格序列（如批量预取结果），缺失的ticker再单独获取
+            ticker_metrics: 已计算的单ETF指标（panel_metrics结果），缺失时按本行业ETF计算
+            method: 多ETF合成方式：weighted=各ETF指标线性加权；
+                blend=ETF收益率在共同日历上按权重组合后计算指标（考虑相关性）
+            fetch_missing: prices中缺失的ticker是否再获取；False时prices即为全部数据
+                （calculate_all_sectors 已统一获取过，获取失败的ticker不再逐个行业重复获取）
 
         Returns:
             SectorMetrics对象，如果数据不足则返回None
@@ -129,17 +162,23 @@ class SectorAnalyzer:
         if abs(sum(weights) - 1.0) > 0.001:
             print(f"警告: {sector_name} 的权重之和不为1.0: {sum(weights)}")
 
-        # 获取所有ETF的数据
-        all_metrics = []
-        all_data = []
+        if method not in BLEND_METHODS:
+            print(f"错误: 不支持的合成方式: {method}")
+            return None
 
-        for ticker in tickers:
-            adj_close = self.data_fetcher.fetch(
-                ticker,
+        # 获取所有ETF的数据（未预取的ticker并发获取，除非prices已是统一获取的全部结果）
+        prices = dict(prices or {})
+        missing = [ticker for ticker in tickers if ticker not in prices]
+        if missing and fetch_missing:
+            prices.update(self.data_fetcher.fetch_multiple(
+                missing,
                 start=start,
                 end=end,
                 period=period
-            )
+            ))
+
+        for ticker in tickers:
+            adj_close = prices.get(ticker)
 
             if adj_close is None:
                 print(f"错误: 无法获取 {ticker} 的数据")
@@ -151,26 +190,42 @@ class SectorAnalyzer:
                 print(f"错误: {ticker} 数据质量不足: {error_msg}")
                 return None
 
-            # 计算指标
-            metrics = calculate_all_metrics(adj_close, mar)
-            all_metrics.append(metrics)
-            all_data.append(adj_close)
+        # ETF价格对齐到共同日历，组合收益率（每日按权重再平衡）
+        w = pd.Series(weights, index=tickers).groupby(level=0, sort=False).sum()
+        aligned = price_panel({ticker: prices[ticker] for ticker in w.index}).dropna()
+        returns = blend_returns(aligned.pct_change().iloc[1:], w)
+
+        if method == "blend":
+            blended = return_metrics(returns, mar)
+            return SectorMetrics(
+                sector_name=sector_name,
+                tickers=tickers,
+                weights=weights,
+                sigma_down=blended['sigma_down'],
+                sigma_total=blended['sigma_total'],
+                mdd=blended['mdd'],
+                sample_days=len(aligned),
+                trading_days=blended['trading_days'],
+                start_date=str(aligned.index[0].date()) if len(aligned) > 0 else None,
+                end_date=str(aligned.index[-1].date()) if len(aligned) > 0 else None,
+                returns=returns,
+                method=method
+            )
+
+        # 所有ETF的指标一次向量化计算
+        if ticker_metrics is None or not set(tickers) <= set(ticker_metrics.index):
+            ticker_metrics = panel_metrics(
+                price_panel({ticker: prices[ticker] for ticker in tickers}), mar
+            )
+        metrics = ticker_metrics.loc[w.index]
 
         # 加权平均计算行业指标
-        weighted_sigma_down = sum(
-            m['sigma_down'] * w for m, w in zip(all_metrics, weights)
-        )
-        weighted_sigma_total = sum(
-            m['sigma_total'] * w for m, w in zip(all_metrics, weights)
-        )
-        weighted_mdd = sum(
-            m['mdd'] * w for m, w in zip(all_metrics, weights)
-        )
+        weighted_sigma_down = float((metrics['sigma_down'] * w).sum())
+        weighted_sigma_total = float((metrics['sigma_total'] * w).sum())
+        weighted_mdd = float((metrics['mdd'] * w).sum())
 
         # 使用第一个ETF的日期范围（假设对齐）
-        first_data = all_data[0]
-        start_date = str(first_data.index[0].date()) if len(first_data) > 0 else None
-        end_date = str(first_data.index[-1].date()) if len(first_data) > 0 else None
+        first = metrics.iloc[0]
 
         return SectorMetrics(
             sector_name=sector_name,
@@ -179,58 +234,241 @@ class SectorAnalyzer:
             sigma_down=weighted_sigma_down,
             sigma_total=weighted_sigma_total,
             mdd=weighted_mdd,
-            sample_days=all_metrics[0]['sample_days'],
-            trading_days=all_metrics[0]['trading_days'],
-            start_date=start_date,
-            end_date=end_date
+            sample_days=int(first['sample_days']),
+            trading_days=int(first['trading_days']),
+            start_date=first['start_date'],
+            end_date=first['end_date'],
+            returns=returns,
+            method=method
         )
 
     def calculate_all_sectors(
         self,
         config: SectorsConfig,
+        max_workers: Optional[int] = None,
+        prices: Optional[Dict[str, pd.Series]] = None,
         **kwargs
     ) -> Dict[str, SectorMetrics]:
         """
         计算所有行业的指标
 
+        所有行业用到的ETF去重后一次批量获取、一次向量化计算单ETF指标，
+        各行业的合成计算相互独立，max_workers > 1 时并发进行
+
         Args:
             config: 行业配置
+            max_workers: 并发计算行业的最大线程数（None或1为逐个计算）
+            prices: 已获取的价格序列（如运行计划统一获取的结果），缺失的ETF再获取
             **kwargs: 传递给calculate_sector_metrics的参数
 
         Returns:
-            字典，键为行业名称，值为SectorMetrics对象
+            字典，键为行业名称，值为SectorMetrics对象（按配置顺序，与是否并发无关）
         """
         results = {}
+        self._blend_cache.clear()
 
+        valid_sectors = []
         for sector_name, sector_config in config.sectors.items():
-            print(f"\n正在计算 {sector_name} 的指标...")
-
             try:
                 sector_config.validate_weights()
             except ValueError as e:
                 print(f"错误: {sector_name} 配置无效: {e}")
                 continue
-
-            metrics = self.calculate_sector_metrics(
+            valid_sectors.append((sector_name, sector_config))
+
+        # 行情与参数都未变化的行业直接使用缓存结果
+        cached = self._cached_sectors(valid_sectors, kwargs) if self.result_cache else {}
+        pending = [item for item in valid_sectors if item[0] not in cached]
+
+        # 一次批量下载需要计算的行业用到的ETF（多个行业共用的ETF只获取一次）
+        all_tickers = list(dict.fromkeys(
+            ticker
+            for _, sector_config in pending
+            for ticker in sector_config.tickers
+        ))
+        prices = dict(prices or {})
+        missing = [ticker for ticker in all_tickers if ticker not in prices]
+        if missing:
+            prices.update(self.data_fetcher.fetch_multiple(
+                missing,
+                start=kwargs.get('start'),
+                end=kwargs.get('end'),
+                period=kwargs.get('period', "1y")
+            ))
+        prices = {ticker: prices[ticker] for ticker in all_tickers if ticker in prices}
+        ticker_metrics = panel_metrics(price_panel(prices), kwargs.get('mar', 0.0)) if prices else None
+
+        def compute(item) -> Optional[SectorMetrics]:
+            sector_name, sector_config = item
+            return self.calculate_sector_metrics(
                 sector_name=sector_name,
                 tickers=sector_config.tickers,
                 weights=sector_config.weights,
+                prices=prices,
+                ticker_metrics=ticker_metrics,
+                fetch_missing=False,
                 **kwargs
             )
 
+        parallel = max_workers is not None and max_workers > 1 and len(pending) > 1
+        if parallel:
+            print(f"\n并发计算 {len(pending)} 个行业的指标（{max_workers} 线程）...")
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                computed = dict(zip([name for name, _ in pending], pool.map(compute, pending)))
+        else:
+            computed = {}
+            for item in pending:
+                print(f"\n正在计算 {item[0]} 的指标...")
+                computed[item[0]] = compute(item)
+
+        if self.result_cache and computed:
+            self._store_sectors(pending, computed, kwargs)
+
+        for sector_name, _ in valid_sectors:
+            metrics = cached.get(sector_name) or computed.get(sector_name)
             if metrics is not None:
                 results[sector_name] = metrics
-                print(f"✓ {sector_name}: σ_down={metrics.sigma_down:.4f}, "
+                source = "（缓存）" if sector_name in cached else ""
+                print(f"✓ {sector_name}{source}: σ_down={metrics.sigma_down:.4f}, "
                       f"σ_total={metrics.sigma_total:.4f}, MDD={abs(metrics.mdd):.4f}")
             else:
                 print(f"✗ {sector_name}: 计算失败")
 
         return results
 
+    def _cache_params(self, kwargs: dict, window: tuple) -> dict:
+        """结果缓存key中的计算参数（年化方式为指标计算的默认值）"""
+        return {
+            'method': kwargs.get('method', "weighted"),
+            'mar': float(kwargs.get('mar', 0.0)),
+            'min_days': int(kwargs.get('min_days', 150)),
+            'window': [str(ts) if ts is not None else None for ts in window],
+            'annualize': True,
+            'td_per_year': 252,
+        }
+
+    def _cache_keys(self, sectors: list, kwargs: dict, current_only: bool) -> Dict[str, str]:
+        """
+        计算各行业的结果缓存key
+
+        Args:
+            sectors: [(行业名称, SectorConfig)]
+            kwargs: calculate_sector_metrics 的参数
+            current_only: 只对存储已覆盖数据窗口（无需下载）的ETF计算指纹
+
+        Returns:
+            {行业名称: key}，不可缓存的行业不在其中
+        """
+        tickers = list(dict.fromkeys(t for _, sc in sectors for t in sc.tickers))
+        plan = self.data_fetcher.plan_fetch(
+            tickers,
+            start=kwargs.get('start'),
+            end=kwargs.get('end'),
+            period=kwargs.get('period', "1y")
+        )
+        if current_only:
+            tickers = [t for t, action in plan['actions'].items() if action in ('memory', 'store')]
+
+        fingerprints = self.data_fetcher.fingerprint(tickers)
+        params = self._cache_params(kwargs, (plan['start'], plan['end']))
+
+        keys = {}
+        for sector_name, sector_config in sectors:
+            key = self.result_cache.key(
+                sector_config.tickers, sector_config.weights, params, fingerprints
+            )
+            if key is not None:
+                keys[sector_name] = key
+        return keys
+
+    def _cached_sectors(self, sectors: list, kwargs: dict) -> Dict[str, SectorMetrics]:
+        """读取行情与参数都未变化的行业的缓存结果"""
+        cached = {}
+        for sector_name, key in self._cache_keys(sectors, kwargs, current_only=True).items():
+            metrics = self.result_cache.get(key, sector_name)
+            if metrics is not None:
+                cached[sector_name] = metrics
+        return cached
+
+    def _store_sectors(self, sectors: list, computed: Dict[str, SectorMetrics], kwargs: dict):
+        """计算完成后写入结果缓存（此时数据已下载，指纹为本次计算所用数据）"""
+        for sector_name, key in self._cache_keys(sectors, kwargs, current_only=True).items():
+            metrics = computed.get(sector_name)
+            if metrics is not None:
+                self.result_cache.put(key, metrics)
+
+    def calculate_rolling_sectors(
+        self,
+        config: SectorsConfig,
+        windows: List[int],
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+        period: str = "1y",
+        mar: float = 0.0
+    ) -> pd.DataFrame:
+        """
+        计算所有行业的滚动风险指标时间序列
+
+        多ETF行业与标量指标一致，按权重加权各ETF的滚动指标（只保留所有ETF都有数据的日期）
+
+        Args:
+            config: 行业配置
+            windows: 滚动窗口长度列表（如 [60, 120, 250]）
+            start: 开始日期
+            end: 结束日期
+            period: 时间周期（需长于最大窗口）
+            mar: 最低可接受收益
+
+        Returns:
+            长表DataFrame，列为 date, sector_name, window, sigma_down, sigma_total,
+            mdd, running_mdd（回撤输出为正值）
+        """
+        all_tickers = list(dict.fromkeys(
+            ticker
+            for sector_config in config.sectors.values()
+            for ticker in sector_config.tickers
+        ))
+        prices = self.data_fetcher.fetch_multiple(all_tickers, start=start, end=end, period=period)
+
+        frames = []
+        for window in windows:
+            per_ticker = {
+                ticker: rolling_metrics(adj_close, window, mar)
+                for ticker, adj_close in prices.items()
+            }
+
+            for sector_name, sector_config in config.sectors.items():
+                missing = [t for t in sector_config.tickers if t not in per_ticker]
+                if missing:
+                    print(f"错误: {sector_name} 缺少ETF数据: {', '.join(missing)}")
+                    continue
+
+                blended = None
+                for ticker, weight in zip(sector_config.tickers, sector_config.weights):
+                    weighted = per_ticker[ticker] * weight
+                    blended = weighted if blended is None else blended + weighted
+
+                blended = blended.dropna()
+                if blended.empty:
+                    print(f"警告: {sector_name} 数据不足 {window} 个交易日")
+                    continue
+
+                blended[['mdd', 'running_mdd']] = blended[['mdd', 'running_mdd']].abs()
+                blended = blended.assign(sector_name=sector_name, window=window)
+                frames.append(blended.rename_axis('date').reset_index())
+
+        columns = ['date', 'sector_name', 'window', 'sigma_down', 'sigma_total', 'mdd', 'running_mdd']
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        return pd.concat(frames, ignore_index=True)[columns]
+
     def calculate_mixed_sector_metrics(
         self,
         sector_mix: Dict[str, float],
-        sector_metrics_dict: Dict[str, SectorMetrics]
+        sector_metrics_dict: Dict[str, SectorMetrics],
+        method: str = "weighted",
+        mar: float = 0.0
     ) -> Optional[Dict[str, float]]:
         """
         计算混合行业的指标（如紫金矿业的60%有色+40%黄金）
@@ -238,6 +476,9 @@ class SectorAnalyzer:
         Args:
             sector_mix: 行业权重字典，如 {"NONFER": 0.6, "GOLD": 0.4}
             sector_metrics_dict: 已计算的行业指标字典
+            method: weighted=各行业指标线性加权；blend=行业收益率在共同日历上
+                按权重组合后计算指标（相同sector_mix的公司共用缓存结果）
+            mar: 最低可接受收益（blend时使用）
 
         Returns:
             混合后的指标字典
@@ -251,6 +492,9 @@ class SectorAnalyzer:
                 print(f"错误: 行业 {sector_name} 没有指标数据")
                 return None
 
+        if method == "blend":
+            return self._blend_sector_mix(sector_mix, sector_metrics_dict, mar)
+
         # 加权平均
         sigma_down = sum(
             sector_metrics_dict[s].sigma_down * w
@@ -270,3 +514,130 @@ class SectorAnalyzer:
             'sigma_total': sigma_total,
             'mdd': mdd
         }
+
+    def calculate_mixed_sector_metrics_batch(
+        self,
+        sector_mixes: List[Dict[str, float]],
+        sector_metrics_dict: Dict[str, SectorMetrics],
+        method: str = "weighted",
+        mar: float = 0.0
+    ) -> List[Optional[Dict[str, float]]]:
+        """
+        批量计算多个混合行业的指标（矩阵运算，不逐个组合处理收益率序列）
+
+        weighted: 权重矩阵乘以各行业指标向量；
+        blend: 使用相同行业集合的组合共用一个协方差引擎（这些行业的共同日历），见 SectorCovariance
+
+        Args:
+            sector_mixes: 每个公司的行业权重字典
+            sector_metrics_dict: 已计算的行业指标字典
+            method: 合成方式（weighted/blend）
+            mar: 最低可接受收益（blend时使用）
+
+        Returns:
+            与sector_mixes对应的指标字典列表，行业缺失的组合为None
+        """
+        results: List[Optional[Dict[str, float]]] = [None] * len(sector_mixes)
+        valid = []
+        for i, mix in enumerate(sector_mixes):
+            if abs(sum(mix.values()) - 1.0) > 0.001:
+                print(f"警告: 混合权重之和不为1.0: {sum(mix.values())}")
+            missing = [s for s in mix if s not in sector_metrics_dict]
+            if missing:
+                print(f"错误: 行业 {', '.join(missing)} 没有指标数据")
+            else:
+                valid.append(i)
+
+        if not valid:
+            return results
+
+        sectors = list(dict.fromkeys(s for i in valid for s in sector_mixes[i]))
+        mixes = [sector_mixes[i] for i in valid]
+        failed = set()
+
+        if method == "blend":
+            # 按行业集合分组，每组在自己行业的共同日历上构建协方差引擎，
+            # 组合的结果只取决于它自己的行业（与批次中的其他组合无关，与逐个计算一致）
+            groups: Dict[Tuple[str, ...], List[int]] = {}
+            for row, mix in enumerate(mixes):
+                groups.setdefault(tuple(sorted(mix)), []).append(row)
+
+            table = pd.DataFrame(np.nan, index=range(len(mixes)), columns=['sigma_down', 'sigma_total', 'mdd'])
+            for group_sectors, rows in groups.items():
+                no_returns = [s for s in group_sectors if sector_metrics_dict[s].returns is None]
+                if no_returns:
+                    print(f"错误: 行业 {', '.join(no_returns)} 没有收益率序列")
+                    failed.update(valid[row] for row in rows)
+                    continue
+
+                engine = SectorCovariance.from_sector_metrics(sector_metrics_dict, list(group_sectors), mar)
+                if len(engine.index) == 0:
+                    print(f"错误: 行业 {', '.join(group_sectors)} 没有共同交易日")
+                    failed.update(valid[row] for row in rows)
+                    continue
+                table.iloc[rows] = engine.metrics([mixes[row] for row in rows]).to_numpy()
+        else:
+            position = {s: j for j, s in enumerate(sectors)}
+            weights = np.zeros((len(mixes), len(sectors)))
+            for row, mix in enumerate(mixes):
+                for s, w in mix.items():
+                    weights[row, position[s]] += w
+            scalars = np.array([
+                [sector_metrics_dict[s].sigma_down, sector_metrics_dict[s].sigma_total,
+                 sector_metrics_dict[s].mdd]
+                for s in sectors
+            ])
+            table = pd.DataFrame(weights @ scalars, columns=['sigma_down', 'sigma_total', 'mdd'])
+
+        for i, row in zip(valid, table.itertuples(index=False)):
+            if i in failed:
+                continue
+            results[i] = {
+                'sigma_down': float(row.sigma_down),
+                'sigma_total': float(row.sigma_total),
+                'mdd': float(row.mdd)
+            }
+
+        return results
+
+    def _blend_sector_mix(
+        self,
+        sector_mix: Dict[str, float],
+        sector_metrics_dict: Dict[str, SectorMetrics],
+        mar: float = 0.0
+    ) -> Optional[Dict[str, float]]:
+        """按组合收益率计算混合行业指标，结果按 (sector_mix, 行业数据范围) 缓存"""
+        sectors = sorted(sector_mix)
+        key = (
+            tuple((s, sector_mix[s]) for s in sectors),
+            mar,
+            tuple(
+                (s, sector_metrics_dict[s].start_date, sector_metrics_dict[s].end_date,
+                 sector_metrics_dict[s].trading_days)
+                for s in sectors
+            )
+        )
+        cached = self._blend_cache.get(key)
+        if cached is not None:
+            return cached
+
+        missing = [s for s in sectors if sector_metrics_dict[s].returns is None]
+        if missing:
+            print(f"错误: 行业 {', '.join(missing)} 没有收益率序列")
+            return None
+
+        returns = pd.concat({s: sector_metrics_dict[s].returns for s in sectors}, axis=1)
+        blended_returns = blend_returns(returns, pd.Series(sector_mix))
+        if len(blended_returns) == 0:
+            print(f"错误: 行业 {', '.join(sectors)} 没有共同交易日")
+            return None
+
+        blended = return_metrics(blended_returns, mar)
+        result = {
+            'sigma_down': blended['sigma_down'],
+            'sigma_total': blended['sigma_total'],
+            'mdd': blended['mdd'],
+            'returns': blended_returns
+        }
+        self._blend_cache[key] = result
+        return result
@@ -0,0 +1,572 @@
+"""
+行情存储模块
+按 (ticker, 数据间隔, 复权方式) 分区保存完整历史行情，只追加缺失的尾部数据，
+覆盖范围、行数、大小等元数据记录在 SQLite 清单中
+"""
+
+import json
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Hashable, Iterator, Optional
+import pandas as pd
+
+# 支持存储的数据间隔（日线及以上，bar以日期标识）
+STORE_INTERVALS = {"1d", "5d", "1wk", "1mo", "3mo"}
+
+
+class CacheManifest:
+    """
+    缓存清单（SQLite）
+
+    entries 表每个缓存对象一行：ticker、数据间隔、复权方式、覆盖范围、
+    数据起止日期、行数、字节数、下载时间、最近访问时间和命中/未命中次数；
+    partitions 表记录每个年份分区的行数与字节数。
+    覆盖检查、按ticker清理、LRU淘汰都只查询清单，不需要遍历和stat缓存目录
+    """
+
+    def __init__(self, path: Path):
+        """
+        初始化清单
+
+        Args:
+            path: SQLite 文件路径
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    ticker TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    adjust TEXT NOT NULL,
+                    covered_start TEXT,
+                    covered_until TEXT NOT NULL,
+                    first_date TEXT,
+                    last_date TEXT,
+                    rows INTEGER NOT NULL DEFAULT 0,
+                    bytes INTEGER NOT NULL DEFAULT 0,
+                    fetched_at TEXT NOT NULL,
+                    tail TEXT NOT NULL DEFAULT '[]',
+                    accessed_at TEXT,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (ticker, interval, adjust)
+                );
+                CREATE TABLE IF NOT EXISTS partitions (
+                    ticker TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    adjust TEXT NOT NULL,
+                    year INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    PRIMARY KEY (ticker, interval, adjust, year)
+                );
+            """)
+
+            # 兼容没有访问统计列的旧清单
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(entries)")}
+            for column, ddl in [
+                ('accessed_at', "TEXT"),
+                ('hits', "INTEGER NOT NULL DEFAULT 0"),
+                ('misses', "INTEGER NOT NULL DEFAULT 0"),
+            ]:
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE entries ADD COLUMN {column} {ddl}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """每次操作新建连接（便于多线程使用），成功时提交，结束时关闭"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, ticker: str, interval: str, adjust: str) -> Optional[dict]:
+        """查询单个缓存对象，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT * FROM entries WHERE ticker = ? AND interval = ? AND adjust = ?",
+                (ticker, interval, adjust)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        entry = dict(row)
+        entry['tail'] = json.loads(entry['tail'])
+        return entry
+
+    def years(self, ticker: str, interval: str, adjust: str) -> list[int]:
+        """缓存对象已有的年份分区"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT year FROM partitions WHERE ticker = ? AND interval = ? AND adjust = ? "
+                "ORDER BY year",
+                (ticker, interval, adjust)
+            ).fetchall()
+
+        return [row['year'] for row in rows]
+
+    def put(
+        self,
+        entry: dict,
+        partitions: dict[int, tuple[int, int]],
+        replace: bool = False
+    ):
+        """
+        写入缓存对象及其分区统计
+
+        写入同时记为一次访问；命中/未命中次数保留
+
+        Args:
+            entry: entries 表的一行（ticker/interval/adjust为主键）
+            partitions: {年份: (行数, 字节数)}，只需包含本次改写的分区
+            replace: 是否先删除该对象原有的分区记录
+        """
+        key = (entry['ticker'], entry['interval'], entry['adjust'])
+
+        with self._lock, self._connect() as conn:
+            if replace:
+                conn.execute(
+                    "DELETE FROM partitions WHERE ticker = ? AND interval = ? AND adjust = ?", key
+                )
+            conn.executemany(
+                "INSERT OR REPLACE INTO partitions VALUES (?, ?, ?, ?, ?, ?)",
+                [key + (year, rows, size) for year, (rows, size) in partitions.items()]
+            )
+            rows, size = conn.execute(
+                "SELECT COALESCE(SUM(rows), 0), COALESCE(SUM(bytes), 0) FROM partitions "
+                "WHERE ticker = ? AND interval = ? AND adjust = ?",
+                key
+            ).fetchone()
+            conn.execute(
+                """
+                INSERT INTO entries (
+                    ticker, interval, adjust, covered_start, covered_until, first_date,
+                    last_date, rows, bytes, fetched_at, tail, accessed_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (ticker, interval, adjust) DO UPDATE SET
+                    covered_start = excluded.covered_start,
+                    covered_until = excluded.covered_until,
+                    first_date = excluded.first_date,
+                    last_date = excluded.last_date,
+                    rows = excluded.rows,
+                    bytes = excluded.bytes,
+                    fetched_at = excluded.fetched_at,
+                    tail = excluded.tail,
+                    accessed_at = excluded.accessed_at
+                """,
+                key + (
+                    entry['covered_start'],
+                    entry['covered_until'],
+                    entry['first_date'],
+                    entry['last_date'],
+                    rows,
+                    size,
+                    entry['fetched_at'],
+                    json.dumps(entry['tail']),
+                    entry['fetched_at'],
+                )
+            )
+
+    def touch(self, ticker: str, interval: str, adjust: str, hit: bool):
+        """记录一次访问：更新最近访问时间，累计命中（无需下载）或未命中次数"""
+        column = "hits" if hit else "misses"
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE entries SET accessed_at = ?, {column} = {column} + 1 "
+                "WHERE ticker = ? AND interval = ? AND adjust = ?",
+                (datetime.now().isoformat(timespec='seconds'), ticker, interval, adjust)
+            )
+
+    def touch_many(self, hits: dict[tuple[str, str, str], int]):
+        """批量记录命中：{(ticker, interval, adjust): 命中次数}"""
+        if not hits:
+            return
+
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._connect() as conn:
+            conn.executemany(
+                "UPDATE entries SET accessed_at = ?, hits = hits + ? "
+                "WHERE ticker = ? AND interval = ? AND adjust = ?",
+                [(now, count) + key for key, count in hits.items()]
+            )
+
+    def total_bytes(self) -> int:
+        """全部缓存对象的字节数"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+
+    def entries(
+        self,
+        ticker: Optional[str] = None,
+        order_by: str = "ticker, interval, adjust"
+    ) -> list[dict]:
+        """
+        列出缓存对象
+
+        Args:
+            ticker: 如果指定，只列出该ticker
+            order_by: 排序（LRU淘汰时按最近访问时间升序）
+        """
+        query = "SELECT * FROM entries"
+        params = ()
+        if ticker:
+            query += " WHERE ticker = ?"
+            params = (ticker,)
+
+        with self._connect() as conn:
+            rows = conn.execute(f"{query} ORDER BY {order_by}", params).fetchall()
+
+        return [dict(row) for row in rows]
+
+    def delete(self, ticker: str, interval: str, adjust: str):
+        """删除缓存对象的清单记录"""
+        key = (ticker, interval, adjust)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "DELETE FROM entries WHERE ticker = ? AND interval = ? AND adjust = ?", key
+            )
+            conn.execute(
+                "DELETE FROM partitions WHERE ticker = ? AND interval = ? AND adjust = ?", key
+            )
+
+
+class MemoryCache:
+    """
+    进程内LRU缓存（按字节数上限）
+
+    放在磁盘存储之前：每个缓存对象保存一份完整的Adj Close序列及其覆盖范围，
+    同一次运行中重复查询只需一次字典查找和一次零拷贝切片
+    """
+
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存序列的总字节数上限，0表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self._items: OrderedDict = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def get(self, key: Hashable) -> Optional[tuple[dict, pd.Series]]:
+        """查询并标记为最近使用，返回 (覆盖范围, 序列)，不存在时返回None"""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return item[0], item[1]
+
+    def put(self, key: Hashable, coverage: dict, series: pd.Series):
+        """写入缓存，超出上限时淘汰最久未使用的对象"""
+        size = int(series.memory_usage(index=True, deep=False))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+            self._items[key] = (coverage, series, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+
+    def pop(self, key: Hashable):
+        """删除单个对象（对应的磁盘存储被改写时调用）"""
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self) -> int:
+        """当前缓存的字节数"""
+        return self._bytes
+
+
+class PriceStore:
+    """
+    按 (ticker, 数据间隔, 复权方式) 分区的增量行情存储
+
+    目录结构：<root>/<interval>/<adjust>/<ticker>/year=YYYY.parquet，
+    清单保存在 <root>/manifest.sqlite。写入时只重写新数据涉及的年份分区
+    """
+
+    def __init__(self, root: Path):
+        """
+        初始化存储
+
+        Args:
+            root: 存储根目录
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.manifest = CacheManifest(self.root / "manifest.sqlite")
+
+    def _ticker_dir(self, ticker: str, interval: str, adjust: str) -> Path:
+        """缓存对象的分区目录"""
+        return self.root / interval / adjust / ticker
+
+    def coverage(self, ticker: str, interval: str = "1d", adjust: str = "auto") -> Optional[dict]:
+        """
+        查询缓存对象的覆盖范围
+
+        Returns:
+            清单记录，包含 covered_start（None表示自上市起）、covered_until（不含）、
+            first_date、last_date、rows、bytes、fetched_at、tail（最后两根bar的日期与Adj Close）；
+            无数据时返回None
+        """
+        return self.manifest.get(ticker, interval, adjust)
+
+    def load(
+        self,
+        ticker: str,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        interval: str = "1d",
+        adjust: str = "auto"
+    ) -> Optional[pd.DataFrame]:
+        """
+        读取 [start, end) 区间内的行情，只读取清单中涉及的年份分区
+
+        Args:
+            ticker: 股票代码
+            start: 开始日期，None表示不限
+            end: 结束日期（不含），None表示不限
+            interval: 数据间隔
+            adjust: 复权方式（auto=前复权，raw=不复权）
+
+        Returns:
+            行情DataFrame，无数据时返回None
+        """
+        ticker_dir = self._ticker_dir(ticker, interval, adjust)
+        frames = []
+        for year in self.manifest.years(ticker, interval, adjust):
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            try:
+                frames.append(pd.read_parquet(ticker_dir / f"year={year}.parquet"))
+            except Exception as e:
+                print(f"警告: 读取存储失败 {ticker} {year}: {e}")
+                return None
+
+        if not frames:
+            return None
+
+        data = pd.concat(frames).sort_index()
+        if start is not None:
+            data = data[data.index >= start]
+        if end is not None:
+            data = data[data.index < end]
+
+        return data if not data.empty else None
+
+    def write(
+        self,
+        ticker: str,
+        data: pd.DataFrame,
+        covered_start: Optional[pd.Timestamp],
+        covered_until: pd.Timestamp,
+        replace: bool = False,
+        interval: str = "1d",
+        adjust: str = "auto"
+    ):
+        """
+        写入新下载的行情并更新清单
+
+        Args:
+            ticker: 股票代码
+            data: 新下载的行情（与已有数据重叠的日期以新数据为准）
+            covered_start: 本次下载的开始日期，None表示自上市起
+            covered_until: 本次下载覆盖到的日期（不含）
+            replace: 是否丢弃已有数据（如复权因子变化后重新下载全部历史）
+            interval: 数据间隔
+            adjust: 复权方式
+        """
+        ticker_dir = self._ticker_dir(ticker, interval, adjust)
+        entry = None if replace else self.coverage(ticker, interval, adjust)
+
+        if replace and ticker_dir.exists():
+            shutil.rmtree(ticker_dir)
+        ticker_dir.mkdir(parents=True, exist_ok=True)
+
+        partitions = {}
+        for year, rows in data.groupby(data.index.year):
+            path = ticker_dir / f"year={year}.parquet"
+            if entry is not None and path.exists():
+                existing = pd.read_parquet(path)
+                rows = pd.concat([existing, rows])
+                rows = rows[~rows.index.duplicated(keep='last')].sort_index()
+            rows.to_parquet(path)
+            partitions[int(year)] = (len(rows), path.stat().st_size)
+
+        # 合并覆盖范围
+        first_date = data.index[0]
+        last_date = data.index[-1]
+        if entry is not None:
+            if entry['covered_start'] is None or covered_start is None:
+                covered_start = None
+            else:
+                covered_start = min(pd.Timestamp(entry['covered_start']), covered_start)
+            covered_until = max(pd.Timestamp(entry['covered_until']), covered_until)
+            if entry['first_date'] is not None:
+                first_date = min(pd.Timestamp(entry['first_date']), first_date)
+            if entry['last_date'] is not None:
+                last_date = max(pd.Timestamp(entry['last_date']), last_date)
+
+        tail_path = ticker_dir / f"year={last_date.year}.parquet"
+        tail = pd.read_parquet(tail_path, columns=['Adj Close'])['Adj Close'].dropna().iloc[-2:]
+
+        self.manifest.put(
+            {
+                'ticker': ticker,
+                'interval': interval,
+                'adjust': adjust,
+                'covered_start': str(covered_start.date()) if covered_start is not None else None,
+                'covered_until': str(covered_until.date()),
+                'first_date': str(first_date.date()),
+                'last_date': str(last_date.date()),
+                'fetched_at': datetime.now().isoformat(timespec='microseconds'),
+                'tail': [[str(d.date()), float(v)] for d, v in tail.items()],
+            },
+            partitions,
+            replace=replace
+        )
+
+    def remove(self, ticker: str, interval: str, adjust: str):
+        """删除单个缓存对象（数据与清单记录）"""
+        ticker_dir = self._ticker_dir(ticker, interval, adjust)
+        if ticker_dir.exists():
+            shutil.rmtree(ticker_dir)
+        self.manifest.delete(ticker, interval, adjust)
+
+    def prune(
+        self,
+        max_bytes: Optional[int] = None,
+        max_age_days: Optional[float] = None
+    ) -> list[dict]:
+        """
+        按年龄和大小淘汰缓存对象
+
+        先删除超过 max_age_days 未访问的对象，再按最近访问时间从旧到新（LRU）
+        删除，直到总大小不超过 max_bytes
+
+        Args:
+            max_bytes: 缓存总大小上限（字节），None表示不限
+            max_age_days: 最长未访问天数，None表示不限
+
+        Returns:
+            被删除对象的清单记录
+        """
+        if max_bytes is None and max_age_days is None:
+            return []
+
+        # 从未记录访问时间的对象按下载时间计
+        entries = self.manifest.entries(order_by="COALESCE(accessed_at, fetched_at)")
+        total = sum(entry['bytes'] for entry in entries)
+        cutoff = None
+        if max_age_days is not None:
+            cutoff = datetime.now() - pd.Timedelta(days=max_age_days)
+
+        evicted = []
+        for entry in entries:
+            last_used = datetime.fromisoformat(entry['accessed_at'] or entry['fetched_at'])
+            expired = cutoff is not None and last_used < cutoff
+            oversize = max_bytes is not None and total > max_bytes
+            if not expired and not oversize:
+                # 按访问时间排序，之后的对象更新
+                break
+
+            try:
+                self.remove(entry['ticker'], entry['interval'], entry['adjust'])
+            except Exception as e:
+                print(f"警告: 淘汰缓存失败 {entry['ticker']}: {e}")
+                continue
+
+            total -= entry['bytes']
+            evicted.append(entry)
+
+        return evicted
+
+    def stats(self) -> dict:
+        """
+        缓存统计
+
+        Returns:
+            字典：entries（对象数）、bytes、rows、hits、misses、hit_rate，
+            以及 tickers（按字节数降序的每个ticker占用：对象数、行数、字节数、最近访问）
+        """
+        entries = self.manifest.entries()
+        hits = sum(entry['hits'] for entry in entries)
+        misses = sum(entry['misses'] for entry in entries)
+
+        tickers = {}
+        for entry in entries:
+            item = tickers.setdefault(entry['ticker'], {
+                'ticker': entry['ticker'], 'entries': 0, 'rows': 0, 'bytes': 0,
+                'accessed_at': None
+            })
+            item['entries'] += 1
+            item['rows'] += entry['rows']
+            item['bytes'] += entry['bytes']
+            accessed_at = entry['accessed_at'] or entry['fetched_at']
+            if item['accessed_at'] is None or accessed_at > item['accessed_at']:
+                item['accessed_at'] = accessed_at
+
+        return {
+            'entries': len(entries),
+            'bytes': sum(entry['bytes'] for entry in entries),
+            'rows': sum(entry['rows'] for entry in entries),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses > 0 else float('nan'),
+            'tickers': sorted(tickers.values(), key=lambda x: x['bytes'], reverse=True),
+        }
+
+    def clear(self, ticker: Optional[str] = None) -> int:
+        """
+        删除存储
+
+        Args:
+            ticker: 如果指定，只删除该ticker（所有间隔与复权方式）；否则删除全部
+
+        Returns:
+            删除的缓存对象数量
+        """
+        deleted = 0
+        for entry in self.manifest.entries(ticker):
+            try:
+                self.remove(entry['ticker'], entry['interval'], entry['adjust'])
+                deleted += 1
+            except Exception as e:
+                print(f"警告: 删除存储失败 {entry['ticker']}: {e}")
+
+        return deleted
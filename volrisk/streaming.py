@@ -0,0 +1,254 @@
+"""
+流式指标模块
+增量维护收益率矩和回撤状态，新价格到达时O(1)更新风险指标，
+支持分片并行计算后合并、状态序列化
+"""
+
+from typing import Iterable, Optional, Union
+import numpy as np
+import pandas as pd
+
+
+class MetricsAccumulator:
+    """
+    风险指标累加器
+
+    维护收益率的个数、均值与离差平方和（Welford算法，合并时使用Chan公式），
+    低于MAR部分的平方和，以及回撤状态：
+    - peak / worst: 历史最高价与最大回撤
+    - ladder: 每次创新高的价格及其后的最低价，合并到更早的分片之后时
+      用于计算相对前段最高价的回撤，使合并结果与整段计算完全一致
+
+    结果与对同一价格序列调用 calculate_all_metrics 一致
+    """
+
+    def __init__(self, mar: float = 0.0):
+        """
+        初始化累加器
+
+        Args:
+            mar: 最低可接受收益（计算下行波动率）
+        """
+        self.mar = mar
+        self.sample_days = 0
+        self.first: Optional[float] = None
+        self.last: Optional[float] = None
+
+        # 收益率矩
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.down_sumsq = 0.0
+
+        # 回撤状态
+        self.peak: Optional[float] = None
+        self.worst = 0.0
+        self.ladder: list[list[float]] = []  # [创新高价格, 其后最低价]
+
+    def _add_return(self, r: float):
+        """加入一个收益率"""
+        self.count += 1
+        delta = r - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (r - self.mean)
+        self.down_sumsq += min(r - self.mar, 0.0) ** 2
+
+    def update(self, price: float) -> 'MetricsAccumulator':
+        """
+        加入一个新价格（O(1)）
+
+        Args:
+            price: 调整后收盘价，NaN忽略
+
+        Returns:
+            self
+        """
+        price = float(price)
+        if np.isnan(price):
+            return self
+
+        if self.last is not None:
+            self._add_return(price / self.last - 1.0)
+        else:
+            self.first = price
+
+        self.last = price
+        self.sample_days += 1
+
+        if self.peak is None or price > self.peak:
+            self.peak = price
+            self.ladder.append([price, price])
+        else:
+            self.ladder[-1][1] = min(self.ladder[-1][1], price)
+            self.worst = min(self.worst, price / self.peak - 1.0)
+
+        return self
+
+    def update_many(
+        self,
+        prices: Union[pd.Series, np.ndarray, Iterable[float]]
+    ) -> 'MetricsAccumulator':
+        """
+        按顺序加入一批价格（向量化计算后合并）
+
+        Args:
+            prices: 价格序列，NaN忽略
+
+        Returns:
+            self
+        """
+        return self.merge(MetricsAccumulator.from_prices(prices, self.mar))
+
+    @classmethod
+    def from_prices(
+        cls,
+        prices: Union[pd.Series, np.ndarray, Iterable[float]],
+        mar: float = 0.0
+    ) -> 'MetricsAccumulator':
+        """
+        由一段价格序列构建累加器（向量化）
+
+        Args:
+            prices: 价格序列，NaN忽略
+            mar: 最低可接受收益
+
+        Returns:
+            累加器
+        """
+        acc = cls(mar)
+        values = np.asarray(prices, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return acc
+
+        acc.sample_days = len(values)
+        acc.first = float(values[0])
+        acc.last = float(values[-1])
+
+        returns = values[1:] / values[:-1] - 1.0
+        acc.count = len(returns)
+        if acc.count > 0:
+            acc.mean = float(returns.mean())
+            acc.m2 = float(((returns - acc.mean) ** 2).sum())
+            acc.down_sumsq = float((np.minimum(returns - mar, 0.0) ** 2).sum())
+
+        running_max = np.maximum.accumulate(values)
+        acc.peak = float(running_max[-1])
+        acc.worst = float(min((values / running_max - 1.0).min(), 0.0))
+
+        # 创新高的位置，以及每段（到下一次创新高前）的最低价
+        is_record = np.ones(len(values), dtype=bool)
+        is_record[1:] = values[1:] > running_max[:-1]
+        starts = np.flatnonzero(is_record)
+        lows = np.minimum.reduceat(values, starts)
+        acc.ladder = [[float(values[i]), float(low)] for i, low in zip(starts, lows)]
+
+        return acc
+
+    def merge(self, other: 'MetricsAccumulator') -> 'MetricsAccumulator':
+        """
+        合并紧接在本段之后的分片（结果等同于按顺序加入other的全部价格）
+
+        Args:
+            other: 后一段价格的累加器（MAR须相同）
+
+        Returns:
+            self
+        """
+        if other.sample_days == 0:
+            return self
+        if other.mar != self.mar:
+            raise ValueError(f"MAR不一致，无法合并: {self.mar} != {other.mar}")
+
+        if self.sample_days == 0:
+            self._copy_from(other)
+            return self
+
+        # 两段交界处的收益率
+        self._add_return(other.first / self.last - 1.0)
+
+        # 合并收益率矩（Chan公式）
+        if other.count > 0:
+            total = self.count + other.count
+            delta = other.mean - self.mean
+            self.m2 += other.m2 + delta ** 2 * self.count * other.count / total
+            self.mean += delta * other.count / total
+            self.count = total
+            self.down_sumsq += other.down_sumsq
+
+        # 后段的回撤在未超过前段最高价之前，相对前段最高价计算
+        worst = min(self.worst, other.worst)
+        for record, low in other.ladder:
+            if record > self.peak:
+                self.peak = record
+                self.ladder.append([record, low])
+            else:
+                self.ladder[-1][1] = min(self.ladder[-1][1], low)
+                worst = min(worst, low / self.peak - 1.0)
+
+        self.worst = worst
+        self.sample_days += other.sample_days
+        self.last = other.last
+        return self
+
+    def _copy_from(self, other: 'MetricsAccumulator'):
+        """复制other的状态"""
+        state = other.to_dict()
+        restored = MetricsAccumulator.from_dict(state)
+        self.__dict__.update(restored.__dict__)
+
+    def metrics(self, annualize: bool = True, td_per_year: int = 252) -> dict:
+        """
+        当前的风险指标
+
+        Args:
+            annualize: 是否年化波动率
+            td_per_year: 年化交易日数
+
+        Returns:
+            指标字典（同 calculate_all_metrics，不含收益率序列）
+        """
+        if self.count > 0:
+            sigma_total = np.sqrt(self.m2 / self.count)
+            sigma_down = np.sqrt(self.down_sumsq / self.count)
+            if annualize:
+                sigma_total *= np.sqrt(td_per_year)
+                sigma_down *= np.sqrt(td_per_year)
+        else:
+            sigma_total = sigma_down = np.nan
+
+        return {
+            'sigma_total': float(sigma_total),
+            'sigma_down': float(sigma_down),
+            'mdd': self.worst if self.sample_days > 0 else np.nan,
+            'sample_days': self.sample_days,
+            'trading_days': self.count,
+            'annualize': annualize,
+            'td_per_year': td_per_year
+        }
+
+    def to_dict(self) -> dict:
+        """序列化状态（可JSON保存）"""
+        return {
+            'mar': self.mar,
+            'sample_days': self.sample_days,
+            'first': self.first,
+            'last': self.last,
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'down_sumsq': self.down_sumsq,
+            'peak': self.peak,
+            'worst': self.worst,
+            'ladder': [list(item) for item in self.ladder]
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict) -> 'MetricsAccumulator':
+        """从 to_dict 的结果恢复累加器"""
+        acc = cls(state['mar'])
+        for key in ['sample_days', 'first', 'last', 'count', 'mean', 'm2',
+                    'down_sumsq', 'peak', 'worst']:
+            setattr(acc, key, state[key])
+        acc.ladder = [list(item) for item in state['ladder']]
+        return acc
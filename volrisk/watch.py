@@ -0,0 +1,99 @@
+"""
+监视模块
+rank --watch 使用：常驻进程保留行业指标与已获取的价格，轮询配置文件，
+保存后只重新计算变化的行业与公司（公司部分见 incremental.analyze_incremental）
+"""
+
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .sector import SectorAnalyzer, SectorMetrics, SectorsConfig
+
+
+class ConfigWatcher:
+    """按修改时间与文件大小轮询配置文件"""
+
+    def __init__(self, paths: List[Path]):
+        """
+        Args:
+            paths: 监视的文件路径列表
+        """
+        self.paths = [Path(p) for p in paths]
+        self._stamps = {path: self._stamp(path) for path in self.paths}
+
+    @staticmethod
+    def _stamp(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def poll(self) -> List[Path]:
+        """
+        检查一次
+
+        Returns:
+            自上次检查以来变化的文件（编辑器保存时文件可能短暂不存在，此时不算变化）
+        """
+        changed = []
+        for path in self.paths:
+            stamp = self._stamp(path)
+            if stamp is not None and stamp != self._stamps[path]:
+                self._stamps[path] = stamp
+                changed.append(path)
+        return changed
+
+    def wait(self, interval: float = 0.2) -> List[Path]:
+        """
+        阻塞直到有文件变化
+
+        Args:
+            interval: 轮询间隔（秒）
+
+        Returns:
+            变化的文件
+        """
+        while True:
+            changed = self.poll()
+            if changed:
+                return changed
+            time.sleep(interval)
+
+
+def update_sector_metrics(
+    analyzer: SectorAnalyzer,
+    old_config: SectorsConfig,
+    new_config: SectorsConfig,
+    sector_metrics: Dict[str, SectorMetrics],
+    **kwargs
+) -> Tuple[Dict[str, SectorMetrics], List[str]]:
+    """
+    行业配置变化后更新行业指标：只计算新增或定义变化的行业，删除的行业移除，其余沿用
+
+    Args:
+        analyzer: 行业分析器
+        old_config: 上次的行业配置
+        new_config: 新的行业配置
+        sector_metrics: 上次的行业指标
+        **kwargs: 传递给 calculate_all_sectors 的参数
+
+    Returns:
+        (新的行业指标（按新配置顺序）, 重新计算的行业)
+    """
+    changed = [
+        name for name, config in new_config.sectors.items()
+        if old_config.sectors.get(name) != config or name not in sector_metrics
+    ]
+    updated = analyzer.calculate_all_sectors(
+        SectorsConfig(sectors={name: new_config.sectors[name] for name in changed}), **kwargs
+    ) if changed else {}
+
+    metrics = {}
+    for name in new_config.sectors:
+        if name in updated:
+            metrics[name] = updated[name]
+        elif name not in changed and name in sector_metrics:
+            metrics[name] = sector_metrics[name]
+    return metrics, changed